@@ -0,0 +1,77 @@
+"""Compare embedding backends on bulk ingestion throughput and single-query latency.
+
+Usage:
+    python benchmarks/embedding_backends.py [--chunks 2000] [--queries 200] [--backends torch onnx onnx-int8]
+
+The ONNX models are exported (and quantized) into a temporary directory first,
+so torch, transformers and onnxruntime must all be installed.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from email_llm_search.embedding_backends import OnnxEmbeddings, create_torch_embeddings, export_onnx_model
+
+WORDS = ("meeting invoice project update schedule report customer order shipping payment review "
+         "deadline contract proposal budget team release feedback request account").split()
+
+def make_texts(count: int, seed: int = 0) -> list:
+    """Synthetic chunks with a realistic spread of lengths (5 to 200 words)."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 200))) for _ in range(count)]
+
+def load_backends(model_name: str, names: list, directory: str) -> dict:
+    """Create the requested backends."""
+    cache_folder = os.path.join("models", model_name)
+    backends = {}
+    for name in names:
+        if name == "torch":
+            backends[name] = create_torch_embeddings(model_name, cache_folder)
+        else:
+            model_path = export_onnx_model(model_name, directory, cache_folder, quantize=name == "onnx-int8")
+            backends[name] = OnnxEmbeddings(model_path, os.path.join(directory, "tokenizer.json"))
+    return backends
+
+def bench_bulk(embeddings, texts: list, batch_size: int) -> float:
+    """Chunks per second when embedding in batches."""
+    started = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        embeddings.embed_documents(texts[start:start + batch_size])
+    return len(texts) / (time.perf_counter() - started)
+
+def bench_queries(embeddings, queries: list) -> tuple:
+    """p50 and p95 latency in milliseconds of single query embeddings."""
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    args = parser.parse_args()
+
+    texts = make_texts(args.chunks)
+    queries = [" ".join(text.split()[:6]) for text in make_texts(args.queries, seed=1)]
+    with tempfile.TemporaryDirectory() as directory:
+        backends = load_backends(args.model, args.backends, directory)
+        print(f"{'backend':<10} {'chunks/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, embeddings in backends.items():
+            # Warm up allocations and thread pools
+            embeddings.embed_documents(texts[:args.batch_size])
+            throughput = bench_bulk(embeddings, texts, args.batch_size)
+            p50, p95 = bench_queries(embeddings, queries)
+            print(f"{name:<10} {throughput:>10.1f} {p50:>8.2f} {p95:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Offline bulk ingestion of mbox, Maildir and .eml archives into the vector store."""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Deque, Iterator, List, Optional
+from .mails.archive_reader import ArchivedMail, iter_archive
+from .mails.mail_parser import parse_mail
+from .mails.mail_processor import MailProcessor
+from .types import ProcessedMail
+
+_worker_processor: Optional[MailProcessor] = None
+
+def _init_worker(model_name: str) -> None:
+    """Create one MailProcessor per worker process, sizing chunks for the given embedding model."""
+    global _worker_processor
+    _worker_processor = MailProcessor(workers=0, model_name=model_name)
+
+def _process_archived_mails(archived_mails: List[ArchivedMail]) -> List[ProcessedMail]:
+    """Parse and chunk a slice of archived messages inside a worker process."""
+    processed_mails = []
+    for archived in archived_mails:
+        try:
+            mail = parse_mail(archived.uid, archived.raw, archived.folder)
+        except Exception as e:
+            logging.warning(f"Error parsing {archived.folder}/{archived.uid}: {e}")
+            continue
+        processed_mails.append(_worker_processor.process_mail_sync(mail))
+    return processed_mails
+
+def _slices(archived_mails: Iterator[ArchivedMail], size: int, limit: Optional[int]) -> Iterator[List[ArchivedMail]]:
+    """Group the message stream into lists of at most size messages."""
+    current = []
+    for count, archived in enumerate(archived_mails):
+        if limit is not None and count >= limit:
+            break
+        current.append(archived)
+        if len(current) >= size:
+            yield current
+            current = []
+    if current:
+        yield current
+
+class IngestStats:
+    """Throughput counters for a bulk ingestion run."""
+    def __init__(self):
+        self.started = time.monotonic()
+        self.messages = 0
+        self.chunks = 0
+
+    def add(self, processed_mails: List[ProcessedMail], messages: int) -> None:
+        """Count a processed slice."""
+        self.messages += messages
+        self.chunks += sum(len(mail.chunks) for mail in processed_mails)
+
+    def report(self, final: bool = False) -> str:
+        """Format messages/s and chunks/s so far."""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        prefix = "Done" if final else "Progress"
+        return (f"{prefix}: {self.messages} messages, {self.chunks} chunks in {elapsed:.1f}s "
+                f"({self.messages / elapsed:.1f} messages/s, {self.chunks / elapsed:.1f} chunks/s)")
+
+def ingest(paths: List[str], langchain_manager, workers: int = None, slice_size: int = 64,
+           limit: Optional[int] = None, report_every: float = 5.0) -> IngestStats:
+    """Stream archives through processing and embedding.
+
+    Parsing and cleaning run on a process pool, while embedding of the previous
+    slices runs concurrently on a background thread. At most a few slices per
+    worker are in flight, so memory stays bounded for multi-GB archives.
+
+    Args:
+        paths: Archive files or directories
+        langchain_manager: Target LangChainManager
+        workers: Number of processing processes (defaults to the CPU count)
+        slice_size: Messages handed to a worker at a time
+        limit: Stop after this many messages
+        report_every: Seconds between progress lines
+
+    Returns:
+        The final throughput counters
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = IngestStats()
+    archived_mails = (archived for path in paths for archived in iter_archive(path))
+
+    pending: Deque[tuple] = deque()
+    embedding: Optional[Future] = None
+    last_report = time.monotonic()
+
+    def collect() -> None:
+        nonlocal embedding, last_report
+        slice_length, future = pending.popleft()
+        processed_mails = [mail for mail in future.result() if mail.chunks]
+        # Wait for the previous write before queueing the next one
+        if embedding is not None:
+            embedding.result()
+        embedding = writer.submit(langchain_manager.add_processed_mails, processed_mails)
+        stats.add(processed_mails, slice_length)
+        if time.monotonic() - last_report >= report_every:
+            print(stats.report())
+            last_report = time.monotonic()
+
+    # Spawned, not forked: the caller has usually loaded the model and its threads already
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(langchain_manager.model_name,),
+                             mp_context=multiprocessing.get_context("spawn")) as pool, \
+            ThreadPoolExecutor(max_workers=1) as writer:
+        for archived_slice in _slices(archived_mails, slice_size, limit):
+            pending.append((len(archived_slice), pool.submit(_process_archived_mails, archived_slice)))
+            if len(pending) >= workers * 2:
+                collect()
+        while pending:
+            collect()
+        if embedding is not None:
+            embedding.result()
+
+    print(stats.report(final=True))
+    return stats
+
+def run(argv: List[str] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        prog="email-llm-search-ingest",
+        description="Index mbox files, Maildir trees and .eml directories without IMAP."
+    )
+    parser.add_argument("paths", nargs="+", help="mbox files, Maildir roots or directories of .eml files")
+    parser.add_argument("--persist-directory", default=os.path.join(os.getenv("DATA_DIR", "data"), "index"),
+                        help="Directory to persist the vector store (default: $DATA_DIR/index, as used by the server)")
+    parser.add_argument("--collection", default=None, help="Collection name in the vector store")
+    parser.add_argument("--workers", type=int, default=None, help="Processing processes (default: CPU count)")
+    parser.add_argument("--slice-size", type=int, default=64, help="Messages per worker task")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many messages")
+    parser.add_argument("--verbose", action="store_true", help="Log every processed mail")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        stream=sys.stdout,
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
+    # Imported here so --help does not load the model stack
+    from .langchain_manager import LangChainManager
+    langchain_manager = LangChainManager(persist_directory=args.persist_directory, collection_name=args.collection)
+    ingest(args.paths, langchain_manager, workers=args.workers, slice_size=args.slice_size, limit=args.limit)
+
+if __name__ == "__main__":
+    run()
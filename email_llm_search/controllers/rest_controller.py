@@ -1,13 +1,18 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 import logging
 import os
+from datetime import datetime
 import pathlib
-from typing import List
+from typing import List, Optional, Tuple
 
 from ..mail_searcher import MailSearcher
-from .rest_types import SearchQuery, SearchResultResponse, StateResponse
+from ..search_batcher import SearchOverloadedError
+from ..types import SearchFilter, SearchOptions, SearchRequest, SearchResult
+from .rest_types import (
+    BatchSearchQuery, MailResultResponse, MailSearchQuery, SearchQuery, SearchResultResponse, StateResponse, StatsResponse
+)
 
 class RestController:
     """Controller for REST endpoints."""
@@ -35,7 +40,11 @@ class RestController:
         # Register route handlers
         self.app.get("/")(self.read_root)
         self.app.post("/search")(self.search)
+        self.app.post("/search/batch")(self.search_batch)
+        self.app.post("/search/mails")(self.search_mails)
         self.app.get("/state")(self.get_state)
+        self.app.get("/stats")(self.get_stats)
+        self.app.get("/ready")(self.get_readiness)
     
     async def read_root(self) -> HTMLResponse:
         """Serve the UI."""
@@ -50,32 +59,135 @@ class RestController:
     async def search(self, query: SearchQuery) -> List[SearchResultResponse]:
         """Search emails and return top results."""
         logging.info(f"Searching for query: {query.query}")
+        if not self.mail_searcher.is_search_ready():
+            raise HTTPException(status_code=503, detail="Search index is still loading")
         
         try:
-            results = self.mail_searcher.search(query.query, query.n_results)
+            filters, options = self._search_settings(query)
+            results = await self.mail_searcher.search_async(query.query, query.n_results, filters, options)
             
             # Convert SearchResult objects to SearchResultResponse objects
+            return [self._result_response(result) for result in results]
+        except SearchOverloadedError:
+            raise self._overloaded()
+        except Exception as e:
+            logging.error(f"Error searching emails: {e}")
+            raise HTTPException(status_code=500, detail=f"Error searching emails: {str(e)}")
+    
+    async def search_batch(self, batch: BatchSearchQuery) -> List[List[SearchResultResponse]]:
+        """Run several searches with one embedding pass and return their results in order."""
+        logging.info(f"Searching for {len(batch.queries)} queries")
+        if not self.mail_searcher.is_search_ready():
+            raise HTTPException(status_code=503, detail="Search index is still loading")
+        
+        max_pending = self.mail_searcher.search_batcher.max_pending
+        if len(batch.queries) > max_pending:
+            raise HTTPException(status_code=400, detail=f"At most {max_pending} queries per batch")
+        
+        try:
+            requests = []
+            for query in batch.queries:
+                filters, options = self._search_settings(query)
+                requests.append(SearchRequest(query.query, query.n_results, filters, options))
+            return [
+                [self._result_response(result) for result in results]
+                for results in await self.mail_searcher.search_many_async(requests)
+            ]
+        except SearchOverloadedError:
+            raise self._overloaded()
+        except Exception as e:
+            logging.error(f"Error searching emails: {e}")
+            raise HTTPException(status_code=500, detail=f"Error searching emails: {str(e)}")
+    
+    async def search_mails(self, query: MailSearchQuery) -> List[MailResultResponse]:
+        """Search emails and return the top distinct mails with their best snippets."""
+        logging.info(f"Searching mails for query: {query.query}")
+        if not self.mail_searcher.is_search_ready():
+            raise HTTPException(status_code=503, detail="Search index is still loading")
+        
+        try:
+            filters, options = self._search_settings(query)
+            mails = await self.mail_searcher.search_mails_async(
+                query.query, query.n_results, filters, options, query.aggregation, query.snippets_per_mail
+            )
             return [
-                SearchResultResponse(
-                    mail_uid=result.mail_uid,
-                    chunk_index=result.chunk_index,
-                    text=result.text,
-                    score=result.score
+                MailResultResponse(
+                    mail_uid=mail.mail_uid,
+                    folder=mail.folder,
+                    score=mail.score,
+                    subject=mail.subject,
+                    sender=mail.sender,
+                    date=self._iso_date(mail.date_ts),
+                    snippets=[self._result_response(result) for result in mail.snippets]
                 )
-                for result in results
+                for mail in mails
             ]
+        except SearchOverloadedError:
+            raise self._overloaded()
         except Exception as e:
             logging.error(f"Error searching emails: {e}")
             raise HTTPException(status_code=500, detail=f"Error searching emails: {str(e)}")
     
+    def _overloaded(self) -> HTTPException:
+        """503 telling the client to retry shortly, for searches rejected by the batcher."""
+        return HTTPException(status_code=503, detail="Too many searches in progress", headers={"Retry-After": "1"})
+    
+    def _search_settings(self, query: SearchQuery) -> Tuple[SearchFilter, SearchOptions]:
+        """Filters and retrieval options of a search request."""
+        filters = SearchFilter(
+            folder=query.folder,
+            sender=query.sender,
+            date_from=int(query.date_from.timestamp()) if query.date_from else None,
+            date_to=int(query.date_to.timestamp()) if query.date_to else None
+        )
+        options = SearchOptions(
+            mode=query.mode,
+            vector_weight=query.vector_weight,
+            keyword_weight=query.keyword_weight,
+            vector_depth=query.vector_depth,
+            keyword_depth=query.keyword_depth
+        )
+        return filters, options
+    
+    def _result_response(self, result: SearchResult) -> SearchResultResponse:
+        """Convert a SearchResult to its response schema."""
+        return SearchResultResponse(
+            mail_uid=result.mail_uid,
+            chunk_index=result.chunk_index,
+            text=result.text,
+            score=result.score,
+            folder=result.folder,
+            subject=result.subject,
+            sender=result.sender,
+            date=self._iso_date(result.date_ts)
+        )
+    
+    def _iso_date(self, date_ts: Optional[int]) -> Optional[str]:
+        """ISO format of a Unix timestamp, if there is one."""
+        return datetime.fromtimestamp(date_ts).isoformat() if date_ts is not None else None
+    
     async def get_state(self) -> StateResponse:
         """Return current state."""
         try:
             state = self.mail_searcher.get_state()
             return StateResponse(
                 last_sync_time=state.last_sync_time,
-                sync_status=state.sync_status
+                sync_status=state.sync_status,
+                pipeline=self.mail_searcher.get_pipeline_stats()
             )
         except Exception as e:
             logging.error(f"Error getting state: {e}")
-            raise HTTPException(status_code=500, detail=f"Error getting state: {str(e)}") 
\ No newline at end of file
+            raise HTTPException(status_code=500, detail=f"Error getting state: {str(e)}")
+    
+    async def get_stats(self) -> StatsResponse:
+        """Return cache hit/miss counters and ingestion pipeline stats."""
+        try:
+            return StatsResponse(**self.mail_searcher.get_stats())
+        except Exception as e:
+            logging.error(f"Error getting stats: {e}")
+            raise HTTPException(status_code=500, detail=f"Error getting stats: {str(e)}")
+    
+    async def get_readiness(self) -> JSONResponse:
+        """Report each component's startup state; 503 until all are ready."""
+        readiness = self.mail_searcher.get_readiness()
+        return JSONResponse(content=readiness, status_code=200 if readiness["ready"] else 503)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 # Input types
@@ -7,6 +7,24 @@ class SearchQuery(BaseModel):
     """Schema for search query."""
     query: str
     n_results: int = 5
+    folder: Optional[str] = None
+    sender: Optional[str] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    mode: Literal["vector", "keyword", "hybrid"] = "vector"
+    vector_weight: float = 1.0
+    keyword_weight: float = 1.0
+    vector_depth: Optional[int] = None
+    keyword_depth: Optional[int] = None
+
+class BatchSearchQuery(BaseModel):
+    """Schema for several searches answered together."""
+    queries: List[SearchQuery]
+
+class MailSearchQuery(SearchQuery):
+    """Schema for a search returning distinct mails; n_results counts mails."""
+    aggregation: Literal["max", "sum"] = "max"
+    snippets_per_mail: int = 3
 
 # Output types
 class SearchResultResponse(BaseModel):
@@ -15,8 +33,31 @@ class SearchResultResponse(BaseModel):
     chunk_index: int
     text: str
     score: float
+    folder: str = "INBOX"
+    subject: str = ""
+    sender: str = ""
+    date: Optional[str] = None  # ISO format string
+
+class MailResultResponse(BaseModel):
+    """Schema for a mail found by a grouped search."""
+    mail_uid: str
+    folder: str
+    score: float
+    subject: str = ""
+    sender: str = ""
+    date: Optional[str] = None  # ISO format string
+    snippets: List[SearchResultResponse] = []
 
 class StateResponse(BaseModel):
     """Schema for state response."""
     last_sync_time: Optional[str] = None
-    sync_status: str = "idle" 
\ No newline at end of file
+    sync_status: str = "idle"
+    pipeline: Optional[dict] = None
+
+class StatsResponse(BaseModel):
+    """Schema for introspection counters."""
+    query_cache: Optional[dict] = None
+    result_cache: Optional[dict] = None
+    embedding_cache: Optional[dict] = None
+    pipeline: Optional[dict] = None
+    search_batcher: Optional[dict] = None
@@ -1,15 +1,35 @@
+import os
 import sqlite3
-from typing import Optional
+import threading
+from typing import Dict, Optional
+from .mails.mails_types import SyncCheckpoint
 from .types import User, ImapAuth, State
 
 class DBManager:
-    """Manages an in-memory SQLite database for user and state data."""
-    def __init__(self):
-        self.conn = sqlite3.connect(":memory:")
+    """Manages the SQLite database for user, state and sync checkpoint data.
+
+    A file database runs in WAL mode, so checkpoint commits after every
+    written batch stay cheap and readers never wait on them. The IMAP
+    password is never stored; it is read from the environment on each start.
+    """
+    def __init__(self, path: str = ":memory:"):
+        """Open or create the database.
+
+        Args:
+            path: SQLite file (":memory:" for a transient database)
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
         self.create_tables()
 
     def create_tables(self):
-        """Initialize the user table."""
+        """Initialize the user and checkpoint tables."""
         cursor = self.conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS user (
@@ -20,31 +40,66 @@ class DBManager:
                 sync_status TEXT
             )
         """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                mailbox TEXT PRIMARY KEY,
+                uidvalidity INTEGER,
+                last_uid INTEGER
+            )
+        """)
+        # Scrub passwords stored by earlier versions
+        cursor.execute("UPDATE user SET password = NULL WHERE password IS NOT NULL")
         self.conn.commit()
 
     def get_user(self) -> Optional[User]:
-        """Retrieve the user data (single user for now)."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT email, password, last_sync_time, sync_status FROM user LIMIT 1")
-        row = cursor.fetchone()
+        """Retrieve the user data (single user for now); the password is left empty."""
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT email, last_sync_time, sync_status FROM user LIMIT 1")
+            row = cursor.fetchone()
         if row:
-            auth = ImapAuth(email=row[0], password=row[1])
-            state = State(last_sync_time=row[2], sync_status=row[3])
+            auth = ImapAuth(email=row[0], password="")
+            state = State(last_sync_time=row[1], sync_status=row[2])
             return User(auth=auth, state=state)
         return None
 
     def set_user(self, user: User):
-        """Store or update user data."""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT OR REPLACE INTO user (id, email, password, last_sync_time, sync_status)
-            VALUES (1, ?, ?, ?, ?)
-        """, (user.auth.email, user.auth.password, user.state.last_sync_time, user.state.sync_status))
-        self.conn.commit()
+        """Store or update the user's email and state; the password is not stored."""
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                INSERT OR REPLACE INTO user (id, email, password, last_sync_time, sync_status)
+                VALUES (1, ?, NULL, ?, ?)
+            """, (user.auth.email, user.state.last_sync_time, user.state.sync_status))
+            self.conn.commit()
 
     def update_state(self, state: State):
         """Update the state information."""
-        cursor = self.conn.cursor()
-        cursor.execute("UPDATE user SET last_sync_time = ?, sync_status = ?", 
-                       (state.last_sync_time, state.sync_status))
-        self.conn.commit()
\ No newline at end of file
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("UPDATE user SET last_sync_time = ?, sync_status = ?", 
+                           (state.last_sync_time, state.sync_status))
+            self.conn.commit()
+
+    def load_checkpoints(self) -> Dict[str, SyncCheckpoint]:
+        """Sync checkpoints of all mailboxes, by mailbox."""
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT mailbox, uidvalidity, last_uid FROM checkpoints")
+            rows = cursor.fetchall()
+        return {mailbox: SyncCheckpoint(mailbox, uidvalidity, last_uid) for mailbox, uidvalidity, last_uid in rows}
+
+    def save_checkpoint(self, checkpoint: SyncCheckpoint):
+        """Store the sync position of a mailbox."""
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                INSERT OR REPLACE INTO checkpoints (mailbox, uidvalidity, last_uid)
+                VALUES (?, ?, ?)
+            """, (checkpoint.mailbox, checkpoint.uidvalidity, checkpoint.last_uid))
+            self.conn.commit()
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self.conn.close()
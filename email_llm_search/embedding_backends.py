@@ -0,0 +1,179 @@
+import logging
+import os
+from typing import Callable, Dict, List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+def _sentence_transformers_repo(model_name: str) -> str:
+    """Hub repository of a model given by its short sentence-transformers name."""
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+def mean_pool(token_embeddings: np.ndarray, attention_mask: np.ndarray, normalize: bool = True) -> np.ndarray:
+    """Average token embeddings over the unpadded positions, as sentence-transformers does.
+
+    Args:
+        token_embeddings: Model output of shape (batch, sequence, dimensions)
+        attention_mask: Mask of shape (batch, sequence)
+        normalize: L2-normalize the pooled vectors
+
+    Returns:
+        Sentence vectors of shape (batch, dimensions)
+    """
+    mask = attention_mask[..., None].astype(np.float32)
+    pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    if normalize:
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+    return pooled
+
+def create_torch_embeddings(model_name: str, cache_folder: str) -> Embeddings:
+    """The PyTorch sentence-transformers model through langchain_huggingface."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    # Batches are formed by TokenBudgetEmbeddings, so the model must not split them again
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True, 'batch_size': int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "256"))},
+        cache_folder=cache_folder
+    )
+
+def export_onnx_model(model_name: str, output_dir: str, cache_folder: str = None, quantize: bool = False) -> str:
+    """Export a sentence-transformers model to ONNX, optionally quantized to int8.
+
+    Needs torch and transformers once, at export time. The fast tokenizer is
+    saved next to the model.
+
+    Args:
+        model_name: Model to export
+        output_dir: Directory receiving model.onnx (and model.int8.onnx) and tokenizer.json
+        cache_folder: Download cache for the PyTorch weights
+        quantize: Also write a dynamically int8-quantized copy
+
+    Returns:
+        Path of the model to load
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    repo = _sentence_transformers_repo(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(repo, cache_dir=cache_folder)
+    model = AutoModel.from_pretrained(repo, cache_dir=cache_folder)
+    model.eval()
+    tokenizer.save_pretrained(output_dir)
+
+    path = os.path.join(output_dir, "model.onnx")
+    sample = tokenizer(["Sample input"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    logging.info(f"Exported {model_name} to {path}")
+
+    if not quantize:
+        return path
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = os.path.join(output_dir, "model.int8.onnx")
+    quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+    logging.info(f"Quantized {model_name} to {quantized_path}")
+    return quantized_path
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings from an exported ONNX model run by onnxruntime on CPU.
+
+    Tokenization uses the model's fast tokenizer and pooling mirrors
+    sentence-transformers (mean pooling, L2 normalization), so vectors match
+    the PyTorch path within a small tolerance, or a larger one when quantized.
+    """
+    def __init__(self, model_path: str, tokenizer_path: str, max_length: int = 256, threads: int = 0):
+        """Initialize the backend.
+
+        Args:
+            model_path: Exported .onnx model
+            tokenizer_path: tokenizer.json of the model
+            max_length: Input length; longer texts are truncated like the PyTorch model does
+            threads: Intra-op threads (0 lets onnxruntime decide)
+        """
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("The onnx embedding backend needs onnxruntime and tokenizers installed") from e
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Run one batch through the model."""
+        if not texts:
+            return []
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+        return mean_pool(token_embeddings, inputs["attention_mask"]).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of documents."""
+        return self._embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query."""
+        return self._embed([text])[0]
+
+def create_onnx_embeddings(model_name: str, cache_folder: str) -> Embeddings:
+    """The ONNX backend, exporting the model on first use.
+
+    EMBEDDING_ONNX_DIR holds the exported model (defaults to <cache_folder>/onnx),
+    EMBEDDING_ONNX_QUANTIZE=1 selects the int8 model.
+    """
+    output_dir = os.getenv("EMBEDDING_ONNX_DIR") or os.path.join(cache_folder, "onnx")
+    quantize = os.getenv("EMBEDDING_ONNX_QUANTIZE", "0") == "1"
+    model_path = os.path.join(output_dir, "model.int8.onnx" if quantize else "model.onnx")
+    if not os.path.exists(model_path):
+        model_path = export_onnx_model(model_name, output_dir, cache_folder, quantize)
+    return OnnxEmbeddings(
+        model_path,
+        os.path.join(output_dir, "tokenizer.json"),
+        threads=int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))
+    )
+
+# Embedding backends by EMBEDDING_BACKEND value
+EMBEDDING_BACKENDS: Dict[str, Callable[[str, str], Embeddings]] = {
+    "torch": create_torch_embeddings,
+    "onnx": create_onnx_embeddings,
+}
+
+def embedding_backend_name() -> str:
+    """The configured backend, including the quantization that changes its vectors."""
+    backend = os.getenv("EMBEDDING_BACKEND", "torch")
+    if backend == "onnx" and os.getenv("EMBEDDING_ONNX_QUANTIZE", "0") == "1":
+        return "onnx-int8"
+    return backend
+
+def create_embeddings(model_name: str, cache_folder: str) -> Embeddings:
+    """Create the embedding backend selected by EMBEDDING_BACKEND ("torch" or "onnx")."""
+    backend = os.getenv("EMBEDDING_BACKEND", "torch")
+    if backend not in EMBEDDING_BACKENDS:
+        logging.warning(f"Unknown EMBEDDING_BACKEND {backend}, using torch")
+        backend = "torch"
+    logging.info(f"Loading {model_name} with the {backend} embedding backend")
+    return EMBEDDING_BACKENDS[backend](model_name, cache_folder)
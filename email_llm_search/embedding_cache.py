@@ -0,0 +1,247 @@
+import glob
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_chunk(text: str) -> str:
+    """Normalize chunk text so trivially different copies share an embedding."""
+    return WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+def chunk_hash(text: str) -> str:
+    """SHA-256 of the normalized chunk text."""
+    return hashlib.sha256(normalize_chunk(text).encode("utf-8")).hexdigest()
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Embed several queries in one model call.
+
+    Uses the wrapper's embed_queries when it has one, otherwise the batched
+    document path; the backends here embed queries and documents alike.
+    """
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    return embeddings.embed_documents(texts)
+
+def model_fingerprint(model_name: str, cache_folder: Optional[str] = None) -> str:
+    """Identify a model version for cache keys.
+
+    Uses the revision of the downloaded Hugging Face snapshot when there is
+    one, so an updated model does not reuse vectors of the old one.
+    """
+    if cache_folder:
+        revisions = sorted(glob.glob(os.path.join(cache_folder, "models--*", "refs", "main")))
+        for path in revisions:
+            with open(path) as f:
+                return f"{model_name}@{f.read().strip()}"
+    return model_name
+
+class EmbeddingCache:
+    """Persistent map from chunk content hash to embedding vector, per model."""
+    def __init__(self, path: str, model: str):
+        """Initialize the cache.
+
+        Args:
+            path: SQLite file holding the vectors
+            model: Model fingerprint the vectors belong to
+        """
+        self.path = path
+        self.model = model
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.create_tables()
+
+    def create_tables(self):
+        """Initialize the vector table."""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT,
+                hash TEXT,
+                vector BLOB,
+                PRIMARY KEY (model, hash)
+            )
+        """)
+        self.conn.commit()
+
+    def get_many(self, hashes: List[str]) -> Dict[str, List[float]]:
+        """Look up vectors by content hash.
+
+        Returns:
+            Vector per hash that was found
+        """
+        found = {}
+        with self._lock:
+            cursor = self.conn.cursor()
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                cursor.execute(f"""
+                    SELECT hash, vector FROM embeddings
+                    WHERE model = ? AND hash IN ({",".join("?" * len(batch))})
+                """, (self.model, *batch))
+                for digest, vector in cursor.fetchall():
+                    found[digest] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, vectors: Dict[str, List[float]]) -> None:
+        """Store vectors by content hash."""
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(self.model, digest, np.asarray(vector, dtype=np.float32).tobytes())
+                 for digest, vector in vectors.items()]
+            )
+            self.conn.commit()
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self.conn.close()
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only runs the model on chunks it has never seen.
+
+    Documents are deduplicated by normalized content hash within a call and
+    against the persistent cache, which outlives the vector store.
+    """
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, reusing cached vectors."""
+        hashes = [chunk_hash(text) for text in texts]
+        vectors = self.cache.get_many(list(set(hashes)))
+
+        missing = {}
+        for digest, text in zip(hashes, texts):
+            if digest not in vectors and digest not in missing:
+                missing[digest] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            computed = dict(zip(missing, self.embeddings.embed_documents(list(missing.values()))))
+            self.cache.put_many(computed)
+            vectors.update(computed)
+            logging.info(f"Embedded {len(missing)} new chunks, {len(texts) - len(missing)} served from cache")
+
+        return [vectors[digest] for digest in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query with the wrapped model."""
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed queries with the wrapped model, bypassing the chunk cache."""
+        return embed_queries(self.embeddings, texts)
+
+class QueryEmbeddingCache(Embeddings):
+    """Embeddings wrapper keeping recent query vectors in a bounded LRU cache with a TTL.
+
+    Repeated searches (UI refreshes, pagination, shared links) skip the model.
+    Queries are keyed by their normalized text.
+    """
+    def __init__(self, embeddings: Embeddings, max_size: int = None, ttl: float = None):
+        """Initialize the cache.
+
+        Args:
+            embeddings: The model to run on misses
+            max_size: Maximum cached queries (defaults to QUERY_CACHE_SIZE, 0 disables caching)
+            ttl: Seconds a vector stays valid (defaults to QUERY_CACHE_TTL)
+        """
+        self.embeddings = embeddings
+        self.max_size = max_size if max_size is not None else int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("QUERY_CACHE_TTL", "3600"))
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents with the wrapped model."""
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, serving repeated ones from the cache."""
+        key = normalize_chunk(text)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        vector = self.embeddings.embed_query(text)
+        self._put({key: vector}, now)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries, running the model once for all the uncached ones."""
+        keys = [normalize_chunk(text) for text in texts]
+        now = time.monotonic()
+        vectors: Dict[str, List[float]] = {}
+        missing: Dict[str, str] = {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    vectors[key] = entry[1]
+                elif key in vectors or key in missing:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    missing[key] = text
+
+        if missing:
+            computed = dict(zip(missing, embed_queries(self.embeddings, list(missing.values()))))
+            self._put(computed, now)
+            vectors.update(computed)
+        return [vectors[key] for key in keys]
+
+    def _put(self, vectors: Dict[str, List[float]], now: float) -> None:
+        """Store fresh query vectors, evicting the least recently used ones."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            for key, vector in vectors.items():
+                self._entries[key] = (now + self.ttl, vector)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Hit and miss counters and the current size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "max_size": self.max_size}
+
+def create_embedding_cache(model: str, persist_directory: Optional[str] = None) -> Optional[EmbeddingCache]:
+    """Create the cache configured by EMBEDDING_CACHE_PATH (empty disables it).
+
+    By default the cache lives next to the index it was built for, or only in
+    memory when the index is not persisted either.
+    """
+    path = os.getenv("EMBEDDING_CACHE_PATH")
+    if path is None:
+        path = os.path.join(persist_directory, "embedding_cache.sqlite") if persist_directory else ":memory:"
+    if not path:
+        return None
+    return EmbeddingCache(path, model)
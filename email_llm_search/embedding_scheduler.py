@@ -0,0 +1,68 @@
+import logging
+import os
+from typing import Callable, List
+from langchain_core.embeddings import Embeddings
+
+def plan_token_batches(lengths: List[int], max_batch_tokens: int, max_batch_size: int = 0) -> List[List[int]]:
+    """Group text indices into batches bounded by a padded token budget.
+
+    Texts are sorted by length, so each batch holds texts of similar length
+    and little compute goes into padding. A batch costs its size times its
+    longest text, since every text is padded to that length.
+
+    Args:
+        lengths: Token count of each text
+        max_batch_tokens: Budget of padded tokens per batch
+        max_batch_size: Maximum texts per batch (0 disables a limit)
+
+    Returns:
+        Batches of indices into lengths
+    """
+    batches = []
+    current: List[int] = []
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        longest = max(lengths[index], 1)
+        if current and ((len(current) + 1) * longest > max_batch_tokens
+                        or (max_batch_size and len(current) >= max_batch_size)):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+class TokenBudgetEmbeddings(Embeddings):
+    """Embeddings wrapper that runs the model on length-sorted, token-budgeted batches."""
+    def __init__(self, embeddings: Embeddings, count_tokens: Callable[[str], int],
+                 max_batch_tokens: int = None, max_batch_size: int = None, max_length: int = 256):
+        """Initialize the scheduler.
+
+        Args:
+            embeddings: The model to run
+            count_tokens: Token counter of the model's tokenizer
+            max_batch_tokens: Padded tokens per batch (defaults to EMBEDDING_BATCH_TOKENS)
+            max_batch_size: Texts per batch (defaults to EMBEDDING_MAX_BATCH_SIZE)
+            max_length: Model input length; longer texts are truncated by the model
+        """
+        self.embeddings = embeddings
+        self.count_tokens = count_tokens
+        self.max_batch_tokens = max_batch_tokens or int(os.getenv("EMBEDDING_BATCH_TOKENS", "8192"))
+        self.max_batch_size = max_batch_size or int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "256"))
+        self.max_length = max_length
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents batch by batch and return the vectors in input order."""
+        # Special tokens add two positions to every input
+        lengths = [min(self.count_tokens(text) + 2, self.max_length) for text in texts]
+        vectors: List[List[float]] = [None] * len(texts)
+        batches = plan_token_batches(lengths, self.max_batch_tokens, self.max_batch_size)
+        for batch in batches:
+            for index, vector in zip(batch, self.embeddings.embed_documents([texts[i] for i in batch])):
+                vectors[index] = vector
+        if batches:
+            logging.info(f"Embedded {len(texts)} chunks in {len(batches)} batches")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query with the wrapped model."""
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from .mails import MailingManager
+from .types import Mail
+
+_DONE = object()  # End-of-stream marker passed down the queues
+
+@dataclass
+class StageStats:
+    """Throughput counters of one pipeline stage (emails, or chunks for the embed stage)."""
+    name: str
+    items: int = 0
+    busy_seconds: float = 0.0
+    started: float = field(default_factory=time.monotonic)
+
+    def record(self, items: int, seconds: float) -> None:
+        """Count items handled in one step of the stage."""
+        self.items += items
+        self.busy_seconds += seconds
+
+    def to_dict(self) -> Dict[str, float]:
+        """Items, items per second of wall time, and the share of time the stage was busy."""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "items": self.items,
+            "per_second": round(self.items / elapsed, 2),
+            "utilization": round(min(self.busy_seconds / elapsed, 1.0), 2),
+        }
+
+class IngestionPipeline:
+    """Staged ingestion: fetch -> clean/chunk -> embed -> write.
+
+    Stages run concurrently and are connected by bounded asyncio queues, so the
+    network, the cleaning workers and the embedding model stay busy at the same
+    time while a slow stage applies backpressure to the ones before it.
+    Parsing happens inside the IMAP backends, as part of the fetch stage.
+    Checkpoints only advance once an email's chunks are written.
+    """
+
+    def __init__(self, mailing_manager: MailingManager, langchain_manager):
+        """Initialize the pipeline.
+
+        Args:
+            mailing_manager: Source of emails, owner of the sync checkpoints
+            langchain_manager: Target with embed_processed_mails / write_documents
+        """
+        self.mailing_manager = mailing_manager
+        self.langchain_manager = langchain_manager
+        self.fetch_batch_size = int(os.getenv("SYNC_BATCH_SIZE", "10"))
+        self.mail_queue_depth = int(os.getenv("PIPELINE_MAIL_QUEUE_DEPTH", "64"))
+        self.chunk_queue_depth = int(os.getenv("PIPELINE_CHUNK_QUEUE_DEPTH", "64"))
+        self.write_queue_depth = int(os.getenv("PIPELINE_WRITE_QUEUE_DEPTH", "4"))
+        self.process_workers = int(os.getenv("PIPELINE_PROCESS_WORKERS", "4"))
+        self.process_batch_size = int(os.getenv("PIPELINE_PROCESS_BATCH_SIZE", "16"))
+        self.embed_batch_chunks = int(os.getenv("PIPELINE_EMBED_BATCH_CHUNKS", "64"))
+        self.report_interval = float(os.getenv("PIPELINE_REPORT_INTERVAL", "10"))
+        self._stages: Dict[str, StageStats] = {}
+        self._queues: Dict[str, asyncio.Queue] = {}
+
+    async def run(self, max_emails: Optional[int] = None) -> int:
+        """Ingest all new mail of every folder.
+
+        Args:
+            max_emails: Stop fetching after this many emails
+
+        Returns:
+            Number of emails written
+        """
+        self._stages = {name: StageStats(name) for name in ("fetch", "process", "embed", "write")}
+        self._queues = {
+            "mails": asyncio.Queue(self.mail_queue_depth),
+            "chunks": asyncio.Queue(self.chunk_queue_depth),
+            "writes": asyncio.Queue(self.write_queue_depth),
+        }
+        written = self._stages["write"]
+        # Whatever an interrupted run left unwritten is fetched again
+        self.mailing_manager.rewind()
+
+        tasks = [
+            asyncio.ensure_future(self._fetch_stage(max_emails)),
+            *(asyncio.ensure_future(self._process_stage()) for _ in range(self.process_workers)),
+            asyncio.ensure_future(self._embed_stage()),
+            asyncio.ensure_future(self._write_stage()),
+        ]
+        reporter = asyncio.ensure_future(self._report_periodically())
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            reporter.cancel()
+            for task in tasks:
+                task.cancel()
+        if written.items:
+            logging.info(f"Pipeline finished: {self.get_stats()}")
+        return written.items
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-stage throughput and queue occupancy of the current or last run."""
+        return {
+            "stages": {name: stats.to_dict() for name, stats in self._stages.items()},
+            "queues": {name: {"size": queue.qsize(), "max_size": queue.maxsize} for name, queue in self._queues.items()},
+        }
+
+    async def _report_periodically(self) -> None:
+        """Log the stats while a run is in progress."""
+        while True:
+            await asyncio.sleep(self.report_interval)
+            logging.info(f"Pipeline progress: {self.get_stats()}")
+
+    async def _fetch_stage(self, max_emails: Optional[int]) -> None:
+        """Stream new mail of all folders into the mail queue, a few folders at a time."""
+        stats = self._stages["fetch"]
+        semaphore = asyncio.Semaphore(self.mailing_manager.folder_concurrency)
+        fetched = 0
+
+        async def fetch_folder(folder: str) -> None:
+            nonlocal fetched
+            async with semaphore:
+                started = time.monotonic()
+                mails = self.mailing_manager.stream_new_emails(folder, self.fetch_batch_size)
+                try:
+                    async for mail in mails:
+                        if max_emails is not None and fetched >= max_emails:
+                            return
+                        stats.record(1, time.monotonic() - started)
+                        fetched += 1
+                        await self._queues["mails"].put(mail)
+                        started = time.monotonic()
+                finally:
+                    # Ends the IMAP fetch behind the stream instead of leaving it to the garbage collector
+                    await mails.aclose()
+
+        try:
+            results = await asyncio.gather(
+                *(fetch_folder(folder) for folder in self.mailing_manager.folders or ["INBOX"]),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logging.error(f"Error fetching mail: {result}")
+        finally:
+            for _ in range(self.process_workers):
+                await self._queues["mails"].put(_DONE)
+
+    async def _process_stage(self) -> None:
+        """Clean and chunk emails in micro-batches; one of several concurrent workers."""
+        stats = self._stages["process"]
+        queue = self._queues["mails"]
+        while True:
+            # Wait for one email, then take whatever else is ready up to the batch size
+            mails = [await queue.get()]
+            while mails[-1] is not _DONE and len(mails) < self.process_batch_size and not queue.empty():
+                mails.append(queue.get_nowait())
+            done = mails[-1] is _DONE
+            if done:
+                mails.pop()
+
+            if mails:
+                started = time.monotonic()
+                processed = await self.mailing_manager.mail_processor.process_batch(mails)
+                stats.record(len(mails), time.monotonic() - started)
+                for item in zip(mails, processed):
+                    await self._queues["chunks"].put(item)
+            if done:
+                await self._queues["chunks"].put(_DONE)
+                return
+
+    async def _embed_stage(self) -> None:
+        """Group processed emails into batches of about embed_batch_chunks chunks and embed them."""
+        stats = self._stages["embed"]
+        remaining_workers = self.process_workers
+        while remaining_workers:
+            batch: List[tuple] = []
+            chunks = 0
+            # Wait for one item, then take whatever else is ready up to the batch size
+            while remaining_workers and chunks < self.embed_batch_chunks:
+                if batch and self._queues["chunks"].empty():
+                    break
+                item = await self._queues["chunks"].get()
+                if item is _DONE:
+                    remaining_workers -= 1
+                    continue
+                batch.append(item)
+                chunks += len(item[1].chunks)
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            documents, vectors = await asyncio.get_event_loop().run_in_executor(
+                None, self.langchain_manager.embed_processed_mails, [processed for _, processed in batch]
+            )
+            stats.record(len(documents), time.monotonic() - started)
+            await self._queues["writes"].put(([mail for mail, _ in batch], documents, vectors))
+        await self._queues["writes"].put(_DONE)
+
+    async def _write_stage(self) -> None:
+        """Write embedded batches and advance the checkpoints of their emails."""
+        stats = self._stages["write"]
+        while True:
+            item = await self._queues["writes"].get()
+            if item is _DONE:
+                return
+            mails, documents, vectors = item
+            started = time.monotonic()
+            await asyncio.get_event_loop().run_in_executor(
+                None, self.langchain_manager.write_documents, documents, vectors
+            )
+            self._mark_synced(mails)
+            stats.record(len(mails), time.monotonic() - started)
+
+    def _mark_synced(self, mails: List[Mail]) -> None:
+        """Report written emails to the mailing manager, per folder."""
+        by_folder: Dict[str, List[str]] = {}
+        for mail in mails:
+            by_folder.setdefault(mail.folder, []).append(mail.uid)
+        for folder, uids in by_folder.items():
+            self.mailing_manager.mark_synced(folder, uids)
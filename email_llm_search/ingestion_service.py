@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import os
+from typing import Callable, Optional
+from .ingestion_pipeline import IngestionPipeline
+from .mails import MailingManager
+
+class IngestionService:
+    """Long-running ingestion that keeps the index up to date with the mailbox.
+
+    Each round drains the new mail of every folder through the staged
+    ingestion pipeline, then waits for the server to report new mail with IMAP IDLE. When
+    IDLE is unavailable or fails, it polls with exponential backoff instead.
+
+    IDLE watches a single folder (IMAP_IDLE_FOLDER). New mail in the other
+    synced folders is picked up when IDLE times out after IMAP_IDLE_TIMEOUT
+    seconds or new mail in the watched folder starts a round.
+    """
+
+    def __init__(self, mailing_manager: MailingManager, pipeline: IngestionPipeline,
+                 on_status: Optional[Callable[[str], None]] = None):
+        """Initialize the service.
+
+        Args:
+            mailing_manager: Source of processed mail batches
+            pipeline: Pipeline moving new mail into the index
+            on_status: Optional callback receiving "syncing", "idle" or "error"
+        """
+        self.mailing_manager = mailing_manager
+        self.pipeline = pipeline
+        self.on_status = on_status
+        self.idle_folder = os.getenv("IMAP_IDLE_FOLDER", "INBOX")
+        # Servers drop IDLE after 30 minutes; waking up regularly also resyncs the other folders
+        self.idle_timeout = float(os.getenv("IMAP_IDLE_TIMEOUT", "600"))
+        self.poll_interval = float(os.getenv("SYNC_POLL_INTERVAL", "15"))
+        self.max_poll_interval = float(os.getenv("SYNC_MAX_POLL_INTERVAL", "300"))
+        self._current_poll_interval = self.poll_interval
+        self._use_idle = True
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        """Start the ingestion loop in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        """Stop the ingestion loop."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run(self) -> None:
+        """Sync until cancelled, waking up whenever new mail may have arrived."""
+        logging.info("Starting ingestion service")
+        while True:
+            try:
+                self._set_status("syncing")
+                synced = await self.drain()
+                self._set_status("idle")
+                if synced:
+                    self._current_poll_interval = self.poll_interval
+                await self.wait_for_changes()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Ingestion round failed: {e}")
+                self._set_status("error")
+                await self._backoff()
+
+    async def drain(self) -> int:
+        """Run the pipeline until no folder has new mail.
+
+        Returns:
+            Number of emails synced
+        """
+        synced = await self.pipeline.run()
+        if synced:
+            logging.info(f"Ingested {synced} emails this round")
+        return synced
+
+    async def wait_for_changes(self) -> None:
+        """Block until new mail is reported, IDLE times out, or the poll interval elapses."""
+        if self._use_idle:
+            try:
+                changed = await self.mailing_manager.imap_manager.wait_for_new_mail(
+                    self.idle_folder, self.idle_timeout
+                )
+                if changed is not None:
+                    return
+                logging.info("Server does not support IDLE, falling back to polling")
+                self._use_idle = False
+            except Exception as e:
+                logging.warning(f"IDLE failed ({e}), polling instead")
+        await self._backoff()
+
+    async def _backoff(self) -> None:
+        """Sleep for the current poll interval and double it for next time."""
+        await asyncio.sleep(self._current_poll_interval)
+        self._current_poll_interval = min(self._current_poll_interval * 2, self.max_poll_interval)
+
+    def _set_status(self, status: str) -> None:
+        """Report the sync status if a callback was given."""
+        if self.on_status:
+            self.on_status(status)
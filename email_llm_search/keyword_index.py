@@ -0,0 +1,166 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+
+TERM_RE = re.compile(r"\S+")
+# SQL for the range conditions a filter may give instead of a value
+RANGE_OPERATORS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+def build_match_query(query: str) -> str:
+    """Turn free text into an FTS5 query matching any of its terms.
+
+    Each whitespace-separated term is quoted as a phrase, so codes like
+    INV-2023-0042 or a.b@example.com match as one sequence of tokens and
+    FTS5 operators in user input are not interpreted.
+    """
+    terms = [term.replace('"', '""') for term in TERM_RE.findall(query)]
+    return " OR ".join(f'"{term}"' for term in terms)
+
+class KeywordIndex:
+    """SQLite FTS5 index over chunk text for exact-token retrieval (BM25)."""
+    # Metadata stored in unindexed columns so filters run inside the query
+    FILTER_FIELDS = ("folder", "sender", "date_ts")
+
+    def __init__(self, path: str = ":memory:"):
+        """Open or create the index.
+
+        Args:
+            path: SQLite file of the index (":memory:" for a transient one)
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.create_tables()
+
+    def create_tables(self):
+        """Initialize the full-text and id tables, rebuilding an index written with other filter columns."""
+        cursor = self.conn.cursor()
+        # FTS5 columns cannot be indexed, so ids map to FTS rowids in an ordinary table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_ids (
+                id TEXT PRIMARY KEY,
+                row INTEGER
+            )
+        """)
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(chunks)").fetchall()]
+        rows = []
+        if columns and columns != ["id", "text", "metadata", *self.FILTER_FIELDS]:
+            # FTS5 tables cannot gain columns; the filter values are rederived from the stored metadata
+            rows = cursor.execute("SELECT id, text, metadata FROM chunks").fetchall()
+            cursor.execute("DROP TABLE chunks")
+            cursor.execute("DELETE FROM chunk_ids")
+        filter_columns = "".join(f", {name} UNINDEXED" for name in self.FILTER_FIELDS)
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+                id UNINDEXED, text, metadata UNINDEXED{filter_columns},
+                tokenize = 'unicode61'
+            )
+        """)
+        if cursor.execute("SELECT COUNT(*) FROM chunk_ids").fetchone()[0] == 0:
+            # Index written before the id table existed
+            cursor.execute("INSERT OR REPLACE INTO chunk_ids (id, row) SELECT id, rowid FROM chunks ORDER BY rowid")
+        self.conn.commit()
+        if rows:
+            self.upsert([id_ for id_, _, _ in rows],
+                        [Document(page_content=text, metadata=json.loads(metadata)) for _, text, metadata in rows])
+
+    def upsert(self, ids: List[str], documents: List[Document]) -> None:
+        """Index documents, replacing those with the same ids."""
+        # The last copy of an id repeated within the batch wins
+        by_id = dict(zip(ids, documents))
+        if not by_id:
+            return
+        columns = ", ".join(("id", "text", "metadata") + self.FILTER_FIELDS)
+        insert = f"INSERT INTO chunks ({columns}) VALUES ({', '.join('?' * (3 + len(self.FILTER_FIELDS)))})"
+        with self._lock:
+            cursor = self.conn.cursor()
+            unique_ids = list(by_id)
+            replaced = []
+            for start in range(0, len(unique_ids), 500):
+                batch = unique_ids[start:start + 500]
+                cursor.execute(f"SELECT row FROM chunk_ids WHERE id IN ({','.join('?' * len(batch))})", batch)
+                replaced.extend(row for (row,) in cursor.fetchall())
+            cursor.executemany("DELETE FROM chunks WHERE rowid = ?", [(row,) for row in replaced])
+
+            rows = []
+            for id_, doc in by_id.items():
+                cursor.execute(insert, (id_, doc.page_content, json.dumps(doc.metadata),
+                                        *(doc.metadata.get(name) for name in self.FILTER_FIELDS)))
+                rows.append((id_, cursor.lastrowid))
+            cursor.executemany("INSERT OR REPLACE INTO chunk_ids (id, row) VALUES (?, ?)", rows)
+            self.conn.commit()
+
+    def search(self, query: str, k: int, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """Return up to k documents matching any query term, best BM25 score first.
+
+        Scores are SQLite's bm25() values, lower is better.
+        """
+        match = build_match_query(query)
+        if not match or k <= 0:
+            return []
+
+        conditions = ["chunks MATCH ?"]
+        params: List[Any] = [match]
+        for name, value in (filter or {}).items():
+            if name not in self.FILTER_FIELDS:
+                raise ValueError(f"Unsupported filter field {name}")
+            if isinstance(value, dict):
+                for op, bound in value.items():
+                    conditions.append(f"{name} {RANGE_OPERATORS[op]} ?")
+                    params.append(bound)
+            else:
+                conditions.append(f"{name} = ?")
+                params.append(value)
+
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute(f"""
+                SELECT text, metadata, bm25(chunks) AS score FROM chunks
+                WHERE {" AND ".join(conditions)}
+                ORDER BY score LIMIT ?
+            """, (*params, k))
+            rows = cursor.fetchall()
+        return [(Document(page_content=text, metadata=json.loads(metadata)), score) for text, metadata, score in rows]
+
+    def count(self) -> int:
+        """Number of indexed chunks."""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self.conn.close()
+
+def reciprocal_rank_fusion(rankings: List[List[str]], weights: List[float], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists with weighted reciprocal rank fusion.
+
+    Each list contributes weight / (k + rank) for every id it contains.
+
+    Args:
+        rankings: Ranked ids per retriever, best first
+        weights: Weight per retriever
+        k: Damping constant; larger values flatten the contribution of top ranks
+
+    Returns:
+        Ids with their fused scores, highest first
+    """
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, id_ in enumerate(ranking, 1):
+            scores[id_] = scores.get(id_, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+def create_keyword_index(collection_name: str, persist_directory: str = None) -> Optional[KeywordIndex]:
+    """Create the index next to the vector store (KEYWORD_INDEX=0 disables it)."""
+    if os.getenv("KEYWORD_INDEX", "1") != "1":
+        return None
+    if not persist_directory:
+        return KeywordIndex()
+    return KeywordIndex(os.path.join(persist_directory, f"{collection_name}_keywords.sqlite"))
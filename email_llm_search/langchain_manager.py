@@ -1,129 +1,335 @@
 import os
+import re
+import threading
 import uuid
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 import logging
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
-from .types import ProcessedMail, SearchResult
+from .embedding_backends import create_embeddings, embedding_backend_name
+from .embedding_cache import CachedEmbeddings, QueryEmbeddingCache, chunk_hash, create_embedding_cache, model_fingerprint
+from .embedding_scheduler import TokenBudgetEmbeddings
+from .mails.chunker import TokenChunker, embedding_model_name
+from .keyword_index import create_keyword_index, reciprocal_rank_fusion
+from .result_cache import SearchResultCache, result_cache_key
+from .result_grouping import grouped_search, relevance
+from .types import MailResult, ProcessedMail, SearchFilter, SearchOptions, SearchRequest, SearchResult
+from .vector_stores import create_vector_store
+
+def default_collection_name(model_name: str) -> str:
+    """Stable collection name for a model; vectors of different models never share a collection."""
+    return f"emails_{re.sub(r'[^A-Za-z0-9]+', '_', model_name).strip('_')}"[:63]
 
 class LangChainManager:
     """Manages embeddings and vector database operations using LangChain."""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2", persist_directory: str = None, collection_name: str = None):
+    def __init__(self, model_name: str = None, persist_directory: str = None, collection_name: str = None):
         """Initialize the LangChain manager.
         
         Args:
-            model_name: The name of the embedding model to use
+            model_name: The name of the embedding model to use (defaults to EMBEDDING_MODEL)
             persist_directory: Directory to persist the vector store (None for in-memory)
-            collection_name: Name of the collection to use (None for a random name)
+            collection_name: Name of the collection to use (None for one derived from the model when
+                persisting, so the index is found again after a restart, or a random one in memory)
         """
+        model_name = model_name or embedding_model_name()
         self.model_name = model_name
         self.persist_directory = persist_directory
-        self.collection_name = collection_name or f"emails_{uuid.uuid4().hex[:8]}"
-        
-        # Initialize the embedding model
-        model_kwargs = {'device': 'cpu'}
-        encode_kwargs = {'normalize_embeddings': True}
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs=model_kwargs,
-            encode_kwargs=encode_kwargs,
-            cache_folder=os.path.join("models", model_name)
+        if collection_name is None:
+            collection_name = (default_collection_name(model_name) if persist_directory
+                               else f"emails_{uuid.uuid4().hex[:8]}")
+        self.collection_name = collection_name
+        
+        # Initialize the embedding model with the backend chosen by EMBEDDING_BACKEND
+        cache_folder = os.path.join("models", model_name)
+        self.embeddings = create_embeddings(model_name, cache_folder)
+        
+        # Length-sorted batches bounded by EMBEDDING_BATCH_TOKENS waste little compute on padding
+        chunker = TokenChunker(model_name=model_name)
+        self.embeddings = TokenBudgetEmbeddings(self.embeddings, chunker.count_tokens, max_length=chunker.max_tokens + 2)
+        
+        # Repeated chunks (footers, signatures, quoted threads) skip the model
+        self.embedding_cache = create_embedding_cache(
+            f"{model_fingerprint(model_name, cache_folder)}+{embedding_backend_name()}",
+            self.persist_directory,
         )
+        if self.embedding_cache:
+            self.embeddings = CachedEmbeddings(self.embeddings, self.embedding_cache)
+        
+        # Repeated searches reuse the query vector
+        self.query_cache = QueryEmbeddingCache(self.embeddings)
+        self.embeddings = self.query_cache
         
-        # Initialize the vector store
-        self.vector_store = self._initialize_vector_store()
+        # Initialize the vector store selected by VECTOR_STORE
+        self.vector_store = create_vector_store(self.embeddings, self.collection_name, self.persist_directory)
+        # Exact-token retrieval for hybrid search, written alongside the vectors
+        self.keyword_index = create_keyword_index(self.collection_name, self.persist_directory)
+        self._retrievers = ThreadPoolExecutor(max_workers=2, thread_name_prefix="retriever")
+        
+        # Every write starts a new index generation, invalidating cached search results
+        self.generation = 0
+        self._generation_lock = threading.Lock()
+        self.result_cache = SearchResultCache()
         
         logging.info(f"Initialized LangChainManager with model {model_name} and collection {self.collection_name}")
     
-    def _initialize_vector_store(self):
-        """Initialize the vector store."""
-        try:
-            if self.persist_directory and os.path.exists(self.persist_directory):
-                # Load existing vector store
-                logging.info(f"Loading existing vector store from {self.persist_directory}")
-                return Chroma(
-                    persist_directory=self.persist_directory,
-                    embedding_function=self.embeddings,
-                    collection_name=self.collection_name
-                )
-            else:
-                # Create new vector store
-                logging.info(f"Creating new vector store with collection {self.collection_name}")
-                if self.persist_directory:
-                    return Chroma(
-                        persist_directory=self.persist_directory,
-                        embedding_function=self.embeddings,
-                        collection_name=self.collection_name
-                    )
-                else:
-                    return Chroma(
-                        embedding_function=self.embeddings,
-                        collection_name=self.collection_name
-                    )
-        except Exception as e:
-            logging.error(f"Error initializing vector store: {e}")
-            # Fallback to in-memory store
-            return Chroma(
-                embedding_function=self.embeddings,
-                collection_name=self.collection_name
-            )
-    
     def add_processed_mails(self, processed_mails: List[ProcessedMail]) -> None:
         """Add processed emails to the vector store.
         
         Args:
             processed_mails: List of processed emails to add
         """
-        if not processed_mails:
-            return
+        documents, vectors = self.embed_processed_mails(processed_mails)
+        self.write_documents(documents, vectors)
+
+    def embed_processed_mails(self, processed_mails: List[ProcessedMail]) -> Tuple[List[Document], List[List[float]]]:
+        """Turn processed emails into documents and compute their embeddings.
         
+        Args:
+            processed_mails: List of processed emails
+            
+        Returns:
+            The documents, one per chunk, and their vectors in the same order
+        """
         documents = []
         
         for processed_mail in processed_mails:
+            headers = {
+                "subject": processed_mail.subject,
+                "sender": processed_mail.sender,
+                "to": processed_mail.to
+            }
+            # Stores reject None metadata, so an unparseable date is left out
+            if processed_mail.date_ts is not None:
+                headers["date_ts"] = processed_mail.date_ts
             for i, chunk in enumerate(processed_mail.chunks):
                 # Create a document for each chunk
                 doc = Document(
                     page_content=chunk,
                     metadata={
                         "mail_uid": processed_mail.mail_uid,
-                        "chunk_index": i
+                        "chunk_index": i,
+                        "folder": processed_mail.folder,
+                        "content_hash": chunk_hash(chunk),
+                        **headers
                     }
                 )
                 documents.append(doc)
         
-        if documents:
-            logging.info(f"Adding {len(documents)} documents to vector store")
-            self.vector_store.add_documents(documents)
-            
-            # Persist if directory is specified
-            if self.persist_directory:
-                self.vector_store.persist()
+        if not documents:
+            return [], []
+        return documents, self.embeddings.embed_documents([doc.page_content for doc in documents])
+
+    def write_documents(self, documents: List[Document], vectors: List[List[float]]) -> None:
+        """Write embedded documents to the vector store.
+        
+        Documents get deterministic ids, so writing a mail again replaces its
+        chunks instead of duplicating them.
+        
+        Args:
+            documents: Documents from embed_processed_mails
+            vectors: Their vectors
+        """
+        if not documents:
+            return
+        
+        logging.info(f"Adding {len(documents)} documents to vector store")
+        ids = [self._document_id(doc) for doc in documents]
+        self.vector_store.upsert(ids, vectors, documents)
+        if self.keyword_index:
+            self.keyword_index.upsert(ids, documents)
+        with self._generation_lock:
+            self.generation += 1
+
+    def _document_id(self, doc: Document) -> str:
+        """Stable id of a chunk: folder, mail UID and chunk index."""
+        return f"{doc.metadata['folder']}/{doc.metadata['mail_uid']}/{doc.metadata['chunk_index']}"
     
-    def search(self, query: str, n_results: int = 5) -> List[SearchResult]:
+    def warm_up(self) -> None:
+        """Run one query through the model so the first real search does not pay for lazy setup."""
+        self.query_cache.embeddings.embed_query("warm up")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters of the query, chunk embedding and search result caches."""
+        stats = {"query_cache": self.query_cache.get_stats(), "result_cache": self.result_cache.get_stats()}
+        if self.embedding_cache:
+            cached = self.query_cache.embeddings
+            stats["embedding_cache"] = {"hits": cached.hits, "misses": cached.misses}
+        return stats
+
+    def search(self, query: str, n_results: int = 5, filters: Optional[SearchFilter] = None,
+               options: Optional[SearchOptions] = None) -> List[SearchResult]:
         """Search for similar documents in the vector store.
         
         Args:
             query: The search query
             n_results: Number of results to return
+            filters: Folder, sender and date conditions, evaluated by the indexes themselves
+            options: Retrieval mode and hybrid fusion settings (vector search by default)
             
         Returns:
             List of SearchResult objects with their metadata and similarity scores
         """
+        options = options or SearchOptions()
         try:
-            logging.info(f"Searching for: {query}")
-            
-            # Check if the collection is empty
-            if self.vector_store._collection.count() == 0:
-                return []
-                
-            results = self.vector_store.similarity_search_with_score(query, k=n_results)
+            logging.info(f"Searching for: {query} ({options.mode})")
+            return self._search_chunks(query, n_results, filters, options)
+        except Exception as e:
+            logging.error(f"Error searching vector store: {e}")
+            return []
+
+    def search_many(self, requests: List[SearchRequest]) -> List[List[SearchResult]]:
+        """Run a batch of searches, embedding all queries in one model call.
+        
+        The vector lookups of all vector and hybrid requests are answered
+        together by the vector store; keyword lookups run per request.
+        
+        Args:
+            requests: The searches, each with its own filters and options
             
-            # Convert to SearchResult objects
-            return [SearchResult.from_document(doc, score) for doc, score in results]
+        Returns:
+            The results of each request, in request order
+        """
+        try:
+            logging.info(f"Searching for {len(requests)} queries")
+            generation = self.generation
+            keys = [result_cache_key(r.query, r.n_results, r.filters, r.options) for r in requests]
+            batch_results = [self.result_cache.get(key, generation) for key in keys]
+            missing = [i for i, results in enumerate(batch_results) if results is None]
+            if missing:
+                found = self._search_many_uncached([requests[i] for i in missing])
+                for i, results in zip(missing, found):
+                    self.result_cache.put(keys[i], generation, results)
+                    batch_results[i] = results
+            return batch_results
+        except Exception as e:
+            logging.error(f"Error searching vector store: {e}")
+            return [[] for _ in requests]
+
+    def _search_many_uncached(self, requests: List[SearchRequest]) -> List[List[SearchResult]]:
+        """Run a batch of searches against the indexes."""
+        options = [request.options or SearchOptions() for request in requests]
+        filters = [request.filters.to_store_filter() if request.filters else None for request in requests]
+        
+        # Depth of the vector lookup per request; keyword-only requests need none
+        depths = []
+        for request, opts in zip(requests, options):
+            if opts.mode == "keyword":
+                depths.append(0)
+            elif opts.mode == "hybrid":
+                depths.append(opts.vector_depth or request.n_results * 4)
+            else:
+                depths.append(request.n_results)
+        vector_requests = [i for i, depth in enumerate(depths) if depth > 0]
+        vector_results: Dict[int, List[Tuple[Document, float]]] = {}
+        if vector_requests and self.vector_store.count() > 0:
+            vectors = self.query_cache.embed_queries([requests[i].query for i in vector_requests])
+            found = self.vector_store.search_many(
+                vectors, max(depths[i] for i in vector_requests), [filters[i] for i in vector_requests]
+            )
+            vector_results = {i: results[:depths[i]] for i, results in zip(vector_requests, found)}
+        
+        batch_results = []
+        for i, (request, opts) in enumerate(zip(requests, options)):
+            if opts.mode == "keyword":
+                results = self._keyword_search(request.query, request.n_results, filters[i])
+            elif opts.mode == "hybrid":
+                keyword_results = self._keyword_search(
+                    request.query, opts.keyword_depth or request.n_results * 4, filters[i]
+                )
+                batch_results.append(self._fuse(vector_results.get(i, []), keyword_results, request.n_results, opts))
+                continue
+            else:
+                results = vector_results.get(i, [])
+            batch_results.append(self._to_results(results, opts.mode))
+        return batch_results
+
+    def search_mails(self, query: str, n_mails: int = 5, filters: Optional[SearchFilter] = None,
+                     options: Optional[SearchOptions] = None, aggregation: str = "max",
+                     snippets_per_mail: int = 3) -> List[MailResult]:
+        """Search for mails instead of chunks, so one long thread cannot fill every slot.
+        
+        Args:
+            query: The search query
+            n_mails: Number of distinct mails to return
+            filters: Folder, sender and date conditions, evaluated by the indexes themselves
+            options: Retrieval mode and hybrid fusion settings (vector search by default)
+            aggregation: "max" scores a mail by its best chunk, "sum" by all its retrieved chunks
+            snippets_per_mail: Best chunks returned per mail
             
+        Returns:
+            List of MailResult objects, most relevant first
+        """
+        options = options or SearchOptions()
+        try:
+            logging.info(f"Searching mails for: {query} ({options.mode})")
+            return grouped_search(
+                lambda depth: self._search_chunks(query, depth, filters, options),
+                n_mails, aggregation, snippets_per_mail
+            )
         except Exception as e:
             logging.error(f"Error searching vector store: {e}")
-            return [] 
\ No newline at end of file
+            return []
+
+    def _search_chunks(self, query: str, n_results: int, filters: Optional[SearchFilter],
+                       options: SearchOptions) -> List[SearchResult]:
+        """Run a chunk search in the requested mode, served from the result cache when the index is unchanged."""
+        generation = self.generation
+        key = result_cache_key(query, n_results, filters, options)
+        results = self.result_cache.get(key, generation)
+        if results is not None:
+            return results
+        
+        search_filter = filters.to_store_filter() if filters else None
+        if options.mode == "keyword":
+            results = self._to_results(self._keyword_search(query, n_results, search_filter), options.mode)
+        elif options.mode == "hybrid":
+            results = self._hybrid_search(query, n_results, search_filter, options)
+        else:
+            results = self._to_results(self._vector_search(query, n_results, search_filter), options.mode)
+        self.result_cache.put(key, generation, results)
+        return results
+
+    def _to_results(self, results: List[Tuple[Document, float]], mode: str) -> List[SearchResult]:
+        """Convert store results to SearchResult objects, scored as relevances (higher is better)."""
+        return [SearchResult.from_document(doc, relevance(score, mode)) for doc, score in results]
+
+    def _vector_search(self, query: str, k: int, search_filter: Optional[Dict[str, Any]]) -> List[Tuple[Document, float]]:
+        """Nearest chunks by embedding distance."""
+        # Check if the collection is empty
+        if self.vector_store.count() == 0:
+            return []
+        return self.vector_store.search(self.embeddings.embed_query(query), k=k, filter=search_filter)
+
+    def _keyword_search(self, query: str, k: int, search_filter: Optional[Dict[str, Any]]) -> List[Tuple[Document, float]]:
+        """Best BM25 matches of the query terms."""
+        if not self.keyword_index:
+            return []
+        return self.keyword_index.search(query, k, search_filter)
+
+    def _hybrid_search(self, query: str, n_results: int, search_filter: Optional[Dict[str, Any]],
+                       options: SearchOptions) -> List[SearchResult]:
+        """Run both retrievers concurrently and fuse their rankings."""
+        vector_future = self._retrievers.submit(
+            self._vector_search, query, options.vector_depth or n_results * 4, search_filter
+        )
+        keyword_future = self._retrievers.submit(
+            self._keyword_search, query, options.keyword_depth or n_results * 4, search_filter
+        )
+        return self._fuse(vector_future.result(), keyword_future.result(), n_results, options)
+
+    def _fuse(self, vector_results: List[Tuple[Document, float]], keyword_results: List[Tuple[Document, float]],
+              n_results: int, options: SearchOptions) -> List[SearchResult]:
+        """Combine the rankings of both retrievers with weighted reciprocal rank fusion."""
+        documents = {}
+        rankings = []
+        for results in (vector_results, keyword_results):
+            ranking = []
+            for doc, _ in results:
+                document_id = self._document_id(doc)
+                documents.setdefault(document_id, doc)
+                ranking.append(document_id)
+            rankings.append(ranking)
+        
+        fused = reciprocal_rank_fusion(rankings, [options.vector_weight, options.keyword_weight])
+        return [SearchResult.from_document(documents[document_id], score) for document_id, score in fused[:n_results]]
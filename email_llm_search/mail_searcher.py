@@ -2,107 +2,295 @@ import asyncio
 import os
 from datetime import datetime
 import logging
-from typing import List
+from typing import List, Optional
 from .db_manager import DBManager
-from .langchain_manager import LangChainManager
-from .types import User, ImapAuth, State, SearchResult
+from .ingestion_pipeline import IngestionPipeline
+from .ingestion_service import IngestionService
+from .search_batcher import SearchBatcher
+from .types import User, ImapAuth, State, MailResult, SearchFilter, SearchOptions, SearchRequest, SearchResult
 from .mails import MailingManager
+from .mails.chunker import embedding_model_name
 
 class MailSearcher:
-    """Main class for email search functionality."""
+    """Main class for email search functionality.
+
+    Components start in stages: the database is created right away, while the
+    IMAP connection and the embedding model with its vector store initialize
+    concurrently in the background. Their states are reported by get_readiness.
+    """
     
-    def __init__(self, persist_directory: str = None):
+    def __init__(self, persist_directory: str = None, db_path: str = ":memory:"):
         """Initialize with empty references to components.
         
         Args:
             persist_directory: Directory to persist the vector store (None for in-memory)
+            db_path: SQLite file for the user, state and sync checkpoints (":memory:" for transient)
         """
         logging.info("Creating MailSearcher instance")
         self.db_manager = None
         self.mailing_manager = None
         self.langchain_manager = None
+        self.ingestion_pipeline = None
+        self.ingestion_service = None
         self.persist_directory = persist_directory
+        self.db_path = db_path
+        # One model for chunk sizing and embedding
+        self.model_name = embedding_model_name()
+        # "pending", "initializing", "ready" or "failed: <reason>" per component
+        self.components = {"database": "pending", "imap": "pending", "model": "pending"}
+        self._initialization: Optional[asyncio.Task] = None
+        # Concurrent single searches are embedded together, off the event loop
+        self.search_batcher = SearchBatcher(self.search_many)
         
     async def initialize(self):
         """Initialize all components and connections."""
         logging.info("Initializing MailSearcher components")
+        return await self._initialize_components(self.initialize_database())
+
+    async def _initialize_components(self, user: Optional[User]) -> bool:
+        """Bring up IMAP, the model and the ingestion pipeline for a user from initialize_database."""
+        # IMAP login and the model load do not depend on each other
+        imap_ready, model_ready = await asyncio.gather(self._initialize_imap(user), self._initialize_model())
+        if not (imap_ready and model_ready):
+            return False
         
-        # Initialize database manager
-        self.db_manager = DBManager()
+        self.ingestion_pipeline = IngestionPipeline(self.mailing_manager, self.langchain_manager)
+        return True
+
+    def initialize_database(self) -> Optional[User]:
+        """Create the database and the user record; cheap enough to run before serving requests."""
+        if self.db_manager is None:
+            self.db_manager = DBManager(self.db_path)
+            self.components["database"] = "ready"
         user = self.db_manager.get_user()
+        # Credentials always come from the environment; only the email and state are stored
+        email = os.getenv("IMAP_EMAIL")
+        password = os.getenv("IMAP_PASSWORD")
+        if not email or not password:
+            logging.error("IMAP_EMAIL and IMAP_PASSWORD must be set")
+            print("Error: IMAP_EMAIL and IMAP_PASSWORD must be set in environment variables")
+            return None
         
         if user is None:
-            # First-time run: fetch auth from env variables
-            email = os.getenv("IMAP_EMAIL")
-            password = os.getenv("IMAP_PASSWORD")
-            if not email or not password:
-                logging.error("IMAP_EMAIL and IMAP_PASSWORD must be set")
-                print("Error: IMAP_EMAIL and IMAP_PASSWORD must be set in environment variables")
-                return False
-            
-            auth = ImapAuth(email=email, password=password)
-            user = User(auth=auth, state=State())
+            # First-time run
+            user = User(auth=ImapAuth(email=email, password=password), state=State())
             self.db_manager.set_user(user)
+            return user
         
-        # Initialize mailing manager
-        self.mailing_manager = MailingManager(user.auth)
+        if user.state.sync_status == "syncing":
+            # A sync interrupted by a restart resumes from its checkpoint
+            user.state.sync_status = "idle"
+            self.db_manager.update_state(user.state)
+        if user.auth.email != email:
+            user.auth.email = email
+            self.db_manager.set_user(user)
+        user.auth.password = password
+        return user
+
+    async def _initialize_imap(self, user: Optional[User]) -> bool:
+        """Log in to IMAP and read the mailbox status."""
+        if user is None:
+            self.components["imap"] = "failed: IMAP_EMAIL and IMAP_PASSWORD must be set"
+            return False
+        
+        self.components["imap"] = "initializing"
+        self.mailing_manager = MailingManager(user.auth, checkpoint_store=self.db_manager, model_name=self.model_name)
         if not await self.mailing_manager.initialize():
             logging.error("Failed to initialize mailing manager")
+            self.components["imap"] = f"failed: {self.mailing_manager.get_status().error or 'login failed'}"
             return False
+        self.components["imap"] = "ready"
+        return True
+
+    async def _initialize_model(self) -> bool:
+        """Load the embedding model and vector store off the event loop, then warm the model up."""
+        self.components["model"] = "initializing"
         
-        # Initialize LangChain manager
-        self.langchain_manager = LangChainManager(persist_directory=self.persist_directory)
+        def load():
+            # Deferred so torch, langchain and chromadb are only imported once needed
+            from .langchain_manager import LangChainManager
+            langchain_manager = LangChainManager(model_name=self.model_name, persist_directory=self.persist_directory)
+            langchain_manager.warm_up()
+            return langchain_manager
         
+        try:
+            self.langchain_manager = await asyncio.get_event_loop().run_in_executor(None, load)
+        except Exception as e:
+            logging.error(f"Failed to load the embedding model: {e}")
+            self.components["model"] = f"failed: {e}"
+            return False
+        self.components["model"] = "ready"
         return True
+
+    def start_initialization(self) -> asyncio.Task:
+        """Initialize the components in the background and start ingestion once they are ready."""
+        # The database is ready before this returns; the rest continues in the background
+        user = self.initialize_database()
+        
+        async def initialize_and_start():
+            logging.info("Initializing MailSearcher components")
+            if await self._initialize_components(user):
+                await self.start()
+            else:
+                logging.error(f"MailSearcher initialization incomplete: {self.components}")
+        
+        self._initialization = asyncio.create_task(initialize_and_start())
+        return self._initialization
+
+    def get_readiness(self) -> dict:
+        """Report whether every component is ready, and the state of each."""
+        return {
+            "ready": all(state == "ready" for state in self.components.values()),
+            "components": dict(self.components)
+        }
+
+    def is_search_ready(self) -> bool:
+        """Whether the model and vector store are loaded, so searches can be served."""
+        return self.langchain_manager is not None
         
     async def start(self):
-        """Start the email syncing process in a non-blocking way."""
+        """Start the long-running email ingestion in a non-blocking way."""
         logging.info("Starting email sync process")
-        # Create a task that runs in the background
-        asyncio.create_task(self.sync_emails())
+        self.ingestion_service = IngestionService(
+            self.mailing_manager,
+            self.ingestion_pipeline,
+            on_status=self._set_sync_status
+        )
+        # Runs in the background until close()
+        self.ingestion_service.start()
         return True
 
+    def _set_sync_status(self, status: str) -> None:
+        """Record the ingestion status in the user state."""
+        state = self.db_manager.get_user().state
+        state.sync_status = status
+        if status == "idle":
+            state.last_sync_time = datetime.now().isoformat()
+        self.db_manager.update_state(state)
+
     async def sync_emails(self, max_emails_to_sync: int = 10) -> None:
         """Synchronize emails from IMAP server to vector store.
         
         Args:
             max_emails_to_sync: Maximum number of emails to sync before stopping (for testing)
         """
-        emails_synced = 0
         logging.info(f"Starting email sync, will process up to {max_emails_to_sync} emails")
-        
-        while emails_synced < max_emails_to_sync:
-            processed_mails = await self.mailing_manager.get_processed_batch()
-            if not processed_mails:
-                logging.info("No more emails to process")
-                break
-                
-            # Add processed emails to vector store using LangChain
-            self.langchain_manager.add_processed_mails(processed_mails)
-            
-            # Increment counter and log progress
-            emails_synced += len(processed_mails)
-            logging.info(f"Synced {len(processed_mails)} emails, total: {emails_synced}/{max_emails_to_sync}")
-            
-            # Check if we've reached the limit
-            if emails_synced >= max_emails_to_sync:
-                logging.info(f"Reached maximum of {max_emails_to_sync} emails, stopping sync")
-                break
-        
+        emails_synced = await self.ingestion_pipeline.run(max_emails=max_emails_to_sync)
         logging.info(f"Email sync completed, processed {emails_synced} emails")
 
-    def search(self, query: str, n_results: int = 5) -> List[SearchResult]:
+    def search(self, query: str, n_results: int = 5, filters: Optional[SearchFilter] = None,
+               options: Optional[SearchOptions] = None) -> List[SearchResult]:
         """Search emails based on query.
         
         Args:
             query: The search query
             n_results: Number of results to return
+            filters: Only return results from mails matching these conditions
+            options: Retrieval mode and hybrid fusion settings
+            
+        Returns:
+            List of SearchResult objects with their metadata and similarity scores
+        """
+        return self.langchain_manager.search(query, n_results, filters, options)
+
+    async def search_async(self, query: str, n_results: int = 5, filters: Optional[SearchFilter] = None,
+                           options: Optional[SearchOptions] = None) -> List[SearchResult]:
+        """Search emails without blocking the event loop, batched with concurrent searches.
+        
+        Args:
+            query: The search query
+            n_results: Number of results to return
+            filters: Only return results from mails matching these conditions
+            options: Retrieval mode and hybrid fusion settings
             
         Returns:
             List of SearchResult objects with their metadata and similarity scores
+            
+        Raises:
+            SearchOverloadedError: Too many searches are already pending
+        """
+        return await self.search_batcher.search(SearchRequest(query, n_results, filters, options))
+
+    def search_many(self, requests: List[SearchRequest]) -> List[List[SearchResult]]:
+        """Run several searches together, embedding all queries in one model call.
+        
+        Args:
+            requests: The searches, each with its own filters and options
+            
+        Returns:
+            The results of each search, in request order
+        """
+        return self.langchain_manager.search_many(requests)
+
+    async def search_many_async(self, requests: List[SearchRequest]) -> List[List[SearchResult]]:
+        """Run several searches without blocking the event loop, batched with concurrent searches.
+        
+        Args:
+            requests: The searches, each with its own filters and options
+            
+        Returns:
+            The results of each search, in request order
+            
+        Raises:
+            SearchOverloadedError: Too many searches are already pending
         """
-        return self.langchain_manager.search(query, n_results)
+        return await self.search_batcher.search_all(requests)
+
+    def search_mails(self, query: str, n_mails: int = 5, filters: Optional[SearchFilter] = None,
+                     options: Optional[SearchOptions] = None, aggregation: str = "max",
+                     snippets_per_mail: int = 3) -> List[MailResult]:
+        """Search emails, returning distinct mails with their best matching chunks.
+        
+        Args:
+            query: The search query
+            n_mails: Number of mails to return
+            filters: Only return mails matching these conditions
+            options: Retrieval mode and hybrid fusion settings
+            aggregation: "max" or "sum" of chunk relevances per mail
+            snippets_per_mail: Best chunks returned per mail
+            
+        Returns:
+            List of MailResult objects, most relevant first
+        """
+        return self.langchain_manager.search_mails(query, n_mails, filters, options, aggregation, snippets_per_mail)
+
+    async def search_mails_async(self, query: str, n_mails: int = 5, filters: Optional[SearchFilter] = None,
+                                 options: Optional[SearchOptions] = None, aggregation: str = "max",
+                                 snippets_per_mail: int = 3) -> List[MailResult]:
+        """Like search_mails, but off the event loop and under the search batcher's pending limit.
+        
+        Raises:
+            SearchOverloadedError: Too many searches are already pending
+        """
+        return await self.search_batcher.run(
+            self.search_mails, query, n_mails, filters, options, aggregation, snippets_per_mail
+        )
+
+    async def close(self) -> None:
+        """Release resources held by the components."""
+        if self._initialization and not self._initialization.done():
+            self._initialization.cancel()
+        await self.search_batcher.close()
+        if self.ingestion_service:
+            await self.ingestion_service.stop()
+        if self.mailing_manager:
+            await self.mailing_manager.close()
+        if self.db_manager:
+            self.db_manager.close()
+            self.db_manager = None
+
+    def get_stats(self) -> dict:
+        """Get cache counters and ingestion pipeline stats for introspection."""
+        stats = self.langchain_manager.get_stats() if self.langchain_manager else {}
+        stats["pipeline"] = self.get_pipeline_stats()
+        stats["search_batcher"] = self.search_batcher.get_stats()
+        return stats
+
+    def get_pipeline_stats(self) -> dict:
+        """Get per-stage throughput and queue occupancy of the ingestion pipeline."""
+        return self.ingestion_pipeline.get_stats() if self.ingestion_pipeline else {}
 
     def get_state(self) -> State:
         """Get current state."""
-        return self.db_manager.get_user().state
\ No newline at end of file
+        user = self.db_manager.get_user() if self.db_manager else None
+        return user.state if user else State()
\ No newline at end of file
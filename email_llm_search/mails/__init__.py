@@ -2,5 +2,6 @@ from .mailing_manager import MailingManager
 from .mails_types import MailingStatus
 from .mail_processor import MailProcessor
 from .imap_manager import ImapManager
+from .aio_imap_manager import AioImapManager
 
-__all__ = ['MailingManager', 'MailingStatus', 'MailProcessor', 'ImapManager'] 
\ No newline at end of file
+__all__ = ['MailingManager', 'MailingStatus', 'MailProcessor', 'ImapManager', 'AioImapManager'] 
\ No newline at end of file
@@ -0,0 +1,306 @@
+import asyncio
+import os
+import re
+from typing import AsyncIterator, Dict, List, Optional
+from ..types import Mail, ImapAuth
+from .aio_imap_pool import AioImapConnectionPool
+from .bodystructure import find_text_part, build_text_message
+from .imap_utils import (
+    format_uid_set, plan_fetch_batches, iter_fetch_literals, parse_sizes, parse_fetch_response,
+    group_fetch_lines, PendingUids, quote_mailbox, parse_list_response, get_fetch_mode
+)
+from .mail_parser import parse_mail
+from .raw_mail_store import RawMailStore
+from .mails_types import SyncCheckpoint
+
+class AioImapManager:
+    """Manages email fetching from Gmail via IMAP natively on the event loop using aioimaplib.
+
+    Drop-in alternative to ImapManager. Budgeted FETCH commands of a batch run
+    concurrently on separate pooled connections without any thread hops.
+    """
+    def __init__(self, auth: ImapAuth, raw_store: Optional[RawMailStore] = None):
+        self.auth = auth
+        self.raw_store = raw_store  # Local cache consulted before the server
+        self.host = "imap.gmail.com"
+        self.port = 993
+        self.max_emails = int(os.getenv("MAX_EMAILS_TO_FETCH", "1"))  # Configurable limit
+        self._pool = AioImapConnectionPool(
+            auth,
+            self.host,
+            self.port,
+            max_size=int(os.getenv("IMAP_POOL_SIZE", "4")),
+            health_check_interval=float(os.getenv("IMAP_HEALTH_CHECK_INTERVAL", "30"))
+        )
+        # Budget for a single FETCH command (0 disables a limit)
+        self.fetch_max_messages = int(os.getenv("IMAP_FETCH_MAX_MESSAGES", "50"))
+        self.fetch_max_bytes = int(os.getenv("IMAP_FETCH_MAX_BYTES", "0"))
+        self.fetch_mode = get_fetch_mode()
+        self._pending_uids = PendingUids()
+
+    async def test_login(self) -> bool:
+        """Test IMAP login without fetching emails."""
+        try:
+            # Borrowing a session logs in; NOOP verifies the connection
+            async with self._pool.connection(mailbox=None) as conn:
+                response = await conn.client.noop()
+                return response.result == 'OK'
+        except Exception as e:
+            print(f"Login test failed: {e}")
+            return False
+
+    async def list_folders(self) -> List[str]:
+        """List the names of all selectable folders."""
+        async def list_folders(conn) -> List[str]:
+            response = await conn.client.list('""', "*")
+            if response.result != "OK":
+                print(f"Error listing folders: {response.result}")
+                return []
+            return parse_list_response(response.lines[:-1])
+
+        return await self._pool.run(list_folders, mailbox=None)
+
+    async def get_total_email_count(self, folder: str = "INBOX") -> int:
+        """Get the total number of emails in a folder."""
+        async def count(conn) -> int:
+            response = await conn.client.status(quote_mailbox(folder), "(MESSAGES)")
+            if response.result != "OK":
+                print(f"Error getting mailbox status: {response.result}")
+                return 0
+            match = re.search(rb"MESSAGES (\d+)", bytes(response.lines[0]))
+            return int(match.group(1)) if match else 0
+
+        try:
+            return await self._pool.run(count, mailbox=None)
+        except Exception as e:
+            print(f"Error getting email count: {e}")
+            return 0
+
+    async def fetch_email_by_id(self, email_id: str, folder: str = "INBOX", uidvalidity: int = None) -> Mail:
+        """Fetch a specific email by its UID.
+
+        Args:
+            email_id: UID of the email
+            folder: Folder of the email
+            uidvalidity: UIDVALIDITY the UID belongs to, if known (e.g. from the folder's
+                sync checkpoint); lets a cached copy be served without contacting the server
+        """
+        cached = self._read_cached(folder, uidvalidity, [int(email_id)])
+        if cached:
+            return cached[0]
+
+        async def fetch(conn) -> Mail:
+            mails = await self._fetch_uids(conn, [int(email_id)], folder)
+            if not mails:
+                raise Exception(f"Error fetching email {email_id}: not found")
+            return mails[0]
+
+        try:
+            return await self._pool.run(fetch, mailbox=folder)
+        except Exception as e:
+            print(f"Error fetching email {email_id}: {e}")
+            raise
+
+    async def fetch_emails(self, max_emails: int = None, checkpoint: SyncCheckpoint = None) -> List[Mail]:
+        """Fetch the next emails after a sync checkpoint, oldest first.
+
+        Args:
+            max_emails: Maximum number of emails to fetch
+            checkpoint: Sync position; its UIDVALIDITY is updated (and the position reset)
+                when the server reports a new one. The caller advances ``last_uid``.
+
+        Returns:
+            Emails whose UIDs are greater than ``checkpoint.last_uid``
+        """
+        mails = [mail async for mail in self.stream_emails(max_emails, checkpoint)]
+        return sorted(mails, key=lambda mail: int(mail.uid))
+
+    async def stream_emails(self, max_emails: int = None, checkpoint: SyncCheckpoint = None,
+                            requested: List[int] = None) -> AsyncIterator[Mail]:
+        """Like fetch_emails, but yield emails as soon as their FETCH command completes.
+
+        The budgeted commands of a batch run concurrently, each on its own
+        connection, so emails may arrive out of UID order.
+
+        Args:
+            max_emails: Maximum number of emails to fetch
+            checkpoint: Sync position, as for fetch_emails
+            requested: Filled with every UID requested from the server, so callers
+                can tell UIDs whose FETCH or parsing failed from ones never asked for
+        """
+        if max_emails is None:
+            max_emails = self.max_emails
+
+        if checkpoint is None:
+            checkpoint = SyncCheckpoint()
+
+        uids = await self._pool.run(lambda conn: self._next_uids(conn, checkpoint, max_emails),
+                                    mailbox=checkpoint.mailbox)
+        if not uids:
+            return
+        if requested is not None:
+            requested.extend(uids)
+
+        # Serve what the raw mail store has before planning any FETCH
+        cached = self._read_cached(checkpoint.mailbox, checkpoint.uidvalidity, uids)
+        for mail in cached:
+            yield mail
+        cached_uids = {int(mail.uid) for mail in cached}
+        uids = [uid for uid in uids if uid not in cached_uids]
+        if not uids:
+            return
+
+        async def fetch(batch: List[int]) -> List[Mail]:
+            return await self._pool.run(lambda conn: self._fetch_uids(conn, batch, checkpoint.mailbox),
+                                        mailbox=checkpoint.mailbox)
+
+        sizes = None
+        if self.fetch_max_bytes:
+            sizes = await self._pool.run(lambda conn: self._fetch_sizes(conn, uids), mailbox=checkpoint.mailbox)
+        tasks = [
+            asyncio.ensure_future(fetch(batch))
+            for batch in plan_fetch_batches(uids, sizes, self.fetch_max_messages, self.fetch_max_bytes)
+        ]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                for mail in await completed:
+                    yield mail
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _next_uids(self, conn, checkpoint: SyncCheckpoint, max_emails: int) -> List[int]:
+        """Return up to max_emails UIDs above the checkpoint, searching the server only when needed."""
+        self._pending_uids.validate(checkpoint, conn.uidvalidity)
+        uids = self._pending_uids.take(checkpoint, max_emails)
+        if uids:
+            return uids
+
+        # Only ask for messages newer than the checkpoint
+        response = await conn.client.uid_search(f"UID {checkpoint.last_uid + 1}:*", charset=None)
+        if response.result != "OK":
+            print(f"Error searching for emails: {response.result}")
+            return []
+
+        found = [int(uid) for line in response.lines[:-1] for uid in bytes(line).split() if uid.isdigit()]
+        self._pending_uids.add(checkpoint, found)
+        return self._pending_uids.take(checkpoint, max_emails)
+
+    async def _fetch_responses(self, conn, uids: List[int], query: str) -> List[list]:
+        """Issue one UID FETCH for a UID set and return its per-message responses."""
+        response = await conn.client.uid("fetch", format_uid_set(uids), query)
+        if response.result != "OK":
+            print(f"Error fetching emails {format_uid_set(uids)}: {response.result}")
+            return []
+        return group_fetch_lines(response.lines)
+
+    async def _fetch_sizes(self, conn, uids: List[int]) -> Dict[int, int]:
+        """Fetch RFC822.SIZE for the given UIDs in one command."""
+        responses = await self._fetch_responses(conn, uids, "(UID RFC822.SIZE)")
+        return parse_sizes([line for response in responses for line in response])
+
+    def _read_cached(self, folder: str, uidvalidity: Optional[int], uids: List[int]) -> List[Mail]:
+        """Parse the messages the raw mail store already has."""
+        if not self.raw_store:
+            return []
+        cached = self.raw_store.get_many(self.auth.email, folder, uidvalidity, uids,
+                                         allow_partial=self.fetch_mode == "text")
+        emails = []
+        for uid, raw_email in sorted(cached.items()):
+            try:
+                emails.append(parse_mail(str(uid), raw_email, folder))
+            except Exception as e:
+                print(f"Error parsing email {uid}: {e}")
+        return emails
+
+    async def _fetch_uids(self, conn, uids: List[int], folder: str) -> List[Mail]:
+        """Fetch and parse the given UIDs of the selected folder using the configured fetch mode.
+
+        Messages in the raw mail store are served from disk; everything fetched is stored.
+        """
+        cached = self._read_cached(folder, conn.uidvalidity, uids)
+        cached_uids = {int(mail.uid) for mail in cached}
+        uids = [uid for uid in uids if uid not in cached_uids]
+        if not uids:
+            return cached
+
+        if self.fetch_mode == "text":
+            raw_emails = await self._fetch_text_parts(conn, uids)
+        else:
+            raw_emails = [
+                pair
+                for response in await self._fetch_responses(conn, uids, "(UID RFC822)")
+                for pair in iter_fetch_literals(response)
+            ]
+
+        emails = cached
+        for uid, raw_email in raw_emails:
+            if self.raw_store:
+                self.raw_store.put(self.auth.email, folder, conn.uidvalidity, uid, raw_email,
+                                   partial=self.fetch_mode == "text")
+            try:
+                emails.append(parse_mail(str(uid), raw_email, folder))
+            except Exception as e:
+                print(f"Error parsing email {uid}: {e}")
+        return emails
+
+    async def _fetch_text_parts(self, conn, uids: List[int]) -> List[tuple]:
+        """Fetch headers and BODYSTRUCTURE, then only the chosen text part of each message."""
+        raw_emails = []
+        headers = {}
+        by_section = {}
+        query = "(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (SUBJECT FROM TO DATE MESSAGE-ID)])"
+        for response in await self._fetch_responses(conn, uids, query):
+            items = parse_fetch_response(response)
+            if b"UID" not in items:
+                continue
+            uid = int(items[b"UID"])
+            header = next((value for key, value in items.items() if key.startswith(b"BODY[HEADER")), None) or b""
+            part = find_text_part(items.get(b"BODYSTRUCTURE") or [])
+            if part is None:
+                # Nothing to index, but still hand the headers downstream
+                raw_emails.append((uid, header))
+                continue
+            headers[uid] = (header, part)
+            by_section.setdefault(part.section, []).append(uid)
+
+        for section, section_uids in by_section.items():
+            responses = await self._fetch_responses(conn, section_uids, f"(UID BODY.PEEK[{section}])")
+            for response in responses:
+                for uid, body in iter_fetch_literals(response):
+                    if uid in headers:
+                        header, part = headers.pop(uid)
+                        raw_emails.append((uid, build_text_message(header, part, body)))
+        return raw_emails
+
+    async def wait_for_new_mail(self, folder: str = "INBOX", timeout: float = 600) -> Optional[bool]:
+        """Wait with IMAP IDLE until the server reports new mail in a folder.
+
+        Args:
+            folder: Folder to watch
+            timeout: Seconds to idle before giving up
+
+        Returns:
+            True if new mail arrived, False on timeout, None if the server has no IDLE support
+        """
+        async def idle(conn) -> Optional[bool]:
+            if not conn.client.has_capability("IDLE"):
+                return None
+            idle_task = await conn.client.idle_start(timeout=timeout)
+            try:
+                push = await conn.client.wait_server_push(timeout=timeout)
+                lines = push.lines if hasattr(push, "lines") else push
+                return isinstance(lines, list) and any(b"EXISTS" in bytes(line) for line in lines)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                conn.client.idle_done()
+                await asyncio.wait_for(idle_task, timeout=self._pool.timeout)
+
+        return await self._pool.run(idle, mailbox=folder)
+
+    async def close(self) -> None:
+        """Close all pooled IMAP connections."""
+        await self._pool.close()
+        if self.raw_store:
+            self.raw_store.close()
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import ssl
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from aioimaplib import aioimaplib
+from ..types import ImapAuth
+from .imap_utils import UIDVALIDITY_RE, quote_mailbox
+
+# Errors that mean the underlying session is unusable and must be replaced
+CONNECTION_ERRORS = (aioimaplib.Abort, aioimaplib.CommandTimeout, asyncio.TimeoutError, ssl.SSLError, OSError)
+
+
+class _PooledConnection:
+    """An authenticated aioimaplib session together with its bookkeeping."""
+    def __init__(self, client: aioimaplib.IMAP4_SSL):
+        self.client = client
+        self.mailbox: Optional[str] = None
+        self.uidvalidity: Optional[int] = None
+        self.last_used = time.monotonic()
+
+
+class AioImapConnectionPool:
+    """Pool of authenticated, selected aioimaplib sessions living on the event loop.
+
+    The asyncio counterpart of ImapConnectionPool: sessions are reused, NOOP-checked
+    after being idle and replaced when broken. Up to ``max_size`` borrowers can
+    have commands in flight at the same time.
+    """
+    def __init__(self, auth: ImapAuth, host: str, port: int, max_size: int = 4,
+                 health_check_interval: float = 30.0, timeout: float = 60.0):
+        """Initialize the pool.
+
+        Args:
+            auth: IMAP credentials used for every session
+            host: IMAP server host
+            port: IMAP server port
+            max_size: Maximum number of concurrently open sessions
+            health_check_interval: Idle seconds after which a session is NOOP-checked before reuse
+            timeout: Per-command timeout in seconds
+        """
+        self.auth = auth
+        self.host = host
+        self.port = port
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self._idle: List[_PooledConnection] = []
+        self._slots = asyncio.Semaphore(max_size)
+        self._closed = False
+
+    async def _connect(self) -> _PooledConnection:
+        """Open a new session and log in."""
+        client = aioimaplib.IMAP4_SSL(self.host, self.port, timeout=self.timeout,
+                                      ssl_context=ssl.create_default_context())
+        await client.wait_hello_from_server()
+        response = await client.login(self.auth.email, self.auth.password)
+        if response.result != "OK":
+            await self._logout(client)
+            raise aioimaplib.Abort(f"Login failed: {response.lines}")
+        logging.info(f"Opened new async IMAP connection to {self.host}")
+        return _PooledConnection(client)
+
+    async def _logout(self, client: aioimaplib.IMAP4_SSL) -> None:
+        """Log out, ignoring errors from already broken sessions."""
+        try:
+            await client.logout()
+        except Exception:
+            pass
+
+    def _discard(self, conn: _PooledConnection) -> None:
+        """Drop a session that may be in the middle of a command, without queueing a LOGOUT behind it."""
+        transport = getattr(conn.client.protocol, "transport", None)
+        if transport is not None:
+            transport.close()
+
+    async def _is_alive(self, conn: _PooledConnection) -> bool:
+        """Check an idle session with NOOP if it has not been used recently."""
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return True
+        try:
+            response = await conn.client.noop()
+            return response.result == "OK"
+        except Exception:
+            return False
+
+    async def _acquire(self, mailbox: Optional[str]) -> _PooledConnection:
+        """Take a healthy session from the pool or open a new one."""
+        conn = None
+        while conn is None:
+            candidate = self._idle.pop() if self._idle else None
+            if candidate is None:
+                conn = await self._connect()
+            elif await self._is_alive(candidate):
+                conn = candidate
+            else:
+                logging.info("Discarding stale async IMAP connection")
+                await self._logout(candidate.client)
+
+        if mailbox is not None and conn.mailbox != mailbox:
+            try:
+                response = await conn.client.select(quote_mailbox(mailbox))
+            except Exception:
+                await self._logout(conn.client)
+                raise
+            if response.result != "OK":
+                self._release(conn)
+                raise aioimaplib.Error(f"Error selecting mailbox {mailbox}: {response.lines}")
+            conn.mailbox = mailbox
+            # Remember the mailbox's UIDVALIDITY so UID-based callers can validate checkpoints
+            conn.uidvalidity = None
+            for line in response.lines:
+                match = UIDVALIDITY_RE.search(bytes(line))
+                if match:
+                    conn.uidvalidity = int(match.group(1))
+        return conn
+
+    def _release(self, conn: _PooledConnection) -> None:
+        """Return a session to the pool."""
+        conn.last_used = time.monotonic()
+        if not self._closed:
+            self._idle.append(conn)
+        else:
+            asyncio.ensure_future(self._logout(conn.client))
+
+    @asynccontextmanager
+    async def connection(self, mailbox: Optional[str] = "INBOX"):
+        """Borrow a session with the given mailbox selected.
+
+        Args:
+            mailbox: Mailbox to have selected, or None to leave the selection untouched
+
+        Yields:
+            The pooled connection; ``client`` is the aioimaplib client and
+            ``uidvalidity`` the UIDVALIDITY reported when the mailbox was selected
+        """
+        if self._closed:
+            raise RuntimeError("IMAP connection pool is closed")
+        async with self._slots:
+            conn = await self._acquire(mailbox)
+            try:
+                yield conn
+            except CONNECTION_ERRORS:
+                self._discard(conn)
+                raise
+            except Exception:
+                self._release(conn)
+                raise
+            except BaseException:
+                # Cancelled mid-command: the session may still have a reply pending
+                self._discard(conn)
+                raise
+            else:
+                self._release(conn)
+
+    async def run(self, operation, mailbox: Optional[str] = "INBOX"):
+        """Await an operation on a pooled session, retrying once on a fresh one if the session broke.
+
+        Args:
+            operation: Coroutine function receiving the pooled connection
+            mailbox: Mailbox to have selected
+
+        Returns:
+            The operation's result
+        """
+        try:
+            async with self.connection(mailbox) as conn:
+                return await operation(conn)
+        except CONNECTION_ERRORS as e:
+            logging.warning(f"Async IMAP connection failed ({e}), reconnecting")
+            async with self.connection(mailbox) as conn:
+                return await operation(conn)
+
+    async def close(self) -> None:
+        """Log out all idle sessions and refuse new borrowers."""
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await self._logout(conn.client)
@@ -0,0 +1,100 @@
+import mmap
+import os
+import re
+from dataclasses import dataclass
+from typing import Iterator
+
+# mboxrd quotes body lines starting with "From " as ">From ", ">>From ", ...
+QUOTED_FROM_RE = re.compile(rb"^>(>*From )", re.MULTILINE)
+
+@dataclass
+class ArchivedMail:
+    """A raw message read from a local archive."""
+    uid: str
+    folder: str
+    raw: bytes
+
+def iter_mbox(path: str, folder: str = None) -> Iterator[ArchivedMail]:
+    """Stream messages from an mbox file without loading it into memory.
+
+    The file is memory-mapped and split on "From " separator lines, so
+    multi-GB Takeout exports are read page by page. Each message's UID is its
+    byte offset in the file, which is stable across runs.
+
+    Args:
+        path: Path of the mbox file
+        folder: Folder name to record (defaults to the file name without extension)
+    """
+    folder = folder or os.path.splitext(os.path.basename(path))[0]
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0 if mm[:5] == b"From " else mm.find(b"\nFrom ") + 1
+        if start == 0 and mm[:5] != b"From ":
+            return
+        while start < len(mm):
+            end = mm.find(b"\nFrom ", start)
+            end = len(mm) if end == -1 else end + 1
+            # Skip the envelope line
+            body_start = mm.find(b"\n", start, end)
+            raw = mm[body_start + 1:end] if body_start != -1 else b""
+            if raw.strip():
+                if b">From " in raw:
+                    raw = QUOTED_FROM_RE.sub(rb"\1", raw)
+                yield ArchivedMail(uid=str(start), folder=folder, raw=raw)
+            start = end
+
+def iter_maildir(path: str, folder: str = None) -> Iterator[ArchivedMail]:
+    """Stream messages from a Maildir's cur/ and new/ directories.
+
+    Args:
+        path: Maildir root (the directory containing cur/ and new/)
+        folder: Folder name to record (defaults to the directory name)
+    """
+    folder = folder or os.path.basename(os.path.normpath(path))
+    for subdir in ("cur", "new"):
+        directory = os.path.join(path, subdir)
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            file_path = os.path.join(directory, name)
+            if not os.path.isfile(file_path):
+                continue
+            with open(file_path, "rb") as f:
+                raw = f.read()
+            # The unique part of the name survives flag changes (":2,S" suffixes)
+            yield ArchivedMail(uid=name.split(":", 1)[0], folder=folder, raw=raw)
+
+def iter_archive(path: str) -> Iterator[ArchivedMail]:
+    """Stream every message below a path.
+
+    A file is read as mbox (or as a single message if it ends in .eml). A
+    directory is walked: Maildirs (directories with cur/ and new/), .mbox
+    files and .eml files are picked up, named after their relative path.
+
+    Args:
+        path: File or directory to read
+    """
+    if os.path.isfile(path):
+        if path.lower().endswith(".eml"):
+            with open(path, "rb") as f:
+                yield ArchivedMail(uid=os.path.basename(path), folder="eml", raw=f.read())
+        else:
+            yield from iter_mbox(path)
+        return
+
+    root = os.path.normpath(path)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        relative = os.path.relpath(dirpath, root)
+        folder = os.path.basename(root) if relative == "." else relative
+        if "cur" in dirnames and "new" in dirnames:
+            yield from iter_maildir(dirpath, folder)
+            dirnames[:] = [d for d in dirnames if d not in ("cur", "new", "tmp")]
+        for name in sorted(filenames):
+            file_path = os.path.join(dirpath, name)
+            if name.lower().endswith(".eml"):
+                with open(file_path, "rb") as f:
+                    yield ArchivedMail(uid=name, folder=folder, raw=f.read())
+            elif name.lower().endswith(".mbox"):
+                yield from iter_mbox(file_path, os.path.join(folder, name[:-5]) if relative != "." else name[:-5])
@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+from itertools import takewhile
+from typing import List, Optional
+
+@dataclass
+class TextPart:
+    """Location and encoding of a text MIME part inside a message."""
+    section: str
+    subtype: str
+    charset: Optional[str] = None
+    encoding: Optional[str] = None
+
+def _text(value) -> Optional[str]:
+    """Decode a bytes value from a parsed BODYSTRUCTURE."""
+    return value.decode("ascii", errors="replace") if isinstance(value, bytes) else None
+
+def _is_attachment(part: list, disposition_index: int) -> bool:
+    """Check whether a single-part body has an attachment disposition."""
+    if len(part) <= disposition_index or not isinstance(part[disposition_index], list):
+        return False
+    disposition = part[disposition_index]
+    return bool(disposition) and (_text(disposition[0]) or "").lower() == "attachment"
+
+def _text_parts(structure: list, prefix: str) -> List[TextPart]:
+    """Collect inline text parts in document order."""
+    if structure and isinstance(structure[0], list):
+        # Multipart: child bodies first, then the subtype and extension data
+        parts = []
+        children = takewhile(lambda child: isinstance(child, list), structure)
+        for index, child in enumerate(children, start=1):
+            section = f"{prefix}.{index}" if prefix else str(index)
+            parts.extend(_text_parts(child, section))
+        return parts
+    
+    if len(structure) < 7:
+        return []
+    main_type, subtype = (_text(structure[0]) or "").lower(), (_text(structure[1]) or "").lower()
+    # For text bodies "lines" and "md5" precede the disposition
+    if main_type != "text" or subtype not in ("plain", "html") or _is_attachment(structure, 9):
+        return []
+    
+    charset = None
+    params = structure[2]
+    if isinstance(params, list):
+        for key, value in zip(params[::2], params[1::2]):
+            if (_text(key) or "").lower() == "charset":
+                charset = _text(value)
+    return [TextPart(section=prefix or "1", subtype=subtype, charset=charset, encoding=_text(structure[5]))]
+
+def find_text_part(structure: list) -> Optional[TextPart]:
+    """Pick the part to index: the first inline text/plain, else the first text/html.
+
+    Args:
+        structure: Parsed BODYSTRUCTURE value
+
+    Returns:
+        The chosen part, or None if the message has no text
+    """
+    parts = _text_parts(structure, "")
+    for subtype in ("plain", "html"):
+        for part in parts:
+            if part.subtype == subtype:
+                return part
+    return None
+
+def build_text_message(header: bytes, part: TextPart, body: bytes) -> bytes:
+    """Assemble a minimal RFC822 message from fetched header fields and one text part.
+
+    The result parses like the original message as far as indexing is concerned.
+    """
+    content_type = f"text/{part.subtype}"
+    if part.charset:
+        content_type += f'; charset="{part.charset}"'
+    lines = [
+        header.rstrip(b"\r\n"),
+        b"MIME-Version: 1.0",
+        f"Content-Type: {content_type}".encode(),
+    ]
+    if part.encoding:
+        lines.append(f"Content-Transfer-Encoding: {part.encoding}".encode())
+    return b"\r\n".join(lines) + b"\r\n\r\n" + body
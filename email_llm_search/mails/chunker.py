@@ -0,0 +1,213 @@
+import bisect
+import glob
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# Sentence ends and paragraph breaks; a match containing two newlines ends a paragraph
+BOUNDARY_RE = re.compile(r"\n\s*\n|(?<=[.!?])\s+")
+# Rough stand-in for word pieces when the model's tokenizer is not available
+APPROX_TOKEN_RE = re.compile(r"\w{1,4}|[^\w\s]")
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# Chunk budget when the model's input limit is unknown: all-MiniLM-L6-v2 reads 256 word pieces including [CLS] and [SEP]
+FALLBACK_MAX_TOKENS = 254
+
+def embedding_model_name() -> str:
+    """The embedding model selected by EMBEDDING_MODEL, shared by the chunker and the embedder."""
+    return os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+
+@dataclass
+class _Unit:
+    """A sentence (or a window of an over-long sentence) measured in tokens."""
+    start: int
+    end: int
+    tokens: int
+    paragraph_end: bool = False
+    whole_sentence: bool = True  # Only whole sentences are repeated as overlap
+
+def _tokens(units: List[_Unit]) -> int:
+    """Total tokens of a list of units."""
+    return sum(unit.tokens for unit in units)
+
+@lru_cache(maxsize=None)
+def load_tokenizer(model_name: str):
+    """Load the fast tokenizer of an embedding model from the local model cache.
+
+    Looks at CHUNK_TOKENIZER_PATH first, then for a tokenizer.json below
+    models/<model_name>, where LangChainManager downloads the model. The
+    network is never used; None is returned when nothing is found.
+    """
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        logging.warning("tokenizers is not installed, approximating token counts")
+        return None
+
+    candidates = [os.getenv("CHUNK_TOKENIZER_PATH", "")]
+    candidates += sorted(glob.glob(os.path.join("models", model_name, "**", "tokenizer.json"), recursive=True))
+    for path in candidates:
+        if path and os.path.isfile(path):
+            tokenizer = Tokenizer.from_file(path)
+            # Chunks are measured over the whole mail, so nothing may be cut off
+            tokenizer.no_truncation()
+            tokenizer.no_padding()
+            logging.info(f"Loaded tokenizer for chunking from {path}")
+            return tokenizer
+
+    logging.warning(f"No local tokenizer found for {model_name}, approximating token counts")
+    return None
+
+@lru_cache(maxsize=None)
+def model_max_length(model_name: str) -> Optional[int]:
+    """Word pieces the model reads per input, from the configs downloaded with it, or None.
+
+    sentence-transformers truncates at its max_seq_length, which can be below
+    the tokenizer's model_max_length, so that is preferred.
+    """
+    for config_name, key in (("sentence_bert_config.json", "max_seq_length"), ("tokenizer_config.json", "model_max_length")):
+        for path in sorted(glob.glob(os.path.join("models", model_name, "**", config_name), recursive=True)):
+            try:
+                with open(path) as f:
+                    value = json.load(f).get(key)
+            except (OSError, ValueError):
+                continue
+            # Tokenizers without a limit report a huge sentinel
+            if isinstance(value, int) and 0 < value < 1_000_000:
+                return value
+    return None
+
+class TokenChunker:
+    """Splits text into chunks that fit the embedding model's input window.
+
+    Lengths are measured in the model's own word pieces. Each text is
+    tokenized once; chunks are packed from whole sentences, preferring to end
+    at a paragraph break, and repeat up to ``overlap_tokens`` of trailing
+    sentences from the previous chunk.
+    """
+    def __init__(self, model_name: str = None, max_tokens: int = None, overlap_tokens: int = None, tokenizer=None):
+        """Initialize the chunker.
+
+        Args:
+            model_name: Embedding model whose tokenizer measures length (defaults to EMBEDDING_MODEL)
+            max_tokens: Token budget of a chunk (defaults to CHUNK_MAX_TOKENS, else the model's
+                input limit minus its special tokens)
+            overlap_tokens: Tokens of trailing sentences repeated in the next chunk (defaults to CHUNK_OVERLAP_TOKENS)
+            tokenizer: Tokenizer to use instead of loading the model's one
+        """
+        self.model_name = model_name or embedding_model_name()
+        self.overlap_tokens = overlap_tokens if overlap_tokens is not None else int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+        self._tokenizer = tokenizer
+        self.max_tokens = max_tokens or int(os.getenv("CHUNK_MAX_TOKENS", "0")) or self._model_max_tokens()
+
+    def _model_max_tokens(self) -> int:
+        """The model's input limit minus the special tokens added to every input."""
+        limit = model_max_length(self.model_name)
+        if limit is None:
+            logging.warning(f"Input limit of {self.model_name} unknown, chunking to {FALLBACK_MAX_TOKENS} tokens")
+            return FALLBACK_MAX_TOKENS
+        post_processor = self.tokenizer.post_processor if self.tokenizer is not None else None
+        special = post_processor.num_special_tokens_to_add(False) if post_processor is not None else 2
+        return limit - special
+
+    @property
+    def tokenizer(self):
+        """The model's tokenizer, loaded on first use (None when approximating)."""
+        if self._tokenizer is None:
+            self._tokenizer = load_tokenizer(self.model_name) or False
+        return self._tokenizer or None
+
+    def token_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """Character span of every token of the text, without special tokens."""
+        if self.tokenizer is not None:
+            return [offset for offset in self.tokenizer.encode(text, add_special_tokens=False).offsets
+                    if offset[1] > offset[0]]
+        return [match.span() for match in APPROX_TOKEN_RE.finditer(text)]
+
+    def count_tokens(self, text: str) -> int:
+        """Number of model tokens in the text."""
+        return len(self.token_offsets(text))
+
+    def split(self, text: str) -> List[str]:
+        """Split text into chunks of at most max_tokens tokens.
+
+        Args:
+            text: Cleaned text of a mail
+
+        Returns:
+            Chunk texts in document order
+        """
+        if not text or not text.strip():
+            return []
+
+        offsets = self.token_offsets(text)
+        if len(offsets) <= self.max_tokens:
+            return [text.strip()]
+
+        units = self._units(text, offsets)
+        return [text[chunk[0].start:chunk[-1].end] for chunk in self._pack(units)]
+
+    def _units(self, text: str, offsets: List[Tuple[int, int]]) -> List[_Unit]:
+        """Cut the text into sentences, splitting sentences longer than the budget into token windows."""
+        starts = [start for start, _ in offsets]
+        units = []
+        position = 0
+        boundaries = [(m.start(), m.end(), m.group().count("\n") >= 2) for m in BOUNDARY_RE.finditer(text)]
+        for end, next_start, paragraph_end in boundaries + [(len(text), len(text), True)]:
+            first = bisect.bisect_left(starts, position)
+            last = bisect.bisect_left(starts, end)
+            if last > first:
+                if last - first <= self.max_tokens:
+                    units.append(_Unit(offsets[first][0], offsets[last - 1][1], last - first, paragraph_end))
+                else:
+                    for window in range(first, last, self.max_tokens):
+                        window_end = min(window + self.max_tokens, last)
+                        units.append(_Unit(offsets[window][0], offsets[window_end - 1][1], window_end - window,
+                                           paragraph_end and window_end == last, whole_sentence=False))
+            position = next_start
+        return units
+
+    def _pack(self, units: List[_Unit]) -> List[List[_Unit]]:
+        """Greedily pack units into chunks within the token budget."""
+        chunks = []
+        current: List[_Unit] = []
+        for unit in units:
+            if current and _tokens(current) + unit.tokens > self.max_tokens:
+                cut = self._cut(current)
+                emitted, remaining = current[:cut], current[cut:]
+                chunks.append(emitted)
+                current = self._overlap(emitted) + remaining
+                if _tokens(current) + unit.tokens > self.max_tokens:
+                    # No room for overlap
+                    current = remaining
+                if remaining and _tokens(remaining) + unit.tokens > self.max_tokens:
+                    chunks.append(remaining)
+                    current = []
+            current.append(unit)
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _cut(self, units: List[_Unit]) -> int:
+        """Index to end a full chunk at: the last paragraph break past half the budget, else everything."""
+        tokens = 0
+        cut = len(units)
+        for index, unit in enumerate(units, 1):
+            tokens += unit.tokens
+            if unit.paragraph_end and tokens >= self.max_tokens // 2 and index < len(units):
+                cut = index
+        return cut
+
+    def _overlap(self, units: List[_Unit]) -> List[_Unit]:
+        """Trailing whole sentences of a chunk that fit in the overlap budget."""
+        overlap = []
+        tokens = 0
+        for unit in reversed(units):
+            if not unit.whole_sentence or tokens + unit.tokens > self.overlap_tokens:
+                break
+            overlap.insert(0, unit)
+            tokens += unit.tokens
+        return overlap
@@ -1,21 +1,50 @@
 import imaplib
-import email
-from email.policy import default
+import logging
+import select
+import ssl
+import threading
+import time
+from contextlib import closing
 from ..types import Mail, ImapAuth
+from .imap_pool import ImapConnectionPool
+from .imap_utils import (
+    format_uid_set, plan_fetch_batches, iter_fetch_literals, parse_sizes, parse_fetch_response, PendingUids,
+    quote_mailbox, parse_list_response, get_fetch_mode
+)
+from .bodystructure import find_text_part, build_text_message
+from .mail_parser import parse_mail
+from .raw_mail_store import RawMailStore
+from .mails_types import SyncCheckpoint
 import os
-from typing import List
-import ssl
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
+class _FetchCancelled(Exception):
+    """Raised in the fetching thread once the consumer of stream_emails has stopped."""
+
 class ImapManager:
     """Manages email fetching from Gmail via IMAP using the standard imaplib."""
-    def __init__(self, auth: ImapAuth):
+    def __init__(self, auth: ImapAuth, raw_store: Optional[RawMailStore] = None):
         self.auth = auth
+        self.raw_store = raw_store  # Local cache consulted before the server
         self.host = "imap.gmail.com"
         self.port = 993
         self.max_emails = int(os.getenv("MAX_EMAILS_TO_FETCH", "1"))  # Configurable limit
-        self._executor = ThreadPoolExecutor(max_workers=1)
+        pool_size = int(os.getenv("IMAP_POOL_SIZE", "2"))
+        self._pool = ImapConnectionPool(
+            auth,
+            self.host,
+            self.port,
+            max_size=pool_size,
+            health_check_interval=float(os.getenv("IMAP_HEALTH_CHECK_INTERVAL", "30"))
+        )
+        # Budget for a single pipelined FETCH command (0 disables a limit)
+        self.fetch_max_messages = int(os.getenv("IMAP_FETCH_MAX_MESSAGES", "50"))
+        self.fetch_max_bytes = int(os.getenv("IMAP_FETCH_MAX_BYTES", "0"))
+        self.fetch_mode = get_fetch_mode()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size)
+        self._pending_uids = PendingUids()
 
     async def test_login(self) -> bool:
         """Test IMAP login without fetching emails."""
@@ -25,285 +54,419 @@ class ImapManager:
     
     def _test_login_sync(self) -> bool:
         """Synchronous implementation of login testing."""
-        context = ssl.create_default_context()
-        client = imaplib.IMAP4_SSL(self.host, self.port, ssl_context=context)
-        
         try:
-            # Try to login
-            client.login(self.auth.email, self.auth.password)
-            
-            # If login succeeds, send a NOOP command to verify connection
-            status, _ = client.noop()
-            return status == 'OK'
-            
+            # Borrowing a session logs in; NOOP verifies the connection
+            with self._pool.connection(mailbox=None) as client:
+                status, _ = client.noop()
+                return status == 'OK'
         except Exception as e:
             print(f"Login test failed: {e}")
             return False
-            
-        finally:
-            # Always logout and close the connection
-            try:
-                client.logout()
-            except:
-                pass
 
-    async def fetch_emails(self) -> List[Mail]:
-        """Fetch a limited number of recent emails asynchronously by running in a thread."""
-        # Run the synchronous code in a thread pool
+    async def list_folders(self) -> List[str]:
+        """List the names of all selectable folders."""
         return await asyncio.get_event_loop().run_in_executor(
-            self._executor, self._fetch_emails_sync
+            self._executor, self._list_folders_sync
         )
     
-    def _fetch_emails_sync(self) -> List[Mail]:
-        """Synchronous implementation of email fetching."""
-        # Create a context with the desired protocol
-        context = ssl.create_default_context()
-        
-        # Connect to the IMAP server
-        client = imaplib.IMAP4_SSL(self.host, self.port, ssl_context=context)
-        
-        try:
-            # Login
-            client.login(self.auth.email, self.auth.password)
-            
-            # Select the inbox
-            client.select("INBOX")
-            
-            # Search for all emails
-            status, data = client.search(None, "ALL")
+    def _list_folders_sync(self) -> List[str]:
+        """Synchronous implementation of folder discovery."""
+        def list_folders(client) -> List[str]:
+            status, data = client.list()
             if status != "OK":
-                print(f"Error searching for emails: {status}")
+                print(f"Error listing folders: {status}")
                 return []
-            
-            # Get the list of email IDs
-            email_ids = data[0].split()
-            
-            # Take only the most recent emails (limited by max_emails)
-            recent_ids = email_ids[-self.max_emails:] if email_ids else []
-            
-            emails = []
-            for email_id in recent_ids:
-                # Fetch the email
-                status, data = client.fetch(email_id, "(RFC822)")
-                if status != "OK":
-                    print(f"Error fetching email {email_id}: {status}")
-                    continue
-                
-                # The email content is in the second element of the first tuple in data
-                raw_email = data[0][1]
-                
-                try:
-                    # Parse the email
-                    msg = email.message_from_bytes(raw_email, policy=default)
-                    
-                    # Create a Mail object
-                    mail = Mail(
-                        uid=email_id.decode(),
-                        subject=msg["Subject"] or "",
-                        from_=msg["From"] or "",
-                        to=msg["To"] or "",
-                        date=msg["Date"] or "",
-                        body=self._get_email_body(msg)
-                    )
-                    emails.append(mail)
-                except Exception as e:
-                    print(f"Error parsing email {email_id}: {e}")
-            
-            return emails
+            return parse_list_response(data)
         
-        finally:
-            # Always logout and close the connection
-            try:
-                client.close()
-            except:
-                pass
-            client.logout()
-
-    def _get_email_body(self, msg) -> str:
-        """Extract plain text body from email."""
-        if msg.is_multipart():
-            for part in msg.walk():
-                if part.get_content_type() == "text/plain":
-                    try:
-                        return part.get_payload(decode=True).decode()
-                    except:
-                        return ""
-        else:
-            try:
-                return msg.get_payload(decode=True).decode()
-            except:
-                return ""
-        return ""
+        return self._pool.run(list_folders, mailbox=None)
 
-    async def get_total_email_count(self) -> int:
-        """Get the total number of emails in the inbox."""
+    async def get_total_email_count(self, folder: str = "INBOX") -> int:
+        """Get the total number of emails in a folder."""
         return await asyncio.get_event_loop().run_in_executor(
-            self._executor, self._get_total_email_count_sync
+            self._executor, lambda: self._get_total_email_count_sync(folder)
         )
     
-    def _get_total_email_count_sync(self) -> int:
+    def _get_total_email_count_sync(self, folder: str = "INBOX") -> int:
         """Synchronous implementation of getting total email count."""
-        context = ssl.create_default_context()
-        client = imaplib.IMAP4_SSL(self.host, self.port, ssl_context=context)
-        
-        try:
-            # Login
-            client.login(self.auth.email, self.auth.password)
-            
-            # Select the inbox
-            client.select("INBOX")
-            
-            # Search for all emails
-            status, data = client.search(None, "ALL")
+        def count(client) -> int:
+            # STATUS reports the message count without listing every ID
+            status, data = client.status(quote_mailbox(folder), "(MESSAGES)")
             if status != "OK":
-                print(f"Error searching for emails: {status}")
+                print(f"Error getting mailbox status: {status}")
                 return 0
             
-            # Count the email IDs
-            email_ids = data[0].split()
-            return len(email_ids)
-            
+            fields = data[0].decode().rsplit("(", 1)[1].rstrip(")").split()
+            return int(dict(zip(fields[::2], fields[1::2]))["MESSAGES"])
+        
+        try:
+            return self._pool.run(count, mailbox=None)
         except Exception as e:
             print(f"Error getting email count: {e}")
             return 0
-            
-        finally:
-            # Always logout and close the connection
-            try:
-                client.logout()
-            except:
-                pass
     
-    async def fetch_email_by_id(self, email_id: str) -> Mail:
-        """Fetch a specific email by its ID."""
+    async def fetch_email_by_id(self, email_id: str, folder: str = "INBOX", uidvalidity: int = None) -> Mail:
+        """Fetch a specific email by its UID.
+
+        Args:
+            email_id: UID of the email
+            folder: Folder of the email
+            uidvalidity: UIDVALIDITY the UID belongs to, if known (e.g. from the folder's
+                sync checkpoint); lets a cached copy be served without contacting the server
+        """
         return await asyncio.get_event_loop().run_in_executor(
-            self._executor, lambda: self._fetch_email_by_id_sync(email_id)
+            self._executor, lambda: self._fetch_email_by_id_sync(email_id, folder, uidvalidity)
         )
     
-    def _fetch_email_by_id_sync(self, email_id: str) -> Mail:
+    def _fetch_email_by_id_sync(self, email_id: str, folder: str = "INBOX", uidvalidity: int = None) -> Mail:
         """Synchronous implementation of fetching a specific email."""
-        context = ssl.create_default_context()
-        client = imaplib.IMAP4_SSL(self.host, self.port, ssl_context=context)
+        if self.raw_store:
+            raw_email = self.raw_store.get(self.auth.email, folder, uidvalidity, int(email_id),
+                                           allow_partial=self.fetch_mode == "text")
+            if raw_email is not None:
+                return parse_mail(email_id, raw_email, folder)
+        
+        def fetch(client) -> Mail:
+            # Fetch the email by its UID
+            mails = self._fetch_uids(client, [int(email_id)], folder)
+            if not mails:
+                raise Exception(f"Error fetching email {email_id}: not found")
+            return mails[0]
         
         try:
-            # Login
-            client.login(self.auth.email, self.auth.password)
-            
-            # Select the inbox
-            client.select("INBOX")
-            
-            # Fetch the email
-            status, data = client.fetch(email_id.encode(), "(RFC822)")
-            if status != "OK":
-                raise Exception(f"Error fetching email {email_id}: {status}")
-            
-            # The email content is in the second element of the first tuple in data
-            raw_email = data[0][1]
-            
-            # Parse the email
-            msg = email.message_from_bytes(raw_email, policy=default)
-            
-            # Create a Mail object
-            return Mail(
-                uid=email_id,
-                subject=msg["Subject"] or "",
-                from_=msg["From"] or "",
-                to=msg["To"] or "",
-                date=msg["Date"] or "",
-                body=self._get_email_body(msg)
-            )
-            
+            return self._pool.run(fetch, mailbox=folder)
         except Exception as e:
             print(f"Error fetching email {email_id}: {e}")
             raise
-            
-        finally:
-            # Always logout and close the connection
+    
+    async def fetch_emails(self, max_emails: int = None, checkpoint: SyncCheckpoint = None) -> List[Mail]:
+        """Fetch the next emails after a sync checkpoint, oldest first.
+
+        Args:
+            max_emails: Maximum number of emails to fetch
+            checkpoint: Sync position; its UIDVALIDITY is updated (and the position reset)
+                when the server reports a new one. The caller advances ``last_uid``.
+
+        Returns:
+            Emails whose UIDs are greater than ``checkpoint.last_uid``
+        """
+        return [mail async for mail in self.stream_emails(max_emails, checkpoint)]
+
+    async def stream_emails(self, max_emails: int = None, checkpoint: SyncCheckpoint = None,
+                            requested: List[int] = None) -> AsyncIterator[Mail]:
+        """Like fetch_emails, but yield each email as soon as it has been received and parsed.
+
+        Args:
+            max_emails: Maximum number of emails to fetch
+            checkpoint: Sync position, as for fetch_emails
+            requested: Filled with every UID requested from the server, so callers
+                can tell UIDs whose FETCH or parsing failed from ones never asked for
+        """
+        loop = asyncio.get_event_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        cancelled = threading.Event()
+        
+        def deliver(item) -> None:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        
+        def on_mail(mail: Mail) -> None:
+            if cancelled.is_set():
+                raise _FetchCancelled()
+            deliver(mail)
+        
+        def run() -> None:
+            try:
+                self._fetch_emails_sync(max_emails, checkpoint, on_mail=on_mail, requested=requested)
+            finally:
+                deliver(done)
+        
+        future = loop.run_in_executor(self._executor, run)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                yield item
+        except BaseException:
+            # The consumer stopped early: stop the fetching thread at its next
+            # email and wait for it, so no FETCH outlives the stream
+            cancelled.set()
             try:
-                client.close()
-            except:
+                await future
+            except Exception:
                 pass
-            client.logout()
+            raise
+        # Surface errors raised in the fetching thread
+        await future
     
-    async def fetch_emails(self, max_emails: int = None, exclude_ids: set = None) -> List[Mail]:
-        """Fetch a limited number of recent emails, optionally excluding specific IDs."""
+    def _fetch_emails_sync(self, max_emails: int = None, checkpoint: SyncCheckpoint = None,
+                           on_mail: Callable[[Mail], None] = None, requested: List[int] = None) -> List[Mail]:
+        """Synchronous implementation of incremental email fetching.
+
+        Messages are requested with as few pipelined UID FETCH commands as the
+        configured budget allows and parsed one by one as their literals arrive.
+        """
         if max_emails is None:
             max_emails = self.max_emails
             
-        return await asyncio.get_event_loop().run_in_executor(
-            self._executor, lambda: self._fetch_emails_sync(max_emails, exclude_ids)
-        )
-    
-    def _fetch_emails_sync(self, max_emails: int = None, exclude_ids: set = None) -> List[Mail]:
-        """Synchronous implementation of email fetching with exclusion support."""
-        if max_emails is None:
-            max_emails = self.max_emails
+        if checkpoint is None:
+            checkpoint = SyncCheckpoint()
+        
+        emails = []
+        delivered = set()  # Survives a reconnect so nothing is handed out twice
+        
+        def fetch(client) -> List[Mail]:
+            uids = [uid for uid in self._next_uids(client, checkpoint, max_emails) if uid not in delivered]
+            if not uids:
+                return emails
+            if requested is not None:
+                requested.extend(uid for uid in uids if uid not in requested)
             
-        if exclude_ids is None:
-            exclude_ids = set()
+            def deliver(mail: Mail) -> None:
+                delivered.add(int(mail.uid))
+                emails.append(mail)
+                if on_mail:
+                    on_mail(mail)
             
-        # Create a context with the desired protocol
-        context = ssl.create_default_context()
+            self._fetch_uids(client, uids, checkpoint.mailbox, deliver)
+            return emails
         
-        # Connect to the IMAP server
-        client = imaplib.IMAP4_SSL(self.host, self.port, ssl_context=context)
+        return self._pool.run(fetch, mailbox=checkpoint.mailbox)
+
+    def _fetch_uids(self, client, uids: List[int], folder: str,
+                    on_mail: Callable[[Mail], None] = None) -> List[Mail]:
+        """Fetch and parse the given UIDs of the selected folder in budgeted, pipelined commands.
+
+        Messages in the raw mail store are served from disk; everything fetched is stored.
+        """
+        emails = []
+        uidvalidity = getattr(client, "uidvalidity", None)
+        partial = self.fetch_mode == "text"
+        
+        def deliver(uid: int, raw_email: bytes, cached: bool = False) -> None:
+            if self.raw_store and not cached:
+                self.raw_store.put(self.auth.email, folder, uidvalidity, uid, raw_email, partial)
+            try:
+                mail = parse_mail(str(uid), raw_email, folder)
+            except Exception as e:
+                print(f"Error parsing email {uid}: {e}")
+                return
+            emails.append(mail)
+            if on_mail:
+                on_mail(mail)
+        
+        if self.raw_store:
+            cached = self.raw_store.get_many(self.auth.email, folder, uidvalidity, uids, allow_partial=partial)
+            for uid in uids:
+                if uid in cached:
+                    deliver(uid, cached[uid], cached=True)
+            uids = [uid for uid in uids if uid not in cached]
+            if not uids:
+                return emails
+        
+        sizes = self._fetch_sizes(client, uids) if self.fetch_max_bytes else None
+        for batch in plan_fetch_batches(uids, sizes, self.fetch_max_messages, self.fetch_max_bytes):
+            if self.fetch_mode == "text":
+                self._fetch_text_parts(client, batch, deliver)
+            else:
+                with closing(self._iter_fetch(client, batch, "(UID RFC822)")) as fetched:
+                    for uid, raw_email in fetched:
+                        deliver(uid, raw_email)
+        return emails
+
+    def _fetch_text_parts(self, client, uids: List[int], deliver: Callable[[int, bytes], None]) -> None:
+        """Fetch headers and BODYSTRUCTURE, then only the chosen text part of each message.
+
+        Messages sharing a part section are fetched together with BODY.PEEK, which
+        also leaves the \\Seen flag untouched.
+        """
+        headers = {}
+        by_section = {}
+        query = "(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (SUBJECT FROM TO DATE MESSAGE-ID)])"
+        with closing(self._iter_fetch_responses(client, uids, query)) as responses:
+            for response in responses:
+                items = parse_fetch_response(response)
+                if b"UID" not in items:
+                    continue
+                uid = int(items[b"UID"])
+                header = next((value for key, value in items.items() if key.startswith(b"BODY[HEADER")), None) or b""
+                part = find_text_part(items.get(b"BODYSTRUCTURE") or [])
+                if part is None:
+                    # Nothing to index, but still hand the headers downstream
+                    deliver(uid, header)
+                    continue
+                headers[uid] = (header, part)
+                by_section.setdefault(part.section, []).append(uid)
         
+        for section, section_uids in by_section.items():
+            with closing(self._iter_fetch(client, section_uids, f"(UID BODY.PEEK[{section}])")) as fetched:
+                for uid, body in fetched:
+                    if uid in headers:
+                        header, part = headers.pop(uid)
+                        deliver(uid, build_text_message(header, part, body))
+
+    def _fetch_sizes(self, client, uids: List[int]) -> Dict[int, int]:
+        """Fetch RFC822.SIZE for the given UIDs in one command."""
+        status, data = client.uid("FETCH", format_uid_set(uids), "(RFC822.SIZE)")
+        if status != "OK":
+            print(f"Error fetching message sizes: {status}")
+            return {}
+        return parse_sizes(data)
+
+    def _iter_fetch(self, client, uids: List[int], query: str) -> Iterator[Tuple[int, bytes]]:
+        """Issue a single UID FETCH for a whole UID set and yield each literal as soon as it is read."""
+        with closing(self._iter_fetch_responses(client, uids, query)) as responses:
+            for response in responses:
+                yield from iter_fetch_literals(response)
+
+    def _iter_fetch_responses(self, client, uids: List[int], query: str) -> Iterator[list]:
+        """Issue a single UID FETCH and yield each message's untagged response as soon as it is read.
+
+        imaplib only returns after the tagged completion, so the responses are
+        read one at a time through its internal response reader instead. If the
+        iteration stops before the tagged completion, the FETCH is still in
+        flight: the session is shut down and marked broken so the pool drops it.
+        Consumers close the iterator (contextlib.closing) so this happens before
+        the session is returned.
+        """
+        client.untagged_responses.pop("FETCH", None)
+        tag = client._command("UID", "FETCH", format_uid_set(uids), query)
+        completed = False
         try:
-            # Login
-            client.login(self.auth.email, self.auth.password)
+            while client.tagged_commands[tag] is None:
+                client._get_response()
+                response = client.untagged_responses.pop("FETCH", [])
+                if response:
+                    yield response
             
-            # Select the inbox
-            client.select("INBOX")
-            
-            # Search for all emails
-            status, data = client.search(None, "ALL")
-            if status != "OK":
-                print(f"Error searching for emails: {status}")
-                return []
-            
-            # Get the list of email IDs
-            all_email_ids = data[0].split()
-            
-            # Filter out already processed emails
-            unprocessed_ids = [eid for eid in all_email_ids if eid.decode() not in exclude_ids]
-            
-            # Take only the most recent unprocessed emails (limited by max_emails)
-            recent_ids = unprocessed_ids[-max_emails:] if unprocessed_ids else []
+            status, data = client._command_complete("UID", tag)
+            completed = True
+        finally:
+            if not completed:
+                client.broken = True
+                try:
+                    client.shutdown()
+                except Exception:
+                    pass
+        if status != "OK":
+            print(f"Error fetching emails {format_uid_set(uids)}: {status} {data}")
+
+    def _next_uids(self, client, checkpoint: SyncCheckpoint, max_emails: int) -> List[int]:
+        """Return up to max_emails UIDs above the checkpoint, searching the server only when needed."""
+        self._pending_uids.validate(checkpoint, getattr(client, "uidvalidity", None))
+        uids = self._pending_uids.take(checkpoint, max_emails)
+        if uids:
+            return uids
+        
+        # Only ask for messages newer than the checkpoint
+        status, data = client.uid("SEARCH", None, f"UID {checkpoint.last_uid + 1}:*")
+        if status != "OK":
+            print(f"Error searching for emails: {status}")
+            return []
+        
+        self._pending_uids.add(checkpoint, [int(uid) for uid in data[0].split()])
+        return self._pending_uids.take(checkpoint, max_emails)
+
+    async def wait_for_new_mail(self, folder: str = "INBOX", timeout: float = 600) -> Optional[bool]:
+        """Wait with IMAP IDLE until the server reports new mail in a folder.
+
+        Args:
+            folder: Folder to watch
+            timeout: Seconds to idle before giving up
+
+        Returns:
+            True if new mail arrived, False on timeout, None if the server has no IDLE support
+        """
+        return await asyncio.get_event_loop().run_in_executor(
+            self._executor, lambda: self._wait_for_new_mail_sync(folder, timeout)
+        )
+
+    def _wait_for_new_mail_sync(self, folder: str, timeout: float) -> Optional[bool]:
+        """Synchronous implementation of IDLE (imaplib has no IDLE command before Python 3.14).
+
+        A session whose IDLE did not end with its tagged reply may still be idling,
+        so any failure discards it instead of returning it to the pool.
+        """
+        def idle(client) -> Optional[bool]:
+            if "IDLE" not in client.capabilities:
+                return None
             
-            emails = []
-            for email_id in recent_ids:
-                # Fetch the email
-                status, data = client.fetch(email_id, "(RFC822)")
-                if status != "OK":
-                    print(f"Error fetching email {email_id}: {status}")
-                    continue
+            tag = client._new_tag()
+            client.tagged_commands.pop(tag, None)
+            client.send(tag + b" IDLE\r\n")
+            changed = False
+            try:
+                # Untagged updates may arrive before the continuation
+                while True:
+                    line = client.readline()
+                    if not line:
+                        raise imaplib.IMAP4.abort("connection closed during IDLE")
+                    if line.startswith(b"+"):
+                        break
+                    if line.startswith(tag):
+                        # The server refused IDLE; the command is complete and the session usable
+                        logging.warning(f"IDLE rejected: {line.decode(errors='replace').strip()}")
+                        return None
+                    changed = changed or b"EXISTS" in line
                 
-                # The email content is in the second element of the first tuple in data
-                raw_email = data[0][1]
+                # Wait without a blocking read so a timeout leaves the session usable;
+                # other updates (RECENT, FETCH, EXPUNGE) keep the wait going
+                deadline = time.monotonic() + timeout
+                while not changed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._wait_readable(client, remaining):
+                        break
+                    line = client.readline()
+                    if not line:
+                        raise imaplib.IMAP4.abort("connection closed during IDLE")
+                    changed = b"EXISTS" in line
                 
-                try:
-                    # Parse the email
-                    msg = email.message_from_bytes(raw_email, policy=default)
-                    
-                    # Create a Mail object
-                    mail = Mail(
-                        uid=email_id.decode(),
-                        subject=msg["Subject"] or "",
-                        from_=msg["From"] or "",
-                        to=msg["To"] or "",
-                        date=msg["Date"] or "",
-                        body=self._get_email_body(msg)
-                    )
-                    emails.append(mail)
-                except Exception as e:
-                    print(f"Error parsing email {email_id}: {e}")
-            
-            return emails
+                client.send(b"DONE\r\n")
+                while True:
+                    line = client.readline()
+                    if not line:
+                        raise imaplib.IMAP4.abort("connection closed during IDLE")
+                    if line.startswith(tag):
+                        break
+                    changed = changed or b"EXISTS" in line
+            except imaplib.IMAP4.abort:
+                raise
+            except Exception as e:
+                raise imaplib.IMAP4.abort(f"IDLE failed: {e}") from e
+            return changed
         
+        # No retry on a fresh session: that could wait out a second full timeout,
+        # while the caller falls back to polling on errors anyway
+        with self._pool.connection(folder) as client:
+            return idle(client)
+
+    def _wait_readable(self, client, timeout: float) -> bool:
+        """Wait until a response can be read, counting data already buffered by imaplib or TLS.
+
+        Lines arriving in the same packet as an earlier one sit in imaplib's
+        buffered reader, where select() on the socket cannot see them, so the
+        buffer is peeked without blocking first.
+        """
+        sock = client.sock
+        previous_timeout = sock.gettimeout()
+        sock.setblocking(False)
+        try:
+            buffered = client.file.peek(1)
+        except (BlockingIOError, ssl.SSLWantReadError):
+            buffered = b""
         finally:
-            # Always logout and close the connection
-            try:
-                client.close()
-            except:
-                pass
-            client.logout()
\ No newline at end of file
+            sock.settimeout(previous_timeout)
+        if buffered:
+            return True
+        # Decrypted bytes held by the TLS layer (SSL sockets only)
+        pending = getattr(sock, "pending", None)
+        if pending is not None and pending():
+            return True
+        return bool(select.select([sock], [], [], timeout)[0])
+
+    async def close(self) -> None:
+        """Close all pooled IMAP connections."""
+        self._pool.close()
+        self._executor.shutdown(wait=False)
+        if self.raw_store:
+            self.raw_store.close()
@@ -0,0 +1,177 @@
+import imaplib
+import logging
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional, TypeVar
+from ..types import ImapAuth
+from .imap_utils import quote_mailbox
+
+T = TypeVar("T")
+
+# Errors that mean the underlying session is unusable and must be replaced
+CONNECTION_ERRORS = (imaplib.IMAP4.abort, ssl.SSLError, OSError, EOFError)
+
+
+class _PooledConnection:
+    """An authenticated IMAP session together with its bookkeeping."""
+    def __init__(self, client: imaplib.IMAP4_SSL):
+        self.client = client
+        self.mailbox: Optional[str] = None
+        self.last_used = time.monotonic()
+
+
+class ImapConnectionPool:
+    """Thread-safe pool of authenticated, selected IMAP sessions.
+
+    Sessions are created lazily, reused across operations and health-checked
+    with NOOP when they have been idle for a while. Broken sessions are
+    discarded and replaced transparently.
+    """
+    def __init__(self, auth: ImapAuth, host: str, port: int, max_size: int = 2,
+                 health_check_interval: float = 30.0):
+        """Initialize the pool.
+
+        Args:
+            auth: IMAP credentials used for every session
+            host: IMAP server host
+            port: IMAP server port
+            max_size: Maximum number of concurrently open sessions
+            health_check_interval: Idle seconds after which a session is NOOP-checked before reuse
+        """
+        self.auth = auth
+        self.host = host
+        self.port = port
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self._idle: List[_PooledConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._closed = False
+
+    def _connect(self) -> _PooledConnection:
+        """Open a new session and log in."""
+        context = ssl.create_default_context()
+        client = imaplib.IMAP4_SSL(self.host, self.port, ssl_context=context)
+        try:
+            client.login(self.auth.email, self.auth.password)
+        except Exception:
+            self._logout(client)
+            raise
+        logging.info(f"Opened new IMAP connection to {self.host}")
+        return _PooledConnection(client)
+
+    def _logout(self, client: imaplib.IMAP4_SSL) -> None:
+        """Log out, ignoring errors from already broken sessions."""
+        try:
+            client.logout()
+        except Exception:
+            pass
+
+    def _is_alive(self, conn: _PooledConnection) -> bool:
+        """Check an idle session with NOOP if it has not been used recently."""
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return True
+        try:
+            status, _ = conn.client.noop()
+            return status == "OK"
+        except Exception:
+            return False
+
+    def _acquire(self, mailbox: Optional[str]) -> _PooledConnection:
+        """Take a healthy session from the pool or open a new one."""
+        conn = None
+        while conn is None:
+            with self._lock:
+                candidate = self._idle.pop() if self._idle else None
+            if candidate is None:
+                conn = self._connect()
+            elif self._is_alive(candidate):
+                conn = candidate
+            else:
+                logging.info("Discarding stale IMAP connection")
+                self._logout(candidate.client)
+
+        if mailbox is not None and conn.mailbox != mailbox:
+            try:
+                status, data = conn.client.select(quote_mailbox(mailbox))
+            except Exception:
+                self._logout(conn.client)
+                raise
+            if status != "OK":
+                self._release(conn)
+                raise imaplib.IMAP4.error(f"Error selecting mailbox {mailbox}: {data}")
+            conn.mailbox = mailbox
+            # Remember the mailbox's UIDVALIDITY so UID-based callers can validate checkpoints
+            _, uidvalidity = conn.client.response("UIDVALIDITY")
+            conn.client.uidvalidity = int(uidvalidity[0]) if uidvalidity and uidvalidity[0] else None
+        return conn
+
+    def _release(self, conn: _PooledConnection) -> None:
+        """Return a session to the pool, unless an operation marked it broken."""
+        if getattr(conn.client, "broken", False):
+            logging.info("Discarding IMAP connection left in an unknown state")
+            self._logout(conn.client)
+            return
+        conn.last_used = time.monotonic()
+        with self._lock:
+            if not self._closed:
+                self._idle.append(conn)
+                return
+        self._logout(conn.client)
+
+    @contextmanager
+    def connection(self, mailbox: Optional[str] = "INBOX"):
+        """Borrow a session with the given mailbox selected.
+
+        Args:
+            mailbox: Mailbox to have selected, or None to leave the selection untouched
+
+        Yields:
+            An authenticated imaplib client; its ``uidvalidity`` attribute holds the
+            UIDVALIDITY reported when the mailbox was selected
+        """
+        if self._closed:
+            raise RuntimeError("IMAP connection pool is closed")
+        self._slots.acquire()
+        try:
+            conn = self._acquire(mailbox)
+            try:
+                yield conn.client
+            except CONNECTION_ERRORS:
+                self._logout(conn.client)
+                raise
+            except BaseException:
+                self._release(conn)
+                raise
+            else:
+                self._release(conn)
+        finally:
+            self._slots.release()
+
+    def run(self, operation: Callable[[imaplib.IMAP4_SSL], T], mailbox: Optional[str] = "INBOX") -> T:
+        """Run an operation on a pooled session, retrying once on a fresh one if the session broke.
+
+        Args:
+            operation: Callable receiving the client
+            mailbox: Mailbox to have selected
+
+        Returns:
+            The operation's result
+        """
+        try:
+            with self.connection(mailbox) as client:
+                return operation(client)
+        except CONNECTION_ERRORS as e:
+            logging.warning(f"IMAP connection failed ({e}), reconnecting")
+            with self.connection(mailbox) as client:
+                return operation(client)
+
+    def close(self) -> None:
+        """Log out all idle sessions and refuse new borrowers."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._logout(conn.client)
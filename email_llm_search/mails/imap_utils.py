@@ -0,0 +1,265 @@
+import logging
+import os
+import re
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+from .mails_types import SyncCheckpoint
+
+UID_RE = re.compile(rb"UID (\d+)")
+SIZE_RE = re.compile(rb"RFC822\.SIZE (\d+)")
+UIDVALIDITY_RE = re.compile(rb"UIDVALIDITY (\d+)")
+FETCH_START_RE = re.compile(rb"^(\d+) FETCH (.*)$", re.DOTALL)
+# "full" downloads whole messages, "text" only the text part chosen from BODYSTRUCTURE
+FETCH_MODES = ("full", "text")
+
+def get_fetch_mode() -> str:
+    """The fetch mode selected by IMAP_FETCH_MODE, falling back to "full" for unknown values."""
+    mode = os.getenv("IMAP_FETCH_MODE", "full")
+    if mode not in FETCH_MODES:
+        logging.warning(f"Unknown IMAP_FETCH_MODE {mode}, using full")
+        return "full"
+    return mode
+
+def format_uid_set(uids: List[int]) -> str:
+    """Format UIDs as a compact IMAP sequence set, e.g. [1, 2, 3, 7] -> "1:3,7"."""
+    ranges = []
+    for uid in sorted(uids):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ",".join(str(a) if a == b else f"{a}:{b}" for a, b in ranges)
+
+def plan_fetch_batches(uids: List[int], sizes: Optional[Dict[int, int]] = None,
+                       max_messages: int = 50, max_bytes: int = 0) -> List[List[int]]:
+    """Split UIDs into FETCH commands bounded by a message and byte budget.
+
+    Args:
+        uids: UIDs to fetch, in order
+        sizes: RFC822.SIZE per UID, required for the byte budget
+        max_messages: Maximum messages per command (0 for no limit)
+        max_bytes: Maximum total message size per command (0 for no limit)
+
+    Returns:
+        Consecutive groups of UIDs; a message larger than the byte budget gets its own group
+    """
+    batches = []
+    current: List[int] = []
+    current_bytes = 0
+    for uid in uids:
+        size = sizes.get(uid, 0) if sizes else 0
+        full = max_messages and len(current) >= max_messages
+        too_big = max_bytes and current and current_bytes + size > max_bytes
+        if full or too_big:
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(uid)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+def iter_fetch_literals(responses: list) -> Iterator[Tuple[int, bytes]]:
+    """Yield (uid, literal) pairs from untagged FETCH response items.
+
+    Each message arrives as a ``(header, literal)`` tuple followed by the trailer
+    bytes, and the UID may be reported before or after the literal.
+    """
+    for i, item in enumerate(responses):
+        if not isinstance(item, tuple):
+            continue
+        header, literal = item
+        trailer = responses[i + 1] if i + 1 < len(responses) and isinstance(responses[i + 1], bytes) else b""
+        match = UID_RE.search(header + b" " + trailer)
+        if match:
+            yield int(match.group(1)), literal
+
+def parse_sizes(responses: list) -> Dict[int, int]:
+    """Parse RFC822.SIZE per UID from untagged FETCH response lines."""
+    sizes = {}
+    for item in responses:
+        line = item[0] if isinstance(item, tuple) else item
+        if not line:
+            continue
+        uid, size = UID_RE.search(line), SIZE_RE.search(line)
+        if uid and size:
+            sizes[int(uid.group(1))] = int(size.group(1))
+    return sizes
+
+LITERAL_MARKER_RE = re.compile(rb"\{\d+\}$")
+
+class _Literal(bytes):
+    """Marks a literal string spliced into the token stream."""
+
+def _tokenize(text: bytes) -> Iterator[object]:
+    """Split IMAP response text into "(", ")", quoted strings and atoms (atoms keep [...] sections intact)."""
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i:i + 1]
+        if c in (b" ", b"\r", b"\n"):
+            i += 1
+        elif c in (b"(", b")"):
+            yield c
+            i += 1
+        elif c == b'"':
+            j, value = i + 1, bytearray()
+            while j < n and text[j:j + 1] != b'"':
+                if text[j:j + 1] == b"\\":
+                    j += 1
+                value += text[j:j + 1]
+                j += 1
+            yield _Literal(bytes(value))
+            i = j + 1
+        else:
+            j, depth = i, 0
+            while j < n:
+                ch = text[j:j + 1]
+                if ch == b"[":
+                    depth += 1
+                elif ch == b"]":
+                    depth -= 1
+                elif depth == 0 and ch in (b" ", b"(", b")"):
+                    break
+                j += 1
+            yield text[i:j]
+            i = j
+
+def _parse_tokens(tokens: Iterator[object]) -> list:
+    """Build nested lists from tokens; NIL becomes None and strings stay bytes."""
+    stack: List[list] = [[]]
+    for token in tokens:
+        if token == b"(" and not isinstance(token, _Literal):
+            stack.append([])
+        elif token == b")" and not isinstance(token, _Literal):
+            if len(stack) > 1:
+                closed = stack.pop()
+                stack[-1].append(closed)
+        elif isinstance(token, _Literal):
+            stack[-1].append(bytes(token))
+        else:
+            stack[-1].append(None if token.upper() == b"NIL" else token)
+    while len(stack) > 1:
+        closed = stack.pop()
+        stack[-1].append(closed)
+    return stack[0]
+
+def parse_fetch_response(responses: list) -> Dict[bytes, object]:
+    """Parse one untagged FETCH response (as collected by imaplib) into its data items.
+
+    Args:
+        responses: The bytes lines and ``(text, literal)`` tuples of a single FETCH response
+
+    Returns:
+        Mapping of upper-cased item names (e.g. ``b"UID"``, ``b"BODYSTRUCTURE"``,
+        ``b"BODY[1]"``) to their values
+    """
+    def tokens() -> Iterator[object]:
+        for item in responses:
+            if isinstance(item, tuple):
+                text, literal = item
+                yield from _tokenize(LITERAL_MARKER_RE.sub(b"", text.rstrip()))
+                yield _Literal(literal)
+            elif item:
+                yield from _tokenize(item)
+    
+    parsed = _parse_tokens(tokens())
+    # "<seq> (<name> <value> ...)"
+    items = next((value for value in parsed if isinstance(value, list)), [])
+    return {
+        bytes(items[i]).upper(): items[i + 1]
+        for i in range(0, len(items) - 1, 2)
+        if isinstance(items[i], bytes)
+    }
+
+
+def quote_mailbox(name: str) -> str:
+    """Quote a mailbox name for use as a command argument (e.g. "[Gmail]/All Mail")."""
+    return '"' + name.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def parse_list_response(lines: list) -> List[str]:
+    """Parse LIST response lines into the names of selectable mailboxes.
+
+    Accepts imaplib's data (bytes lines or ``(text, literal)`` tuples for names
+    sent as literals) as well as aioimaplib lines prefixed with ``LIST``.
+    """
+    names = []
+    for item in lines:
+        if isinstance(item, tuple):
+            text, literal = item
+            parsed = _parse_tokens(_tokenize(LITERAL_MARKER_RE.sub(b"", text.rstrip()))) + [literal]
+        elif item:
+            line = bytes(item)
+            if line.upper().startswith(b"LIST "):
+                line = line[5:]
+            parsed = _parse_tokens(_tokenize(line))
+        else:
+            continue
+        if len(parsed) < 3 or not isinstance(parsed[0], list):
+            continue
+        flags = {bytes(flag).lower() for flag in parsed[0] if flag}
+        if b"\\noselect" in flags or b"\\nonexistent" in flags:
+            continue
+        names.append(bytes(parsed[2]).decode("utf-8", errors="replace"))
+    return names
+
+def group_fetch_lines(lines: list) -> List[list]:
+    """Regroup aioimaplib FETCH lines into per-message responses in imaplib's format.
+
+    aioimaplib returns ``b"<seq> FETCH (... {n}"``, the literal and the trailer
+    as separate lines, followed by the completion text; imaplib stores
+    ``(b"<seq> (... {n}", literal)`` tuples followed by the trailer.
+    """
+    responses: List[list] = []
+    body = list(lines[:-1]) if lines else []
+    i = 0
+    while i < len(body):
+        line = bytes(body[i])
+        match = FETCH_START_RE.match(line)
+        if match:
+            responses.append([])
+            line = match.group(1) + b" " + match.group(2)
+        if not responses:
+            i += 1
+            continue
+        if LITERAL_MARKER_RE.search(line) and i + 1 < len(body):
+            responses[-1].append((line, bytes(body[i + 1])))
+            i += 2
+        else:
+            responses[-1].append(line)
+            i += 1
+    return responses
+
+class PendingUids:
+    """UIDs found by the last search but not yet synced, per mailbox.
+
+    The server is only searched again once the caller has synced everything
+    found, so each poll costs in proportion to the new mail.
+    """
+    def __init__(self):
+        self._pending: Dict[str, Deque[int]] = {}
+
+    def validate(self, checkpoint: SyncCheckpoint, uidvalidity: Optional[int]) -> None:
+        """Reset the checkpoint when the mailbox's UIDVALIDITY changed."""
+        if checkpoint.uidvalidity == uidvalidity:
+            return
+        if checkpoint.uidvalidity is not None:
+            logging.warning(
+                f"UIDVALIDITY of {checkpoint.mailbox} changed from {checkpoint.uidvalidity} to {uidvalidity}, resyncing"
+            )
+        checkpoint.uidvalidity = uidvalidity
+        checkpoint.last_uid = 0
+        self._pending.pop(checkpoint.mailbox, None)
+
+    def take(self, checkpoint: SyncCheckpoint, max_emails: int) -> List[int]:
+        """Return up to max_emails pending UIDs above the checkpoint; empty means a search is needed."""
+        pending = self._pending.setdefault(checkpoint.mailbox, deque())
+        # Drop UIDs the caller has synced since the last call
+        while pending and pending[0] <= checkpoint.last_uid:
+            pending.popleft()
+        return [pending[i] for i in range(min(max_emails, len(pending)))]
+
+    def add(self, checkpoint: SyncCheckpoint, uids: List[int]) -> None:
+        """Record the result of a ``UID SEARCH UID n+1:*``."""
+        # "n:*" always matches the newest message, even when its UID is below n
+        pending = self._pending.setdefault(checkpoint.mailbox, deque())
+        pending.extend(uid for uid in sorted(uids) if uid > checkpoint.last_uid)
@@ -0,0 +1,62 @@
+import email
+from email.policy import default
+from email.utils import parseaddr, parsedate_to_datetime
+from typing import Optional
+from ..types import Mail
+
+def parse_mail(uid: str, raw_email: bytes, folder: str = "INBOX") -> Mail:
+    """Parse a raw RFC822 message into a Mail.
+
+    Args:
+        uid: IMAP UID of the message
+        raw_email: The raw message bytes
+        folder: Mailbox the message was fetched from
+
+    Returns:
+        The parsed Mail
+    """
+    msg = email.message_from_bytes(raw_email, policy=default)
+    return Mail(
+        uid=uid,
+        subject=msg["Subject"] or "",
+        from_=msg["From"] or "",
+        to=msg["To"] or "",
+        date=msg["Date"] or "",
+        body=get_email_body(msg),
+        folder=folder
+    )
+
+def get_email_body(msg) -> str:
+    """Extract the text body from email, preferring text/plain and falling back to text/html."""
+    if not msg.is_multipart():
+        return _decode_part(msg)
+    
+    parts = [part for part in msg.walk() if not part.is_multipart() and not part.is_attachment()]
+    for content_type in ("text/plain", "text/html"):
+        for part in parts:
+            if part.get_content_type() == content_type:
+                return _decode_part(part)
+    return ""
+
+def _decode_part(part) -> str:
+    """Decode a part's payload using its declared charset."""
+    try:
+        payload = part.get_payload(decode=True)
+        if payload is None:
+            return ""
+        return payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+    except (LookupError, AttributeError):
+        return ""
+
+def parse_date_ts(date: str) -> Optional[int]:
+    """Unix timestamp of a Date header, or None when it is missing or malformed."""
+    if not date:
+        return None
+    try:
+        return int(parsedate_to_datetime(date).timestamp())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def parse_sender(from_: str) -> str:
+    """Lowercased address of a From header ("Ann <Ann@Example.com>" -> "ann@example.com")."""
+    return parseaddr(from_)[1].lower()
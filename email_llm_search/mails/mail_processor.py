@@ -1,15 +1,92 @@
 from ..types import Mail, ProcessedMail
-import textwrap
-from typing import List
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Optional
 import logging
 import re
 import trafilatura
 from bs4 import BeautifulSoup
+from .chunker import TokenChunker
+from .mail_parser import parse_date_ts, parse_sender
+
+_worker_processor = None
+
+def _process_mails_in_worker(mails: List[Mail], model_name: str) -> List[ProcessedMail]:
+    """Process a slice of mails inside a pool worker, reusing one processor per process."""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = MailProcessor(workers=0, model_name=model_name)
+    return [_worker_processor.process_mail_sync(mail) for mail in mails]
 
 class MailProcessor:
-    """Processes raw emails into chunks for embedding."""
+    """Processes raw emails into chunks for embedding.
+
+    Cleaning HTML is CPU bound, so the async methods never run it on the event
+    loop. With MAIL_PROCESSOR_WORKERS > 0 mails are cleaned on a process pool
+    in parallel across cores; otherwise on the loop's default thread executor.
+    Workers are spawned rather than forked, since by the time the pool starts
+    the parent already runs torch and tokenizer threads that a fork would copy
+    in an arbitrary state.
+    """
+    def __init__(self, workers: Optional[int] = None, model_name: Optional[str] = None):
+        """Initialize the processor.
+
+        Args:
+            workers: Number of worker processes (defaults to MAIL_PROCESSOR_WORKERS, 0 disables the pool)
+            model_name: Embedding model the chunks are sized for (defaults to EMBEDDING_MODEL)
+        """
+        if workers is None:
+            workers = int(os.getenv("MAIL_PROCESSOR_WORKERS", "0"))
+        self.workers = workers
+        self.chunker = TokenChunker(model_name=model_name)
+        self._pool: Optional[Executor] = None
+
+    def _executor(self) -> Optional[Executor]:
+        """Lazily start the process pool, if enabled."""
+        if self.workers > 0 and self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
     async def process_mail(self, mail: Mail) -> ProcessedMail:
         """Process a mail into chunks ready for embedding."""
+        return (await self.process_batch([mail]))[0]
+
+    async def process_batch(self, mails: List[Mail]) -> List[ProcessedMail]:
+        """Process a batch of mails in parallel without blocking the event loop.
+
+        Args:
+            mails: Mails to process
+
+        Returns:
+            One ProcessedMail per mail, in the same order
+        """
+        if not mails:
+            return []
+
+        loop = asyncio.get_event_loop()
+        executor = self._executor()
+        if executor is None:
+            return await loop.run_in_executor(None, lambda: [self.process_mail_sync(mail) for mail in mails])
+
+        # One slice per worker keeps pickling overhead low for large batches
+        slice_size = -(-len(mails) // self.workers)
+        slices = [mails[i:i + slice_size] for i in range(0, len(mails), slice_size)]
+        results = await asyncio.gather(
+            *(loop.run_in_executor(executor, _process_mails_in_worker, mail_slice, self.chunker.model_name)
+              for mail_slice in slices)
+        )
+        return [processed for result in results for processed in result]
+
+    def close(self) -> None:
+        """Shut down the worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def process_mail_sync(self, mail: Mail) -> ProcessedMail:
+        """Process a mail into chunks ready for embedding, blocking the caller."""
         body = mail.body or ""
         
         # Clean and extract text from the email body
@@ -26,7 +103,12 @@ class MailProcessor:
         # Return a single ProcessedMail with all chunks
         return ProcessedMail(
             mail_uid=mail.uid,
-            chunks=chunks
+            chunks=chunks,
+            folder=mail.folder,
+            subject=mail.subject,
+            sender=parse_sender(mail.from_),
+            to=mail.to,
+            date_ts=parse_date_ts(mail.date)
         )
 
     def _clean_email_body(self, body: str) -> str:
@@ -78,10 +160,5 @@ class MailProcessor:
         return text.strip()
 
     def _split_text(self, text: str) -> list[str]:
-        """Split text into chunks of appropriate size for embedding."""
-        if not text:
-            return []
-            
-        # Use a larger chunk size now that we have cleaner text
-        chunks = textwrap.wrap(text, 1000)  # Split at 1000 chars
-        return chunks
\ No newline at end of file
+        """Split text into chunks that fit the embedding model's input window."""
+        return self.chunker.split(text)
\ No newline at end of file
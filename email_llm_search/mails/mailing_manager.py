@@ -1,27 +1,72 @@
+import asyncio
+import bisect
 import logging
-from typing import List, Optional, Set
+import os
+from typing import AsyncIterator, Dict, List, Optional, Set, Union
 from datetime import datetime
 from .imap_manager import ImapManager
+from .aio_imap_manager import AioImapManager
 from .mail_processor import MailProcessor
-from .mails_types import MailingStatus
-from ..types import Mail, ImapAuth, ProcessedMail
+from .mails_types import MailingStatus, SyncCheckpoint
+from .raw_mail_store import create_raw_mail_store
+from ..types import Mail, ImapAuth
+
+def create_imap_manager(auth: ImapAuth) -> Union[ImapManager, AioImapManager]:
+    """Create the IMAP backend selected by IMAP_BACKEND ("imaplib" or "aioimaplib")."""
+    backend = os.getenv("IMAP_BACKEND", "imaplib")
+    raw_store = create_raw_mail_store()
+    if backend == "aioimaplib":
+        return AioImapManager(auth, raw_store)
+    if backend != "imaplib":
+        logging.warning(f"Unknown IMAP_BACKEND {backend}, using imaplib")
+    return ImapManager(auth, raw_store)
 
 class MailingManager:
     """Manages email fetching, processing, and synchronization state."""
     
-    def __init__(self, auth: ImapAuth):
-        self.imap_manager = ImapManager(auth)
-        self.mail_processor = MailProcessor()
+    def __init__(self, auth: ImapAuth, checkpoint_store=None, model_name: Optional[str] = None):
+        """Initialize the manager.
+        
+        Args:
+            auth: IMAP credentials
+            checkpoint_store: Durable store with load_checkpoints / save_checkpoint (e.g. DBManager),
+                so a restart resumes after the last written batch; None keeps checkpoints in memory
+            model_name: Embedding model the chunks are sized for (defaults to EMBEDDING_MODEL)
+        """
+        self.imap_manager = create_imap_manager(auth)
+        self.checkpoint_store = checkpoint_store
+        self.mail_processor = MailProcessor(model_name=model_name)
         self._status = MailingStatus(total_emails=0, synced_emails=0)
-        self._synced_ids = set()  # Keep track of which emails we've processed
+        # Comma-separated folder names, or "*" for every selectable folder
+        self._folder_setting = os.getenv("IMAP_FOLDERS", "INBOX")
+        self.folder_concurrency = int(os.getenv("IMAP_FOLDER_CONCURRENCY", "2"))
+        # Failed fetches of a UID before it is skipped instead of holding back its folder's checkpoint
+        self.max_fetch_attempts = int(os.getenv("IMAP_MAX_FETCH_ATTEMPTS", "3"))
+        self.folders: List[str] = []
+        self._checkpoints: Dict[str, SyncCheckpoint] = {}  # Highest UID synced per folder
+        if checkpoint_store is not None:
+            self._checkpoints.update(checkpoint_store.load_checkpoints())
+            for checkpoint in self._checkpoints.values():
+                logging.info(f"Resuming {checkpoint.mailbox} after UID {checkpoint.last_uid}")
+        self._cursors: Dict[str, SyncCheckpoint] = {}  # Highest UID handed to the pipeline per folder
+        self._in_flight: Dict[str, List[int]] = {}  # Streamed but not yet written UIDs per folder
+        self._written: Dict[str, Set[int]] = {}  # Written UIDs still waiting on older ones per folder
+        self._fetch_failures: Dict[str, Dict[int, int]] = {}  # Failed fetch attempts per folder and UID
         
     async def initialize(self) -> bool:
         """Initialize the mailing manager and test connection."""
         try:
             success = await self.imap_manager.test_login()
             if success:
+                self.folders = await self._discover_folders()
+                for folder in self.folders:
+                    self._checkpoints.setdefault(folder, SyncCheckpoint(mailbox=folder))
+                
                 # Get initial mailbox status
-                total = await self.imap_manager.get_total_email_count()
+                counts = await asyncio.gather(
+                    *(self.imap_manager.get_total_email_count(folder) for folder in self.folders)
+                )
+                total = sum(counts)
                 self._status = MailingStatus(
                     total_emails=total,
                     synced_emails=0,
@@ -34,49 +79,133 @@ class MailingManager:
             self._status.error = str(e)
             return False
 
-    async def get_processed_batch(self, batch_size: int = 10) -> List[ProcessedMail]:
-        """Get a batch of unprocessed emails, process them, and mark as synced."""
-        try:
-            self._status.is_syncing = True
-            
-            # Get unprocessed emails
-            emails = await self.imap_manager.fetch_emails(
-                max_emails=batch_size,
-                exclude_ids=self._synced_ids
-            )
-            
-            if not emails:
-                return []
-            
-            # Process each email
-            processed_mails = []
-            
-            for email in emails:
-                processed = await self.mail_processor.process_mail(email)
-                if processed.chunks:
-                    processed_mails.append(processed)
-                    self._synced_ids.add(email.uid)
-            
-            self._status.synced_emails = len(self._synced_ids)
-            self._status.last_sync_time = datetime.now()
-            
-            return processed_mails
-            
-        except Exception as e:
-            logging.error(f"Error processing mail batch: {e}")
-            self._status.error = str(e)
-            return []
-        finally:
-            self._status.is_syncing = False
+    async def _discover_folders(self) -> List[str]:
+        """Resolve the folders to sync from IMAP_FOLDERS."""
+        if self._folder_setting.strip() != "*":
+            return [folder.strip() for folder in self._folder_setting.split(",") if folder.strip()]
+        
+        folders = await self.imap_manager.list_folders()
+        logging.info(f"Discovered {len(folders)} folders: {folders}")
+        return folders or ["INBOX"]
+
+    async def stream_new_emails(self, folder: str, batch_size: int = 10) -> AsyncIterator[Mail]:
+        """Stream every email of a folder newer than what was already streamed.
+
+        This does not advance the folder's checkpoint; callers report written
+        emails with mark_synced once they are durable, so a crash re-ingests
+        whatever was still in flight. UIDs whose fetch failed hold the
+        checkpoint back as well until a later run delivers them.
+
+        Args:
+            folder: Folder to read
+            batch_size: UIDs requested from the IMAP backend at a time
+        """
+        checkpoint = self._checkpoints.setdefault(folder, SyncCheckpoint(mailbox=folder))
+        cursor = self._cursors.setdefault(folder, SyncCheckpoint(mailbox=folder))
+        if cursor.uidvalidity != checkpoint.uidvalidity or cursor.last_uid < checkpoint.last_uid:
+            cursor.uidvalidity, cursor.last_uid = checkpoint.uidvalidity, checkpoint.last_uid
+            self._in_flight[folder], self._written[folder] = [], set()
+        
+        while True:
+            uids = []
+            requested = []
+            emails = self.imap_manager.stream_emails(max_emails=batch_size, checkpoint=cursor, requested=requested)
+            try:
+                async for email in emails:
+                    if cursor.uidvalidity != checkpoint.uidvalidity:
+                        # The mailbox was recreated; everything starts over
+                        checkpoint.uidvalidity, checkpoint.last_uid = cursor.uidvalidity, 0
+                        self._in_flight[folder], self._written[folder] = [], set()
+                        self._fetch_failures.pop(folder, None)
+                    uids.append(int(email.uid))
+                    bisect.insort(self._in_flight.setdefault(folder, []), int(email.uid))
+                    yield email
+            finally:
+                # Stops the backend's fetch right away if our consumer stopped early
+                await emails.aclose()
+            if not requested and not uids:
+                return
+            # UIDs that were requested but never arrived stay in flight, so the
+            # checkpoint stops below them and the next run fetches them again
+            for uid in self._missed_uids(folder, requested, set(uids)):
+                bisect.insort(self._in_flight.setdefault(folder, []), uid)
+            cursor.last_uid = max(cursor.last_uid, *uids, *requested)
 
-    async def get_mail_by_id(self, mail_id: str) -> Optional[Mail]:
-        """Retrieve a specific email by its ID."""
+    def _missed_uids(self, folder: str, requested: List[int], received: Set[int]) -> List[int]:
+        """Count failed fetches of requested UIDs that were not received.
+
+        Args:
+            folder: Folder the UIDs belong to
+            requested: UIDs requested from the server
+            received: UIDs that arrived and were parsed
+
+        Returns:
+            Missing UIDs to fetch again; ones that failed max_fetch_attempts times are skipped
+        """
+        failures = self._fetch_failures.setdefault(folder, {})
+        for uid in received:
+            failures.pop(uid, None)
+        
+        retry = []
+        for uid in sorted(set(requested) - received):
+            failures[uid] = failures.get(uid, 0) + 1
+            if failures[uid] >= self.max_fetch_attempts:
+                logging.error(f"Skipping UID {uid} of {folder} after {failures.pop(uid)} failed fetches")
+                continue
+            logging.warning(f"UID {uid} of {folder} was not received, fetching it again later")
+            retry.append(uid)
+        return retry
+
+    def rewind(self) -> None:
+        """Forget streamed but unwritten emails so the next stream starts at the checkpoints again."""
+        for folder, cursor in self._cursors.items():
+            checkpoint = self._checkpoints.setdefault(folder, SyncCheckpoint(mailbox=folder))
+            cursor.uidvalidity, cursor.last_uid = checkpoint.uidvalidity, checkpoint.last_uid
+        self._in_flight.clear()
+        self._written.clear()
+
+    def mark_synced(self, folder: str, uids: List[str]) -> None:
+        """Record streamed emails as written and advance the folder's checkpoint.
+
+        The checkpoint only moves past a UID once every older streamed UID is
+        written too, since stages may finish emails out of order.
+        """
+        checkpoint = self._checkpoints.setdefault(folder, SyncCheckpoint(mailbox=folder))
+        in_flight = self._in_flight.setdefault(folder, [])
+        written = self._written.setdefault(folder, set())
+        written.update(int(uid) for uid in uids)
+        last_uid = checkpoint.last_uid
+        while in_flight and in_flight[0] in written:
+            uid = in_flight.pop(0)
+            written.discard(uid)
+            checkpoint.last_uid = max(checkpoint.last_uid, uid)
+        if checkpoint.last_uid != last_uid:
+            self._save_checkpoint(checkpoint)
+        
+        self._status.synced_emails += len(uids)
+        self._status.last_sync_time = datetime.now()
+
+    def _save_checkpoint(self, checkpoint: SyncCheckpoint) -> None:
+        """Persist a checkpoint, if a durable store is configured."""
+        if self.checkpoint_store is not None:
+            self.checkpoint_store.save_checkpoint(checkpoint)
+
+    async def get_mail_by_id(self, mail_id: str, folder: str = "INBOX") -> Optional[Mail]:
+        """Retrieve a specific email by its UID within a folder, from the raw mail store if it has it."""
+        checkpoint = self._checkpoints.get(folder)
         try:
-            return await self.imap_manager.fetch_email_by_id(mail_id)
+            return await self.imap_manager.fetch_email_by_id(
+                mail_id, folder, uidvalidity=checkpoint.uidvalidity if checkpoint else None
+            )
         except Exception as e:
             logging.error(f"Error fetching mail {mail_id}: {e}")
             return None
 
+    async def close(self) -> None:
+        """Release IMAP connections and processing workers."""
+        await self.imap_manager.close()
+        self.mail_processor.close()
+
     def get_status(self) -> MailingStatus:
         """Get current mailing system status."""
         return self._status 
\ No newline at end of file
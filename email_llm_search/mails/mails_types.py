@@ -10,4 +10,15 @@ class MailingStatus:
     synced_emails: int
     last_sync_time: Optional[datetime] = None
     is_syncing: bool = False
-    error: Optional[str] = None 
\ No newline at end of file
+    error: Optional[str] = None 
+
+@dataclass
+class SyncCheckpoint:
+    """Position of the incremental sync within a mailbox.
+
+    UIDs are only meaningful together with the mailbox's UIDVALIDITY; when the
+    server reports a different UIDVALIDITY the checkpoint starts over.
+    """
+    mailbox: str = "INBOX"
+    uidvalidity: Optional[int] = None
+    last_uid: int = 0
@@ -0,0 +1,185 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+class RawMailStore:
+    """On-disk cache of raw messages so re-indexing and mail views skip IMAP.
+
+    Messages are keyed by (account, folder, UIDVALIDITY, UID) and stored as
+    zlib-compressed, content-addressed blobs, so identical messages (e.g. the
+    same mail under two Gmail labels) are kept once. When the blobs exceed
+    ``max_bytes`` the least recently used ones are evicted.
+    """
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024):
+        """Initialize the store.
+
+        Args:
+            directory: Directory holding the blobs and the SQLite index
+            max_bytes: Size cap for the compressed blobs
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        self.create_tables()
+
+    def create_tables(self):
+        """Initialize the message and blob tables."""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                account TEXT,
+                folder TEXT,
+                uidvalidity INTEGER,
+                uid INTEGER,
+                digest TEXT,
+                partial INTEGER,
+                PRIMARY KEY (account, folder, uidvalidity, uid)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                size INTEGER,
+                last_access REAL
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access)")
+        self.conn.commit()
+
+    def _path(self, digest: str) -> str:
+        """Path of a blob, fanned out by the first two hex digits."""
+        return os.path.join(self.directory, "objects", digest[:2], digest[2:])
+
+    def get_many(self, account: str, folder: str, uidvalidity: Optional[int], uids: List[int],
+                 allow_partial: bool = False) -> Dict[int, bytes]:
+        """Look up cached messages.
+
+        Args:
+            account: Account the messages belong to
+            folder: Folder of the messages
+            uidvalidity: UIDVALIDITY of the folder; None never matches
+            uids: UIDs to look up
+            allow_partial: Also return text-only messages stored by the text fetch mode
+
+        Returns:
+            Raw message bytes per UID that was found
+        """
+        if uidvalidity is None or not uids:
+            return {}
+
+        found = {}
+        with self._lock:
+            cursor = self.conn.cursor()
+            rows = []
+            for start in range(0, len(uids), 500):
+                batch = uids[start:start + 500]
+                cursor.execute(f"""
+                    SELECT uid, digest, partial FROM messages
+                    WHERE account = ? AND folder = ? AND uidvalidity = ? AND uid IN ({",".join("?" * len(batch))})
+                """, (account, folder, uidvalidity, *batch))
+                rows.extend(cursor.fetchall())
+
+            now = time.time()
+            for uid, digest, partial in rows:
+                if partial and not allow_partial:
+                    continue
+                try:
+                    with open(self._path(digest), "rb") as f:
+                        found[uid] = zlib.decompress(f.read())
+                except (OSError, zlib.error):
+                    # Evicted or corrupt blob, refetch from the server
+                    continue
+                cursor.execute("UPDATE blobs SET last_access = ? WHERE digest = ?", (now, digest))
+            self.conn.commit()
+        return found
+
+    def get(self, account: str, folder: str, uidvalidity: Optional[int], uid: int,
+            allow_partial: bool = False) -> Optional[bytes]:
+        """Look up a single cached message."""
+        return self.get_many(account, folder, uidvalidity, [uid], allow_partial).get(uid)
+
+    def put(self, account: str, folder: str, uidvalidity: Optional[int], uid: int, raw_email: bytes,
+            partial: bool = False) -> None:
+        """Store a message.
+
+        Args:
+            account: Account the message belongs to
+            folder: Folder of the message
+            uidvalidity: UIDVALIDITY of the folder; messages without one are not cached
+            uid: UID of the message
+            raw_email: The raw message bytes
+            partial: Whether this is a text-only message assembled by the text fetch mode
+        """
+        if uidvalidity is None:
+            return
+
+        digest = hashlib.sha256(raw_email).hexdigest()
+        path = self._path(digest)
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT size FROM blobs WHERE digest = ?", (digest,))
+            if cursor.fetchone() is None or not os.path.exists(path):
+                data = zlib.compress(raw_email)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                cursor.execute("INSERT OR REPLACE INTO blobs (digest, size, last_access) VALUES (?, ?, ?)",
+                               (digest, len(data), time.time()))
+            cursor.execute("""
+                INSERT OR REPLACE INTO messages (account, folder, uidvalidity, uid, digest, partial)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (account, folder, uidvalidity, uid, digest, int(partial)))
+            self.conn.commit()
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used blobs until the store is back under 90% of its cap."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COALESCE(SUM(size), 0) FROM blobs")
+        total = cursor.fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        cursor.execute("SELECT digest, size FROM blobs ORDER BY last_access")
+        evicted = []
+        for digest, size in cursor.fetchall():
+            if total <= target:
+                break
+            evicted.append(digest)
+            total -= size
+
+        for digest in evicted:
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+        cursor.executemany("DELETE FROM blobs WHERE digest = ?", [(d,) for d in evicted])
+        cursor.executemany("DELETE FROM messages WHERE digest = ?", [(d,) for d in evicted])
+        self.conn.commit()
+        logging.info(f"Evicted {len(evicted)} cached messages")
+
+    def close(self) -> None:
+        """Close the index database."""
+        with self._lock:
+            self.conn.close()
+
+def create_raw_mail_store() -> Optional[RawMailStore]:
+    """Create the store configured by RAW_MAIL_CACHE_DIR / RAW_MAIL_CACHE_MAX_MB (empty dir disables it).
+
+    Defaults to $DATA_DIR/mail_cache so the cache survives restarts with the index.
+    """
+    directory = os.getenv("RAW_MAIL_CACHE_DIR", os.path.join(os.getenv("DATA_DIR", "data"), "mail_cache"))
+    if not directory:
+        return None
+    max_bytes = int(float(os.getenv("RAW_MAIL_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+    return RawMailStore(directory, max_bytes)
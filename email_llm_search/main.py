@@ -42,23 +42,26 @@ async def startup_event():
     global mail_searcher, rest_controller
     logging.info("Starting up application")
     
-    # Initialize mail searcher
-    mail_searcher = MailSearcher()
-    if not await mail_searcher.initialize():
-        logging.error("Failed to initialize MailSearcher")
-        exit(1)
+    # Initialize mail searcher; the index, user state and sync checkpoints survive restarts
+    data_dir = os.getenv("DATA_DIR", "data")
+    mail_searcher = MailSearcher(
+        persist_directory=os.path.join(data_dir, "index"),
+        db_path=os.path.join(data_dir, "state.sqlite")
+    )
     
     # Initialize REST controller
     rest_controller = RestController(app, mail_searcher, static_dir)
     
-    # Start the email syncing process (non-blocking)
-    await mail_searcher.start()
+    # IMAP, the model and the vector store load in the background, then syncing starts;
+    # /ready reports their progress while the server already answers
+    mail_searcher.start_initialization()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown."""
     logging.info("Shutting down application")
-    # No explicit cleanup needed
+    if mail_searcher:
+        await mail_searcher.close()
 
 def run(host="0.0.0.0", port=8000):
     """Run the FastAPI application."""
@@ -0,0 +1,80 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import astuple
+from typing import Dict, Hashable, List, Optional, Tuple
+from .embedding_cache import normalize_chunk
+from .types import SearchFilter, SearchOptions, SearchResult
+
+def result_cache_key(query: str, n_results: int, filters: Optional[SearchFilter],
+                     options: Optional[SearchOptions]) -> Tuple[Hashable, ...]:
+    """Key of a search: normalized query text, result count, filters and retrieval options."""
+    return (
+        normalize_chunk(query),
+        n_results,
+        astuple(filters) if filters else None,
+        astuple(options or SearchOptions())
+    )
+
+class SearchResultCache:
+    """Bounded LRU cache of search results, valid for one index generation.
+
+    The index generation increases with every write. Results are stored with
+    the generation that was current when their search started; once a newer
+    generation is seen, all older entries are dropped, so a search never
+    returns results that miss written mails.
+    """
+    def __init__(self, max_size: int = None):
+        """Initialize the cache.
+
+        Args:
+            max_size: Maximum cached searches (defaults to SEARCH_CACHE_SIZE, 0 disables caching)
+        """
+        self.max_size = max_size if max_size is not None else int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+        self.generation = 0
+        self._entries: "OrderedDict[Hashable, List[SearchResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _advance(self, generation: int) -> None:
+        """Move to a newer generation, evicting everything cached for older ones."""
+        if generation > self.generation:
+            self.generation = generation
+            self._entries.clear()
+
+    def get(self, key: Hashable, generation: int) -> Optional[List[SearchResult]]:
+        """Cached results of a search in the given generation, or None."""
+        with self._lock:
+            self._advance(generation)
+            results = self._entries.get(key) if generation == self.generation else None
+            if results is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(results)
+
+    def put(self, key: Hashable, generation: int, results: List[SearchResult]) -> None:
+        """Store results computed against the given generation; stale ones are discarded."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._advance(generation)
+            if generation != self.generation:
+                return
+            self._entries[key] = list(results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Hit and miss counters, the current size and generation."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "generation": self.generation,
+            }
@@ -0,0 +1,86 @@
+import logging
+import math
+import os
+from typing import Callable, Dict, List, Tuple
+from .types import MailResult, SearchResult
+
+def relevance(score: float, mode: str) -> float:
+    """Turn a retriever score into a relevance where higher is better.
+
+    Vector stores return squared L2 distances of normalized vectors (2 - 2 cos),
+    the keyword index returns bm25() values (more negative is better) and hybrid
+    scores are already fused relevances.
+    """
+    if mode == "vector":
+        return 1 - score / 2
+    if mode == "keyword":
+        return -score
+    return score
+
+def group_by_mail(results: List[SearchResult], aggregation: str = "max",
+                  snippets_per_mail: int = 3) -> List[MailResult]:
+    """Collapse chunk results into one result per mail.
+
+    Args:
+        results: Chunk results, best first
+        aggregation: "max" scores a mail by its best chunk, "sum" by all its retrieved chunks
+        snippets_per_mail: Best chunks kept per mail
+
+    Returns:
+        Mails ordered by aggregated relevance, highest first
+    """
+    mails: Dict[Tuple[str, str], MailResult] = {}
+    for result in results:
+        key = (result.folder, result.mail_uid)
+        score = result.score
+        mail = mails.get(key)
+        if mail is None:
+            mails[key] = MailResult(
+                mail_uid=result.mail_uid,
+                folder=result.folder,
+                score=score,
+                subject=result.subject,
+                sender=result.sender,
+                date_ts=result.date_ts,
+                snippets=[result]
+            )
+            continue
+        mail.score = mail.score + score if aggregation == "sum" else max(mail.score, score)
+        if len(mail.snippets) < snippets_per_mail:
+            mail.snippets.append(result)
+    return sorted(mails.values(), key=lambda mail: mail.score, reverse=True)
+
+def grouped_search(search_chunks: Callable[[int], List[SearchResult]], n_mails: int,
+                   aggregation: str = "max", snippets_per_mail: int = 3,
+                   over_fetch: int = None, max_chunks: int = None) -> List[MailResult]:
+    """Retrieve chunks until n_mails distinct mails are found, then group them.
+
+    Starts with n_mails * over_fetch chunks and, while too few distinct mails
+    come back, retries with a depth scaled by the observed chunks per mail.
+
+    Args:
+        search_chunks: Runs the chunk search for a given depth
+        n_mails: Number of mails to return
+        aggregation: "max" or "sum" of chunk relevances per mail
+        snippets_per_mail: Best chunks kept per mail
+        over_fetch: Initial chunks fetched per wanted mail (defaults to GROUPED_SEARCH_OVER_FETCH)
+        max_chunks: Upper bound on the depth (defaults to GROUPED_SEARCH_MAX_CHUNKS)
+
+    Returns:
+        Up to n_mails mails, highest relevance first
+    """
+    if over_fetch is None:
+        over_fetch = int(os.getenv("GROUPED_SEARCH_OVER_FETCH", "4"))
+    if max_chunks is None:
+        max_chunks = int(os.getenv("GROUPED_SEARCH_MAX_CHUNKS", "1000"))
+
+    depth = min(max(n_mails * over_fetch, n_mails), max_chunks)
+    while True:
+        results = search_chunks(depth)
+        mails = group_by_mail(results, aggregation, snippets_per_mail)
+        # Done when enough mails were found, the index is exhausted or the cap is reached
+        if len(mails) >= n_mails or len(results) < depth or depth >= max_chunks:
+            return mails[:n_mails]
+        chunks_per_mail = len(results) / max(len(mails), 1)
+        depth = min(max(math.ceil(chunks_per_mail * n_mails * 1.5), depth * 2), max_chunks)
+        logging.info(f"Found {len(mails)} of {n_mails} mails, fetching {depth} chunks")
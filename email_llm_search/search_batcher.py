@@ -0,0 +1,153 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, TypeVar
+from .types import SearchRequest, SearchResult
+
+T = TypeVar("T")
+
+class SearchOverloadedError(RuntimeError):
+    """Raised when more searches are pending than the batcher accepts."""
+
+class SearchBatcher:
+    """Collects concurrent searches into micro-batches run off the event loop.
+
+    The first query of a batch waits at most max_wait_ms for others to join,
+    then the whole batch goes to search_many on a worker thread, so queries
+    arriving together share one model call. While a batch runs, new queries
+    queue up for the next one. Beyond max_pending queued or running queries,
+    new ones are rejected instead of waiting indefinitely. Other kinds of
+    searches can be run through run() to share that limit.
+    """
+
+    def __init__(self, search_many: Callable[[List[SearchRequest]], List[List[SearchResult]]],
+                 max_wait_ms: float = None, max_batch_size: int = None, max_pending: int = None):
+        """Initialize the batcher.
+
+        Args:
+            search_many: Runs a batch of searches, blocking the caller
+            max_wait_ms: How long a batch stays open for more queries (defaults to SEARCH_BATCH_MAX_WAIT_MS)
+            max_batch_size: Queries per batch (defaults to SEARCH_BATCH_MAX_SIZE)
+            max_pending: Queries queued or running before new ones are rejected (defaults to SEARCH_MAX_PENDING)
+        """
+        self.search_many = search_many
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else float(os.getenv("SEARCH_BATCH_MAX_WAIT_MS", "5"))) / 1000
+        self.max_batch_size = max_batch_size or int(os.getenv("SEARCH_BATCH_MAX_SIZE", "32"))
+        self.max_pending = max_pending or int(os.getenv("SEARCH_MAX_PENDING", "64"))
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._pending = 0
+        self.batches = 0
+        self.queries = 0
+        self.rejected = 0
+
+    def _admit(self, count: int) -> None:
+        """Reject count more searches if they would exceed max_pending."""
+        if self._pending + count > self.max_pending:
+            self.rejected += count
+            raise SearchOverloadedError(f"{self._pending} searches pending")
+
+    async def search(self, request: SearchRequest) -> List[SearchResult]:
+        """Run a search as part of the next batch.
+
+        Raises:
+            SearchOverloadedError: Too many searches are already pending
+        """
+        return (await self.search_all([request]))[0]
+
+    async def search_all(self, requests: List[SearchRequest]) -> List[List[SearchResult]]:
+        """Run several searches as part of the next batches; they are admitted together or not at all.
+
+        Raises:
+            SearchOverloadedError: Too many searches are already pending
+        """
+        self._admit(len(requests))
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in requests]
+        self._pending += len(requests)
+        try:
+            for request, future in zip(requests, futures):
+                await self._queue.put((request, future))
+            return list(await asyncio.gather(*futures))
+        finally:
+            self._pending -= len(requests)
+
+    async def run(self, search: Callable[..., T], *args) -> T:
+        """Run another kind of search on a worker thread, counted against max_pending.
+
+        Raises:
+            SearchOverloadedError: Too many searches are already pending
+        """
+        self._admit(1)
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, functools.partial(search, *args))
+        finally:
+            self._pending -= 1
+
+    async def _run(self) -> None:
+        """Form batches from the queue and run them one at a time."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Callers that gave up while waiting are dropped from the batch
+            batch = [(request, future) for request, future in batch if not future.done()]
+            if not batch:
+                continue
+            self.batches += 1
+            self.queries += len(batch)
+            try:
+                results = await loop.run_in_executor(None, self.search_many, [request for request, _ in batch])
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                logging.error(f"Error running search batch: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self) -> None:
+        """Stop the batching task; queued searches are cancelled."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+        self._worker = None
+
+    def get_stats(self) -> Dict[str, float]:
+        """Batch counters, the average batch size and the searches currently pending."""
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "average_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0,
+            "pending": self._pending,
+            "rejected": self.rejected,
+        }
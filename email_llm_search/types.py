@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
 
 @dataclass
 class ImapAuth:
@@ -28,20 +28,76 @@ class Mail:
     to: str
     date: str
     body: str
+    folder: str = "INBOX"
 
 @dataclass
 class ProcessedMail:
     """Processed email containing chunks ready for embedding."""
     mail_uid: str
     chunks: list[str]
+    folder: str = "INBOX"
+    subject: str = ""
+    sender: str = ""  # Lowercased address from the From header
+    to: str = ""
+    date_ts: Optional[int] = None  # Unix timestamp of the Date header
+
+@dataclass
+class SearchFilter:
+    """Metadata conditions applied inside the index query."""
+    folder: Optional[str] = None
+    sender: Optional[str] = None  # Sender address, case-insensitive
+    date_from: Optional[int] = None  # Unix timestamp, inclusive
+    date_to: Optional[int] = None  # Unix timestamp, inclusive
+
+    def to_store_filter(self) -> Optional[Dict[str, Any]]:
+        """The filter in the form the stores take: field -> value, or field -> {"$gte"/"$lte": bound}."""
+        conditions: Dict[str, Any] = {}
+        if self.folder:
+            conditions["folder"] = self.folder
+        if self.sender:
+            conditions["sender"] = self.sender.strip().lower()
+        date_range = {}
+        if self.date_from is not None:
+            date_range["$gte"] = self.date_from
+        if self.date_to is not None:
+            date_range["$lte"] = self.date_to
+        if date_range:
+            conditions["date_ts"] = date_range
+        return conditions or None
+
+@dataclass
+class SearchOptions:
+    """How a search retrieves and ranks chunks."""
+    mode: str = "vector"  # "vector", "keyword" or "hybrid"
+    vector_weight: float = 1.0  # Weight of the vector ranking in hybrid fusion
+    keyword_weight: float = 1.0  # Weight of the keyword ranking in hybrid fusion
+    vector_depth: Optional[int] = None  # Candidates taken from the vector retriever (default: 4x n_results)
+    keyword_depth: Optional[int] = None  # Candidates taken from the keyword retriever (default: 4x n_results)
+
+@dataclass
+class SearchRequest:
+    """One query of a batch search."""
+    query: str
+    n_results: int = 5
+    filters: Optional[SearchFilter] = None
+    options: Optional[SearchOptions] = None
 
 @dataclass
 class SearchResult:
-    """Result from a vector search query."""
+    """Result from a search query.
+
+    The score is a relevance, higher is better, in every mode: cosine similarity
+    for vector searches, negated bm25 for keyword searches and the fused
+    reciprocal-rank score for hybrid searches.
+    """
     text: str
     mail_uid: str
     chunk_index: int
     score: float
+    folder: str = "INBOX"
+    subject: str = ""
+    sender: str = ""
+    date_ts: Optional[int] = None
     
     @classmethod
     def from_document(cls, doc, score: float):
@@ -50,5 +106,24 @@ class SearchResult:
             text=doc.page_content,
             mail_uid=doc.metadata.get("mail_uid", ""),
             chunk_index=doc.metadata.get("chunk_index", 0),
-            score=score
-        )
\ No newline at end of file
+            score=score,
+            folder=doc.metadata.get("folder", "INBOX"),
+            subject=doc.metadata.get("subject", ""),
+            sender=doc.metadata.get("sender", ""),
+            date_ts=doc.metadata.get("date_ts")
+        )
+
+@dataclass
+class MailResult:
+    """A mail found by a grouped search, with its best matching chunks.
+
+    The score is the relevance of its chunks (see SearchResult), aggregated
+    over the mail's retrieved chunks.
+    """
+    mail_uid: str
+    folder: str
+    score: float
+    subject: str = ""
+    sender: str = ""
+    date_ts: Optional[int] = None
+    snippets: List[SearchResult] = field(default_factory=list)
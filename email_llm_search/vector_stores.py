@@ -0,0 +1,367 @@
+import json
+import logging
+import operator
+import os
+import sqlite3
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# Range conditions a filter may give instead of a value, as {"date_ts": {"$gte": start}}
+RANGE_OPERATORS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+class VectorStore(ABC):
+    """Storage and exact or approximate nearest-neighbour search of chunk vectors.
+
+    Scores are squared L2 distances between normalized vectors (2 - 2 cos),
+    lower is better, as Chroma reports them. Filters map metadata fields to a
+    value to match or to a dict of RANGE_OPERATORS bounds; all must hold.
+    """
+
+    @abstractmethod
+    def upsert(self, ids: List[str], vectors: List[List[float]], documents: List[Document]) -> None:
+        """Insert documents, replacing those with the same ids."""
+
+    @abstractmethod
+    def search(self, vector: List[float], k: int, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """Return the k nearest documents matching the metadata filter, nearest first."""
+
+    def search_many(self, vectors: List[List[float]], k: int,
+                    filters: Optional[List[Optional[Dict[str, Any]]]] = None) -> List[List[Tuple[Document, float]]]:
+        """Search for several query vectors at once, each with its own filter.
+
+        Returns:
+            The k nearest documents per query, in query order
+        """
+        filters = filters or [None] * len(vectors)
+        return [self.search(vector, k, search_filter) for vector, search_filter in zip(vectors, filters)]
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored documents."""
+
+    def close(self) -> None:
+        """Release files and connections."""
+
+class ChromaVectorStore(VectorStore):
+    """Chroma collection through langchain_chroma."""
+    def __init__(self, embeddings: Embeddings, collection_name: str, persist_directory: str = None):
+        from langchain_chroma import Chroma
+
+        try:
+            if persist_directory and os.path.exists(persist_directory):
+                logging.info(f"Loading existing vector store from {persist_directory}")
+            else:
+                logging.info(f"Creating new vector store with collection {collection_name}")
+            self.store = Chroma(
+                persist_directory=persist_directory,
+                embedding_function=embeddings,
+                collection_name=collection_name
+            )
+        except Exception as e:
+            logging.error(f"Error initializing vector store: {e}")
+            # Fallback to in-memory store
+            self.store = Chroma(
+                embedding_function=embeddings,
+                collection_name=collection_name
+            )
+
+    def upsert(self, ids: List[str], vectors: List[List[float]], documents: List[Document]) -> None:
+        """Upsert into the collection; a persistent client writes through to disk."""
+        self.store._collection.upsert(
+            ids=ids,
+            embeddings=vectors,
+            metadatas=[doc.metadata for doc in documents],
+            documents=[doc.page_content for doc in documents]
+        )
+
+    def search(self, vector: List[float], k: int, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """Query the collection's HNSW index."""
+        return self.store.similarity_search_by_vector_with_relevance_scores(vector, k=k, filter=self._where(filter))
+
+    def search_many(self, vectors: List[List[float]], k: int,
+                    filters: Optional[List[Optional[Dict[str, Any]]]] = None) -> List[List[Tuple[Document, float]]]:
+        """Send queries sharing a filter to the collection in a single call."""
+        filters = filters or [None] * len(vectors)
+        if any(search_filter != filters[0] for search_filter in filters):
+            return super().search_many(vectors, k, filters)
+        if not vectors:
+            return []
+        results = self.store._collection.query(
+            query_embeddings=vectors,
+            n_results=k,
+            where=self._where(filters[0]),
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [(Document(page_content=text, metadata=metadata or {}), distance)
+             for text, metadata, distance in zip(texts, metadatas, distances)]
+            for texts, metadatas, distances in zip(results["documents"], results["metadatas"], results["distances"])
+        ]
+
+    @staticmethod
+    def _where(filter: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Translate a filter to a Chroma where clause, one condition per operator."""
+        conditions = []
+        for name, value in (filter or {}).items():
+            if isinstance(value, dict):
+                conditions.extend({name: {op: bound}} for op, bound in value.items())
+            else:
+                conditions.append({name: value})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def count(self) -> int:
+        """Number of documents in the collection."""
+        return self.store._collection.count()
+
+class FlatVectorStore(VectorStore):
+    """Exact search over normalized vectors in an append-only memory-mapped file.
+
+    Vectors (float32 or float16) are appended to ``vectors.bin``; text and
+    metadata live in a SQLite side table indexed by row. Replacing a document
+    appends a new row and tombstones the old one. A search is one matrix
+    product per block of rows followed by ``argpartition``.
+    """
+    # Metadata kept in memory as arrays so filters are vectorized
+    FILTER_FIELDS = ("folder", "sender", "date_ts")
+    # Fields held as float arrays (NaN when missing) so range conditions work
+    NUMERIC_FIELDS = ("date_ts",)
+
+    def __init__(self, directory: Optional[str] = None, dtype: str = "float32", block_rows: int = None,
+                 block_bytes: int = None):
+        """Open or create the store.
+
+        Args:
+            directory: Directory holding vectors.bin and metadata.sqlite; None uses a
+                temporary directory that is removed on close
+            dtype: Storage type of the vectors ("float32" or "float16")
+            block_rows: Rows scored per matrix product; None derives it from block_bytes
+            block_bytes: Temporary memory per block, i.e. the float32 copy of its rows
+                and their scores (defaults to FLAT_INDEX_BLOCK_MB megabytes)
+        """
+        self._temp_dir = tempfile.TemporaryDirectory(prefix="flat_index_") if directory is None else None
+        if self._temp_dir is not None:
+            directory = self._temp_dir.name
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.block_rows = block_rows
+        self.block_bytes = block_bytes or int(float(os.getenv("FLAT_INDEX_BLOCK_MB", "32")) * (1 << 20))
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(directory, "metadata.sqlite"), check_same_thread=False)
+        self.create_tables()
+
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT value FROM settings WHERE key = 'dtype'")
+        row = cursor.fetchone()
+        self.dtype = np.dtype(row[0] if row else dtype)
+        cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('dtype', ?)", (self.dtype.name,))
+        cursor.execute("SELECT value FROM settings WHERE key = 'dimensions'")
+        row = cursor.fetchone()
+        self.dimensions = int(row[0]) if row else None
+        self.conn.commit()
+
+        self._path = os.path.join(directory, "vectors.bin")
+        self._load()
+
+    def create_tables(self):
+        """Initialize the chunk and settings tables."""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT,
+                text TEXT,
+                metadata TEXT,
+                deleted INTEGER DEFAULT 0
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS chunks_id ON chunks (id)")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def _load(self) -> None:
+        """Map the vector file and load the filterable metadata of the committed rows."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM chunks")
+        rows = cursor.fetchone()[0]
+        # Rows appended to the file but never committed to the side table are ignored
+        self._alive = np.ones(rows, dtype=bool)
+        self._fields = {name: self._empty_field(name, rows) for name in self.FILTER_FIELDS}
+        cursor.execute("SELECT row, metadata, deleted FROM chunks ORDER BY row")
+        for row, metadata, deleted in cursor.fetchall():
+            self._alive[row] = not deleted
+            self._set_fields(row, json.loads(metadata))
+        self._map(rows)
+
+    def _map(self, rows: int) -> None:
+        """(Re)map the first rows of the vector file."""
+        if rows == 0 or self.dimensions is None:
+            self._vectors = np.empty((0, self.dimensions or 0), dtype=self.dtype)
+            return
+        self._vectors = np.memmap(self._path, dtype=self.dtype, mode="r", shape=(rows, self.dimensions))
+
+    def _empty_field(self, name: str, rows: int) -> np.ndarray:
+        """Array for rows of one filterable field."""
+        if name in self.NUMERIC_FIELDS:
+            return np.full(rows, np.nan)
+        return np.empty(rows, dtype=object)
+
+    def _set_fields(self, row: int, metadata: Dict[str, Any]) -> None:
+        """Record the filterable metadata of a row."""
+        for name in self.FILTER_FIELDS:
+            value = metadata.get(name)
+            if name in self.NUMERIC_FIELDS:
+                value = np.nan if value is None else value
+            self._fields[name][row] = value
+
+    def upsert(self, ids: List[str], vectors: List[List[float]], documents: List[Document]) -> None:
+        """Append the documents and tombstone earlier rows with the same ids."""
+        if not ids:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+        with self._lock:
+            cursor = self.conn.cursor()
+            if self.dimensions is None:
+                self.dimensions = matrix.shape[1]
+                cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('dimensions', ?)",
+                               (str(self.dimensions),))
+            start = len(self._alive)
+            with open(self._path, "ab") as f:
+                # Drop a torn tail from an interrupted write before appending
+                f.truncate(start * self.dimensions * self.dtype.itemsize)
+                f.write(matrix.astype(self.dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            replaced = []
+            for batch in range(0, len(ids), 500):
+                chunk_ids = ids[batch:batch + 500]
+                cursor.execute(f"SELECT row FROM chunks WHERE deleted = 0 AND id IN ({','.join('?' * len(chunk_ids))})",
+                               chunk_ids)
+                replaced.extend(row for (row,) in cursor.fetchall())
+            cursor.executemany("UPDATE chunks SET deleted = 1 WHERE row = ?", [(row,) for row in replaced])
+            cursor.executemany(
+                "INSERT INTO chunks (row, id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(start + i, id_, doc.page_content, json.dumps(doc.metadata)) for i, (id_, doc) in enumerate(zip(ids, documents))]
+            )
+            self.conn.commit()
+
+            self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            self._alive[replaced] = False
+            for name in self.FILTER_FIELDS:
+                self._fields[name] = np.concatenate([self._fields[name], self._empty_field(name, len(ids))])
+            for i, doc in enumerate(documents):
+                self._set_fields(start + i, doc.metadata)
+            self._map(len(self._alive))
+
+    def _mask(self, filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Rows that are alive and match the metadata filter."""
+        mask = self._alive.copy()
+        for name, value in (filter or {}).items():
+            if name not in self._fields:
+                raise ValueError(f"Unsupported filter field {name}")
+            if isinstance(value, dict):
+                # NaN (missing) compares false, so rows without the field never match a range
+                for op, bound in value.items():
+                    mask &= RANGE_OPERATORS[op](self._fields[name], bound)
+            else:
+                mask &= self._fields[name] == value
+        return mask
+
+    def search(self, vector: List[float], k: int, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """Exact top-k by cosine similarity."""
+        return self.search_many([vector], k, [filter])[0]
+
+    def search_many(self, vectors: List[List[float]], k: int,
+                    filters: Optional[List[Optional[Dict[str, Any]]]] = None) -> List[List[Tuple[Document, float]]]:
+        """Exact top-k for several queries with one matrix product per block of rows.
+
+        Candidates are reduced to the top k per query after every block, so
+        memory stays bounded by the block size whatever the number of queries.
+        """
+        filters = filters or [None] * len(vectors)
+        with self._lock:
+            stored, masks = self._vectors, [self._mask(search_filter) for search_filter in filters]
+        if k <= 0 or not vectors:
+            return [[] for _ in vectors]
+
+        queries = np.asarray(vectors, dtype=np.float32)
+        queries /= np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+        best_rows = [np.empty(0, dtype=np.int64) for _ in vectors]
+        best_scores = [np.empty(0, dtype=np.float32) for _ in vectors]
+        # Each row of a block costs its float32 copy plus one float32 score per query
+        block_rows = self.block_rows or max(1, self.block_bytes // (4 * (stored.shape[1] + len(vectors))))
+        for start in range(0, len(stored), block_rows):
+            block = stored[start:start + block_rows]
+            block_scores = block.astype(np.float32, copy=False) @ queries.T
+            for i, mask in enumerate(masks):
+                candidates = np.flatnonzero(mask[start:start + len(block)])
+                if len(candidates) == 0:
+                    continue
+                rows = np.concatenate([best_rows[i], candidates + start])
+                scores = np.concatenate([best_scores[i], block_scores[candidates, i]])
+                if len(rows) > k:
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    rows, scores = rows[top], scores[top]
+                best_rows[i], best_scores[i] = rows, scores
+
+        order = [np.argsort(-scores) for scores in best_scores]
+        documents = self._documents(np.unique(np.concatenate(best_rows)))
+        return [
+            [(documents[int(row)], float(2 - 2 * score)) for row, score in zip(rows[ranked], scores[ranked])]
+            for rows, scores, ranked in zip(best_rows, best_scores, order)
+        ]
+
+    def _documents(self, rows: np.ndarray) -> Dict[int, Document]:
+        """Load documents of rows from the side table, by row."""
+        found = {}
+        with self._lock:
+            cursor = self.conn.cursor()
+            for start in range(0, len(rows), 500):
+                batch = [int(row) for row in rows[start:start + 500]]
+                cursor.execute(f"SELECT row, text, metadata FROM chunks WHERE row IN ({','.join('?' * len(batch))})", batch)
+                found.update((row, Document(page_content=text, metadata=json.loads(metadata)))
+                             for row, text, metadata in cursor.fetchall())
+        return found
+
+    def count(self) -> int:
+        """Number of live documents."""
+        return int(self._alive.sum())
+
+    def close(self) -> None:
+        """Close the side table and remove the temporary directory, if any."""
+        with self._lock:
+            self.conn.close()
+            if self._temp_dir is not None:
+                self._vectors = None
+                self._temp_dir.cleanup()
+
+def create_vector_store(embeddings: Embeddings, collection_name: str, persist_directory: str = None) -> VectorStore:
+    """Create the store selected by VECTOR_STORE ("chroma" or "flat").
+
+    The flat store keeps its files in <persist_directory>/<collection_name>, or
+    in a temporary directory when nothing is persisted; FLAT_INDEX_DTYPE picks
+    float32 or float16 storage.
+    """
+    backend = os.getenv("VECTOR_STORE", "chroma")
+    if backend == "flat":
+        directory = os.path.join(persist_directory, collection_name) if persist_directory else None
+        store = FlatVectorStore(directory, dtype=os.getenv("FLAT_INDEX_DTYPE", "float32"))
+        logging.info(f"Using flat vector store in {store.directory}")
+        return store
+    if backend != "chroma":
+        logging.warning(f"Unknown VECTOR_STORE {backend}, using chroma")
+    return ChromaVectorStore(embeddings, collection_name, persist_directory)
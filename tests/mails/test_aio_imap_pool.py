@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from email_llm_search.types import ImapAuth
+from email_llm_search.mails.aio_imap_pool import AioImapConnectionPool, _PooledConnection
+
+class FakeTransport:
+    """Records whether the session's socket was closed."""
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+class FakeAioClient:
+    """Minimal stand-in for aioimaplib.IMAP4_SSL."""
+    def __init__(self):
+        self.protocol = type("Protocol", (), {})()
+        self.protocol.transport = FakeTransport()
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Fixture creating a pool that hands out fake sessions."""
+    pool = AioImapConnectionPool(ImapAuth(email="user@example.com", password="secret"), "imap.example.com", 993)
+
+    async def connect():
+        return _PooledConnection(FakeAioClient())
+
+    monkeypatch.setattr(pool, "_connect", connect)
+    return pool
+
+@pytest.mark.asyncio
+async def test_session_is_reused_after_application_errors(pool):
+    """A failure in the caller's own code leaves the session usable."""
+    with pytest.raises(ValueError):
+        async with pool.connection(None) as conn:
+            raise ValueError("bad header")
+
+    assert pool._idle == [conn]
+    assert not conn.client.protocol.transport.closed
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [asyncio.CancelledError, ConnectionResetError])
+async def test_interrupted_session_is_discarded(pool, error):
+    """A session left mid-command is closed instead of going back to the pool."""
+    with pytest.raises(error):
+        async with pool.connection(None) as conn:
+            raise error()
+
+    assert pool._idle == []
+    assert conn.client.protocol.transport.closed
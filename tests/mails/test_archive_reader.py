@@ -0,0 +1,63 @@
+from email_llm_search.mails.archive_reader import iter_archive, iter_maildir, iter_mbox
+
+MBOX = (
+    b"From alice@example.com Mon Jan  1 00:00:00 2024\n"
+    b"Subject: First\n\n"
+    b"Hello\n"
+    b">From the archive, with love\n"
+    b"\n"
+    b"From bob@example.com Tue Jan  2 00:00:00 2024\n"
+    b"Subject: Second\n\n"
+    b"Bye\n"
+)
+
+def test_mbox_is_split_and_unquoted(tmp_path):
+    """Messages are split on separator lines and mboxrd quoting is removed."""
+    path = tmp_path / "All mail.mbox"
+    path.write_bytes(MBOX)
+
+    mails = list(iter_mbox(str(path)))
+
+    assert [mail.folder for mail in mails] == ["All mail", "All mail"]
+    assert mails[0].raw.startswith(b"Subject: First")
+    assert b"\nFrom the archive" in mails[0].raw
+    assert mails[1].raw == b"Subject: Second\n\nBye\n"
+    assert mails[0].uid == "0" and int(mails[1].uid) == MBOX.index(b"From bob")
+
+def test_empty_mbox(tmp_path):
+    """An empty file yields nothing."""
+    path = tmp_path / "empty.mbox"
+    path.write_bytes(b"")
+
+    assert list(iter_mbox(str(path))) == []
+
+def test_maildir_uid_ignores_flags(tmp_path):
+    """Maildir UIDs are the unique part of the file name."""
+    for subdir in ("cur", "new", "tmp"):
+        (tmp_path / "Work" / subdir).mkdir(parents=True)
+    (tmp_path / "Work" / "cur" / "1700000000.M1.host:2,S").write_bytes(b"Subject: Seen\n\nA")
+    (tmp_path / "Work" / "new" / "1700000001.M2.host").write_bytes(b"Subject: New\n\nB")
+
+    mails = list(iter_maildir(str(tmp_path / "Work")))
+
+    assert [(mail.uid, mail.folder) for mail in mails] == [
+        ("1700000000.M1.host", "Work"),
+        ("1700000001.M2.host", "Work"),
+    ]
+
+def test_archive_directory_walk(tmp_path):
+    """Directories are walked for Maildirs, .mbox and .eml files."""
+    for subdir in ("cur", "new", "tmp"):
+        (tmp_path / "Maildir" / subdir).mkdir(parents=True)
+    (tmp_path / "Maildir" / "new" / "m1").write_bytes(b"Subject: Maildir\n\nA")
+    (tmp_path / "export").mkdir()
+    (tmp_path / "export" / "one.eml").write_bytes(b"Subject: Eml\n\nB")
+    (tmp_path / "export" / "Sent.mbox").write_bytes(MBOX)
+
+    mails = list(iter_archive(str(tmp_path)))
+
+    assert sorted((mail.folder, mail.uid) for mail in mails if not mail.folder.endswith("Sent")) == [
+        ("Maildir", "m1"),
+        ("export", "one.eml"),
+    ]
+    assert len([mail for mail in mails if mail.folder == "export/Sent"]) == 2
@@ -0,0 +1,51 @@
+from email_llm_search.mails.bodystructure import find_text_part, build_text_message
+from email_llm_search.mails.imap_utils import parse_fetch_response
+from email_llm_search.mails.mail_parser import parse_mail
+
+MIXED_WITH_PDF = [
+    (b'1 (UID 42 BODYSTRUCTURE ((("TEXT" "PLAIN" ("CHARSET" "UTF-8") NIL NIL "QUOTED-PRINTABLE" 120 4 NIL NIL NIL)'
+     b'("TEXT" "HTML" ("CHARSET" "UTF-8") NIL NIL "7BIT" 300 8 NIL NIL NIL) "ALTERNATIVE" ("BOUNDARY" "b1") NIL NIL)'
+     b'("APPLICATION" "PDF" ("NAME" "report.pdf") NIL NIL "BASE64" 900000 NIL ("ATTACHMENT" ("FILENAME" "report.pdf")) NIL) '
+     b'"MIXED" ("BOUNDARY" "b0") NIL NIL) BODY[HEADER.FIELDS (SUBJECT FROM TO DATE MESSAGE-ID)] {38}',
+     b"Subject: Report\r\nFrom: a@example.com\r\n\r\n"),
+    b")",
+]
+
+HTML_ONLY = [
+    b'2 (UID 43 BODYSTRUCTURE ("TEXT" "HTML" ("CHARSET" "ISO-8859-1") NIL NIL "BASE64" 2048 30 NIL NIL NIL))',
+]
+
+def test_parse_fetch_response_items():
+    """FETCH data items are parsed with literals spliced in."""
+    items = parse_fetch_response(MIXED_WITH_PDF)
+    assert items[b"UID"] == b"42"
+    assert items[b"BODY[HEADER.FIELDS (SUBJECT FROM TO DATE MESSAGE-ID)]"].startswith(b"Subject: Report")
+    assert isinstance(items[b"BODYSTRUCTURE"], list)
+
+def test_find_text_part_prefers_plain_and_skips_attachments():
+    """The plain alternative is chosen over HTML and the PDF is never considered."""
+    part = find_text_part(parse_fetch_response(MIXED_WITH_PDF)[b"BODYSTRUCTURE"])
+    assert part.section == "1.1"
+    assert part.subtype == "plain"
+    assert part.charset == "UTF-8"
+    assert part.encoding == "QUOTED-PRINTABLE"
+
+def test_find_text_part_falls_back_to_html():
+    """HTML-only messages use their HTML part."""
+    part = find_text_part(parse_fetch_response(HTML_ONLY)[b"BODYSTRUCTURE"])
+    assert part.section == "1"
+    assert part.subtype == "html"
+
+def test_build_text_message_round_trip():
+    """The assembled message decodes to the original text."""
+    part = find_text_part(parse_fetch_response(MIXED_WITH_PDF)[b"BODYSTRUCTURE"])
+    raw = build_text_message(b"Subject: Report\r\nFrom: a@example.com\r\n\r\n", part, b"Caf=C3=A9 totals\r\n")
+    mail = parse_mail("42", raw)
+    assert mail.subject == "Report"
+    assert mail.body.strip() == "Café totals"
+
+def test_html_only_message_body():
+    """Full messages without a plain part fall back to HTML."""
+    raw = (b"Subject: News\r\nMIME-Version: 1.0\r\nContent-Type: multipart/alternative; boundary=x\r\n\r\n"
+           b"--x\r\nContent-Type: text/html\r\n\r\n<p>Hello</p>\r\n--x--\r\n")
+    assert "<p>Hello</p>" in parse_mail("1", raw).body
@@ -0,0 +1,85 @@
+import json
+from email_llm_search.mails.chunker import FALLBACK_MAX_TOKENS, TokenChunker
+
+def make_chunker(max_tokens=20, overlap_tokens=0):
+    """Chunker using the approximate tokenizer, so no model files are needed."""
+    chunker = TokenChunker(max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+    chunker._tokenizer = False
+    return chunker
+
+def sentence(word, count=4):
+    """A sentence of count tokens plus the full stop."""
+    return " ".join([word] * count) + "."
+
+def test_short_text_is_one_chunk():
+    """Text within the budget is returned as is."""
+    assert make_chunker().split("  Hello world  ") == ["Hello world"]
+    assert make_chunker().split(" \n ") == []
+
+def test_chunks_end_at_sentences_within_budget():
+    """Sentences are never cut and every chunk fits the budget."""
+    chunker = make_chunker(max_tokens=12)
+    text = " ".join(sentence(word) for word in ["one", "two", "six", "ten", "red"])
+
+    chunks = chunker.split(text)
+
+    assert chunks == [
+        "one one one one. two two two two.",
+        "six six six six. ten ten ten ten.",
+        "red red red red.",
+    ]
+    assert all(chunker.count_tokens(chunk) <= 12 for chunk in chunks)
+
+def test_overlap_repeats_trailing_sentences():
+    """The last sentences of a chunk start the next one."""
+    chunker = make_chunker(max_tokens=12, overlap_tokens=5)
+    text = " ".join(sentence(word) for word in ["one", "two", "six", "ten"])
+
+    chunks = chunker.split(text)
+
+    assert chunks[0] == "one one one one. two two two two."
+    assert chunks[1].startswith("two two two two. six")
+    assert all(chunker.count_tokens(chunk) <= 12 for chunk in chunks)
+
+def test_prefers_paragraph_breaks():
+    """A full chunk ends at a paragraph break when one is past half the budget."""
+    chunker = make_chunker(max_tokens=16)
+    text = f"{sentence('one')} {sentence('two')}\n\n{sentence('six')} {sentence('ten')}"
+
+    chunks = chunker.split(text)
+
+    assert chunks[0] == "one one one one. two two two two."
+
+def test_long_sentence_is_windowed():
+    """Text without boundaries is split into token windows without losing content."""
+    chunker = make_chunker(max_tokens=254)
+
+    chunks = chunker.split("a" * 2000)
+
+    assert len(chunks) == 2
+    assert "".join(chunks) == "a" * 2000
+
+def test_text_is_tokenized_once():
+    """Long texts are tokenized once, not once per chunk."""
+    chunker = make_chunker(max_tokens=12)
+    calls = []
+    token_offsets = chunker.token_offsets
+    chunker.token_offsets = lambda text: calls.append(text) or token_offsets(text)
+
+    chunker.split(" ".join(sentence(word) for word in ["one", "two", "six", "ten"]))
+
+    assert len(calls) == 1
+
+def test_budget_follows_the_model_input_limit(tmp_path, monkeypatch):
+    """Without CHUNK_MAX_TOKENS the budget is the model's sequence limit minus [CLS] and [SEP]."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("CHUNK_MAX_TOKENS", raising=False)
+    config_dir = tmp_path / "models" / "limit-test-model" / "snapshot"
+    config_dir.mkdir(parents=True)
+    (config_dir / "sentence_bert_config.json").write_text(json.dumps({"max_seq_length": 128}))
+    (config_dir / "tokenizer_config.json").write_text(json.dumps({"model_max_length": 512}))
+
+    assert TokenChunker(model_name="limit-test-model", tokenizer=False).max_tokens == 126
+    assert TokenChunker(model_name="unknown-test-model", tokenizer=False).max_tokens == FALLBACK_MAX_TOKENS
+    monkeypatch.setenv("CHUNK_MAX_TOKENS", "100")
+    assert TokenChunker(model_name="limit-test-model", tokenizer=False).max_tokens == 100
@@ -0,0 +1,231 @@
+import imaplib
+import socket
+import threading
+import time
+from contextlib import contextmanager
+import pytest
+from email_llm_search.types import ImapAuth
+from email_llm_search.mails.imap_manager import ImapManager
+from email_llm_search.mails.mails_types import SyncCheckpoint
+from email_llm_search.mails.raw_mail_store import RawMailStore
+
+class FakeUidClient:
+    """Client answering UID SEARCH from a fixed list of UIDs."""
+    def __init__(self, uids, uidvalidity=7):
+        self.uids = uids
+        self.uidvalidity = uidvalidity
+        self.searches = []
+
+    def uid(self, command, *args):
+        assert command == "SEARCH"
+        start = int(args[-1].split()[1].split(":")[0])
+        self.searches.append(start)
+        matched = [uid for uid in self.uids if uid >= start] or self.uids[-1:]
+        return "OK", [" ".join(str(uid) for uid in matched).encode()]
+
+@pytest.fixture
+def imap_manager():
+    """Fixture creating an ImapManager that never connects."""
+    return ImapManager(ImapAuth("a@b.com", "pw"))
+
+def test_next_uids_only_searches_when_drained(imap_manager):
+    """Pending UIDs are served from memory until the caller has synced them all."""
+    client = FakeUidClient([3, 5, 8, 13])
+    checkpoint = SyncCheckpoint()
+    
+    assert imap_manager._next_uids(client, checkpoint, 2) == [3, 5]
+    checkpoint.last_uid = 5
+    assert imap_manager._next_uids(client, checkpoint, 2) == [8, 13]
+    assert client.searches == [1]
+    
+    # The newest message is always returned for "n:*", even if already synced
+    checkpoint.last_uid = 13
+    assert imap_manager._next_uids(client, checkpoint, 2) == []
+    assert client.searches == [1, 14]
+
+def test_next_uids_resets_on_uidvalidity_change(imap_manager):
+    """A new UIDVALIDITY invalidates the checkpoint."""
+    checkpoint = SyncCheckpoint(uidvalidity=1, last_uid=100)
+    client = FakeUidClient([4, 9], uidvalidity=2)
+    
+    assert imap_manager._next_uids(client, checkpoint, 10) == [4, 9]
+    assert checkpoint.uidvalidity == 2
+    assert checkpoint.last_uid == 0
+
+class FakeIdleClient:
+    """Client replaying scripted server lines for IDLE and recording what was sent."""
+    def __init__(self, lines):
+        self.capabilities = ("IMAP4REV1", "IDLE")
+        self.tagged_commands = {}
+        self.lines = list(lines)
+        self.sent = []
+
+    def _new_tag(self):
+        return b"A1"
+
+    def send(self, data):
+        self.sent.append(data)
+
+    def readline(self):
+        return self.lines.pop(0) if self.lines else b""
+
+class SocketIdleClient:
+    """Client reading from one end of a socket pair through a buffered reader, like imaplib."""
+    def __init__(self):
+        self.capabilities = ("IMAP4REV1", "IDLE")
+        self.tagged_commands = {}
+        self.sock, self.server = socket.socketpair()
+        self.file = self.sock.makefile("rb")
+
+    def _new_tag(self):
+        return b"A1"
+
+    def send(self, data):
+        self.sock.sendall(data)
+
+    def readline(self):
+        return self.file.readline()
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+        self.server.close()
+
+def run_idle(imap_manager, client, timeout=0):
+    """Run IDLE directly on a fake client instead of a pooled session."""
+    @contextmanager
+    def connection(mailbox):
+        yield client
+    imap_manager._pool.connection = connection
+    return imap_manager._wait_for_new_mail_sync("INBOX", timeout)
+
+def test_idle_handles_untagged_lines_before_continuation(imap_manager):
+    """Updates sent before the "+" count as new mail and IDLE is still ended with DONE."""
+    client = FakeIdleClient([b"* 4 EXISTS\r\n", b"+ idling\r\n", b"A1 OK IDLE terminated\r\n"])
+
+    assert run_idle(imap_manager, client) is True
+    assert client.sent == [b"A1 IDLE\r\n", b"DONE\r\n"]
+
+def test_idle_rejected_by_server(imap_manager):
+    """A tagged refusal completes the command, so the session stays usable."""
+    client = FakeIdleClient([b"A1 BAD command unknown\r\n"])
+
+    assert run_idle(imap_manager, client) is None
+    assert client.sent == [b"A1 IDLE\r\n"]
+
+def test_idle_failure_discards_connection(imap_manager):
+    """A session that broke while idling raises a connection error, so the pool drops it."""
+    client = FakeIdleClient([b"+ idling\r\n"])
+    client.sock = None  # select() on it fails
+
+    with pytest.raises(imaplib.IMAP4.abort):
+        run_idle(imap_manager, client)
+
+def test_idle_sees_lines_buffered_with_the_continuation(imap_manager):
+    """New mail sent in the same packet as the "+" is noticed without waiting for the timeout."""
+    client = SocketIdleClient()
+    client.server.sendall(b"+ idling\r\n* 5 EXISTS\r\nA1 OK IDLE terminated\r\n")
+
+    started = time.monotonic()
+    assert run_idle(imap_manager, client, timeout=5) is True
+    assert time.monotonic() - started < 1
+    client.close()
+
+def test_idle_keeps_waiting_after_other_updates(imap_manager):
+    """A RECENT or FETCH line does not end the wait; the following EXISTS does."""
+    client = SocketIdleClient()
+    client.server.sendall(b"+ idling\r\n* 1 RECENT\r\n")
+    threading.Timer(0.1, client.server.sendall, [b"* 3 FETCH (FLAGS (\\Seen))\r\n* 5 EXISTS\r\nA1 OK done\r\n"]).start()
+
+    assert run_idle(imap_manager, client, timeout=5) is True
+    client.close()
+
+def test_idle_times_out_without_new_mail(imap_manager):
+    """Without updates the wait ends after the timeout and IDLE is closed with DONE."""
+    client = SocketIdleClient()
+    client.server.sendall(b"+ idling\r\n")
+    threading.Timer(0.2, client.server.sendall, [b"A1 OK done\r\n"]).start()
+
+    assert run_idle(imap_manager, client, timeout=0.1) is False
+    assert client.server.recv(100) == b"A1 IDLE\r\nDONE\r\n"
+    client.close()
+
+class FakeFetchClient:
+    """Client answering a UID FETCH with one untagged response per UID."""
+    def __init__(self, uids):
+        self.uids = list(uids)
+        self.untagged_responses = {}
+        self.tagged_commands = {}
+        self.shut_down = False
+
+    def _command(self, *args):
+        self.tagged_commands[b"A1"] = None
+        return b"A1"
+
+    def _get_response(self):
+        if self.uids:
+            uid = self.uids.pop(0)
+            self.untagged_responses["FETCH"] = [(f"1 (UID {uid} RFC822 {{5}}".encode(), b"hello"), b")"]
+        else:
+            self.tagged_commands[b"A1"] = ("OK", [b"done"])
+
+    def _command_complete(self, name, tag):
+        return self.tagged_commands[tag]
+
+    def shutdown(self):
+        self.shut_down = True
+
+def test_fetch_stopped_early_marks_session_broken(imap_manager):
+    """Closing the iterator mid-FETCH shuts the session down so the pool drops it."""
+    client = FakeFetchClient([1, 2, 3])
+    fetched = imap_manager._iter_fetch(client, [1, 2, 3], "(UID RFC822)")
+    assert next(fetched)[0] == 1
+    fetched.close()
+
+    assert client.broken and client.shut_down
+
+def test_fetch_completed_keeps_session(imap_manager):
+    """A fully read FETCH leaves the session usable."""
+    client = FakeFetchClient([1, 2])
+    assert [uid for uid, _ in imap_manager._iter_fetch(client, [1, 2], "(UID RFC822)")] == [1, 2]
+    assert not getattr(client, "broken", False)
+
+@pytest.mark.asyncio
+async def test_stream_stopped_early_stops_fetching_thread(imap_manager):
+    """Closing the stream waits for the fetching thread, which stops at its next email."""
+    finished = threading.Event()
+    delivered = []
+
+    def fetch(max_emails, checkpoint, on_mail, requested=None):
+        try:
+            for uid in range(1, 100):
+                on_mail(uid)
+                delivered.append(uid)
+                threading.Event().wait(0.01)
+        finally:
+            finished.set()
+
+    imap_manager._fetch_emails_sync = fetch
+    stream = imap_manager.stream_emails(max_emails=100, checkpoint=SyncCheckpoint())
+    assert await stream.__anext__() == 1
+    await stream.aclose()
+
+    assert finished.is_set()
+    assert len(delivered) < 99
+
+@pytest.mark.asyncio
+async def test_cached_mail_is_served_without_the_server(tmp_path):
+    """A mail in the raw store is returned for a known UIDVALIDITY even when IMAP is unreachable."""
+    store = RawMailStore(str(tmp_path))
+    store.put("a@b.com", "INBOX", 7, 42, b"Subject: Cached\r\nFrom: x@y.com\r\n\r\nHello")
+    imap_manager = ImapManager(ImapAuth("a@b.com", "pw"), store)
+
+    def unreachable(*args, **kwargs):
+        raise OSError("network is unreachable")
+    imap_manager._pool.run = unreachable
+
+    mail = await imap_manager.fetch_email_by_id("42", "INBOX", uidvalidity=7)
+    assert mail.subject == "Cached" and mail.uid == "42"
+    with pytest.raises(OSError):
+        await imap_manager.fetch_email_by_id("42", "INBOX")
+    await imap_manager.close()
@@ -0,0 +1,92 @@
+import imaplib
+import pytest
+from email_llm_search.types import ImapAuth
+from email_llm_search.mails import imap_pool
+from email_llm_search.mails.imap_pool import ImapConnectionPool
+
+class FakeImapClient:
+    """Minimal stand-in for imaplib.IMAP4_SSL."""
+    instances = []
+
+    def __init__(self, host, port, ssl_context=None):
+        self.selected = []
+        self.noop_ok = True
+        self.logged_out = False
+        FakeImapClient.instances.append(self)
+
+    def login(self, user, password):
+        return "OK", [b"Logged in"]
+
+    def select(self, mailbox):
+        self.selected.append(mailbox)
+        return "OK", [b"1"]
+
+    def response(self, code):
+        return code, [b"42"]
+
+    def noop(self):
+        if not self.noop_ok:
+            raise imaplib.IMAP4.abort("socket closed")
+        return "OK", [b""]
+
+    def logout(self):
+        self.logged_out = True
+        return "BYE", [b""]
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Fixture creating a pool backed by fake clients."""
+    FakeImapClient.instances = []
+    monkeypatch.setattr(imap_pool.imaplib, "IMAP4_SSL", FakeImapClient)
+    pool = ImapConnectionPool(ImapAuth("a@b.com", "pw"), "imap.example.com", 993,
+                              max_size=2, health_check_interval=0)
+    yield pool
+    pool.close()
+
+def test_connection_is_reused(pool):
+    """A released session is handed out again without reconnecting or reselecting."""
+    with pool.connection("INBOX") as first:
+        pass
+    with pool.connection("INBOX") as second:
+        pass
+    
+    assert first is second
+    assert len(FakeImapClient.instances) == 1
+    assert first.selected == ['"INBOX"']
+    assert first.uidvalidity == 42
+
+def test_stale_connection_is_replaced(pool):
+    """A session failing the NOOP health check is discarded."""
+    with pool.connection("INBOX") as first:
+        first.noop_ok = False
+    with pool.connection("INBOX") as second:
+        pass
+    
+    assert first is not second
+    assert first.logged_out
+
+def test_run_retries_on_broken_connection(pool):
+    """Operations are retried once on a fresh session after a connection error."""
+    calls = []
+
+    def operation(client):
+        calls.append(client)
+        if len(calls) == 1:
+            raise imaplib.IMAP4.abort("connection reset")
+        return "done"
+    
+    assert pool.run(operation) == "done"
+    assert calls[0] is not calls[1]
+    assert calls[0].logged_out
+
+def test_connection_marked_broken_is_discarded(pool):
+    """A session left with a command in flight is logged out instead of reused."""
+    with pytest.raises(ValueError):
+        with pool.connection("INBOX") as first:
+            first.broken = True
+            raise ValueError("consumer failed")
+    with pool.connection("INBOX") as second:
+        pass
+    
+    assert first is not second
+    assert first.logged_out
@@ -0,0 +1,73 @@
+from email_llm_search.mails.imap_utils import (
+    format_uid_set, plan_fetch_batches, iter_fetch_literals, parse_sizes, group_fetch_lines,
+    parse_list_response, quote_mailbox, get_fetch_mode
+)
+
+def test_format_uid_set():
+    """Consecutive UIDs are collapsed into ranges."""
+    assert format_uid_set([7, 1, 2, 3, 9, 10]) == "1:3,7,9:10"
+    assert format_uid_set([4]) == "4"
+
+def test_plan_fetch_batches_message_budget():
+    """UIDs are split into commands of at most max_messages."""
+    assert plan_fetch_batches([1, 2, 3, 4, 5], max_messages=2) == [[1, 2], [3, 4], [5]]
+    assert plan_fetch_batches([1, 2, 3], max_messages=0) == [[1, 2, 3]]
+
+def test_plan_fetch_batches_byte_budget():
+    """Commands stay within the byte budget; oversized messages go alone."""
+    sizes = {1: 400, 2: 400, 3: 5000, 4: 100}
+    batches = plan_fetch_batches([1, 2, 3, 4], sizes, max_messages=0, max_bytes=1000)
+    assert batches == [[1, 2], [3], [4]]
+
+def test_iter_fetch_literals_uid_before_and_after_literal():
+    """The UID is found whether the server sends it before or after the literal."""
+    responses = [
+        (b"1 (UID 5 RFC822 {3}", b"one"),
+        b")",
+        (b"2 (RFC822 {3}", b"two"),
+        b" UID 9)",
+        b"3 (FLAGS (\\Seen))",
+    ]
+    assert list(iter_fetch_literals(responses)) == [(5, b"one"), (9, b"two")]
+
+def test_parse_sizes():
+    """RFC822.SIZE values are mapped to their UIDs."""
+    data = [b"1 (UID 5 RFC822.SIZE 1200)", b"2 (RFC822.SIZE 80 UID 9)"]
+    assert parse_sizes(data) == {5: 1200, 9: 80}
+
+def test_group_fetch_lines_matches_imaplib_format():
+    """aioimaplib FETCH lines are regrouped into per-message imaplib-style responses."""
+    lines = [
+        b"1 FETCH (UID 5 RFC822 {3}", bytearray(b"one"), b")",
+        b"2 FETCH (UID 9 RFC822 {3}", bytearray(b"two"), b")",
+        b"FETCH completed",
+    ]
+    responses = group_fetch_lines(lines)
+    assert responses == [
+        [(b"1 (UID 5 RFC822 {3}", b"one"), b")"],
+        [(b"2 (UID 9 RFC822 {3}", b"two"), b")"],
+    ]
+    assert [pair for response in responses for pair in iter_fetch_literals(response)] == [(5, b"one"), (9, b"two")]
+
+def test_parse_list_response_skips_noselect():
+    """Only selectable folders are returned, including quoted and literal names."""
+    lines = [
+        b'(\\HasNoChildren) "/" "INBOX"',
+        b'(\\HasChildren \\Noselect) "/" "[Gmail]"',
+        b'(\\All \\HasNoChildren) "/" "[Gmail]/All Mail"',
+        (b'(\\HasNoChildren) "/" {9}', b"Receipts\""),
+        b'LIST (\\HasNoChildren) "/" Work',
+    ]
+    assert parse_list_response(lines) == ["INBOX", "[Gmail]/All Mail", 'Receipts"', "Work"]
+
+def test_quote_mailbox():
+    """Mailbox names are quoted with escapes."""
+    assert quote_mailbox("[Gmail]/All Mail") == '"[Gmail]/All Mail"'
+    assert quote_mailbox('a"b') == '"a\\"b"'
+
+def test_unknown_fetch_mode_falls_back_to_full(monkeypatch):
+    """A mistyped IMAP_FETCH_MODE warns and downloads whole messages."""
+    monkeypatch.setenv("IMAP_FETCH_MODE", "text")
+    assert get_fetch_mode() == "text"
+    monkeypatch.setenv("IMAP_FETCH_MODE", "txt")
+    assert get_fetch_mode() == "full"
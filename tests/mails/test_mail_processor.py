@@ -170,4 +170,47 @@ async def test_process_email_with_reply(mail_processor):
     # The signature should be removed or at least not prominent
     signature_text = "Bob Smith\nSenior Developer\nbob@example.com"
     # Using a standard assertion instead of pytest.fail()
-    assert signature_text not in all_text, "Signature was not properly cleaned from the email" 
\ No newline at end of file
+    assert signature_text not in all_text, "Signature was not properly cleaned from the email" 
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workers", [0, 2])
+async def test_process_batch_keeps_order(workers):
+    """Batches are processed on the configured executor and returned in input order."""
+    processor = MailProcessor(workers=workers)
+    bodies = [HTML_EMAIL, SHORT_EMAIL, PLAIN_TEXT_EMAIL, LONG_EMAIL, ""]
+    mails = [
+        Mail(uid=str(i), subject="", from_="a@b.com", to="c@d.com", date="2023-01-01", body=body, folder="Work")
+        for i, body in enumerate(bodies)
+    ]
+    
+    try:
+        processed = await processor.process_batch(mails)
+    finally:
+        processor.close()
+    
+    assert [p.mail_uid for p in processed] == ["0", "1", "2", "3", "4"]
+    assert all(p.folder == "Work" for p in processed)
+    assert processed[1].chunks == ["Hello world"]
+    assert processed[4].chunks == []
+
+@pytest.mark.asyncio
+async def test_header_metadata_is_kept(mail_processor):
+    """Subject, sender address and a numeric date travel with the chunks."""
+    mail = Mail(
+        uid="7",
+        subject="Invoice",
+        from_="Ann Smith <Ann@Example.com>",
+        to="billing@example.com",
+        date="Fri, 01 Mar 2024 10:00:00 +0000",
+        body=SHORT_EMAIL
+    )
+    
+    processed = await mail_processor.process_mail(mail)
+    
+    assert processed.subject == "Invoice"
+    assert processed.sender == "ann@example.com"
+    assert processed.to == "billing@example.com"
+    assert processed.date_ts == 1709287200
+    
+    mail.date = "2023-01-01"
+    assert (await mail_processor.process_mail(mail)).date_ts is None
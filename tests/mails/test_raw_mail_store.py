@@ -0,0 +1,45 @@
+import os
+from email_llm_search.mails.raw_mail_store import RawMailStore
+
+RAW = b"Subject: Hello\r\n\r\n" + b"body " * 200
+
+def test_put_and_get(tmp_path):
+    """Stored messages are returned for the same key only."""
+    store = RawMailStore(str(tmp_path))
+    store.put("me@example.com", "INBOX", 7, 42, RAW)
+    
+    assert store.get("me@example.com", "INBOX", 7, 42) == RAW
+    assert store.get("me@example.com", "INBOX", 8, 42) is None
+    assert store.get("me@example.com", "Sent", 7, 42) is None
+    assert store.get_many("me@example.com", "INBOX", 7, [41, 42]) == {42: RAW}
+
+def test_identical_messages_share_a_blob(tmp_path):
+    """The same content under two keys is stored once, compressed."""
+    store = RawMailStore(str(tmp_path))
+    store.put("me@example.com", "INBOX", 7, 1, RAW)
+    store.put("me@example.com", "[Gmail]/All Mail", 3, 99, RAW)
+    
+    blobs = [f for _, _, files in os.walk(tmp_path / "objects") for f in files]
+    assert len(blobs) == 1
+    assert os.path.getsize(next((tmp_path / "objects").rglob(blobs[0]))) < len(RAW)
+
+def test_partial_messages_only_served_when_allowed(tmp_path):
+    """Text-only messages are not handed to the full fetch mode."""
+    store = RawMailStore(str(tmp_path))
+    store.put("me@example.com", "INBOX", 7, 5, RAW, partial=True)
+    
+    assert store.get("me@example.com", "INBOX", 7, 5) is None
+    assert store.get("me@example.com", "INBOX", 7, 5, allow_partial=True) == RAW
+
+def test_lru_eviction(tmp_path):
+    """The least recently read message is evicted once the cap is exceeded."""
+    messages = {uid: os.urandom(2000) for uid in range(1, 4)}
+    store = RawMailStore(str(tmp_path), max_bytes=5000)
+    store.put("me@example.com", "INBOX", 7, 1, messages[1])
+    store.put("me@example.com", "INBOX", 7, 2, messages[2])
+    store.get("me@example.com", "INBOX", 7, 1)  # 2 is now least recently used
+    store.put("me@example.com", "INBOX", 7, 3, messages[3])
+    
+    assert store.get("me@example.com", "INBOX", 7, 2) is None
+    assert store.get("me@example.com", "INBOX", 7, 1) == messages[1]
+    assert store.get("me@example.com", "INBOX", 7, 3) == messages[3]
@@ -0,0 +1,29 @@
+from email_llm_search.db_manager import DBManager
+from email_llm_search.mails.mails_types import SyncCheckpoint
+from email_llm_search.types import ImapAuth, State, User
+
+def test_state_and_checkpoints_survive_reopening(tmp_path):
+    """A file database keeps the user, its state and the sync checkpoints."""
+    path = str(tmp_path / "state.sqlite")
+    db = DBManager(path)
+    db.set_user(User(auth=ImapAuth(email="me@example.com", password="secret"), state=State()))
+    db.update_state(State(last_sync_time="2024-03-01T10:00:00", sync_status="idle"))
+    db.save_checkpoint(SyncCheckpoint(mailbox="INBOX", uidvalidity=7, last_uid=41))
+    db.save_checkpoint(SyncCheckpoint(mailbox="INBOX", uidvalidity=7, last_uid=42))
+    db.close()
+
+    reopened = DBManager(path)
+
+    assert reopened.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert reopened.get_user().auth.email == "me@example.com"
+    assert reopened.get_user().auth.password == ""
+    assert reopened.conn.execute("SELECT password FROM user").fetchone() == (None,)
+    assert reopened.get_user().state.last_sync_time == "2024-03-01T10:00:00"
+    assert reopened.load_checkpoints() == {"INBOX": SyncCheckpoint(mailbox="INBOX", uidvalidity=7, last_uid=42)}
+
+def test_in_memory_by_default():
+    """Without a path nothing is written to disk."""
+    db = DBManager()
+
+    assert db.get_user() is None
+    assert db.load_checkpoints() == {}
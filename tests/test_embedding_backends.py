@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from email_llm_search.embedding_backends import mean_pool
+
+def test_mean_pool_ignores_padding():
+    """Padded positions do not contribute and vectors are unit length."""
+    tokens = np.array([[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]]])
+    mask = np.array([[1, 1, 0]])
+
+    assert np.allclose(mean_pool(tokens, mask, normalize=False), [[2.0, 0.0]])
+    assert np.allclose(mean_pool(tokens, mask), [[1.0, 0.0]])
+
+@pytest.mark.parametrize("quantize,tolerance", [(False, 1e-4), (True, 0.05)])
+def test_onnx_matches_torch(tmp_path, quantize, tolerance):
+    """The ONNX backend reproduces the PyTorch vectors within a tolerance."""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("torch")
+    pytest.importorskip("langchain_huggingface")
+    from email_llm_search.embedding_backends import OnnxEmbeddings, create_torch_embeddings, export_onnx_model
+
+    texts = ["Quarterly results are attached.", "Can we move the meeting to Thursday afternoon? " * 10, "ok"]
+    try:
+        torch_vectors = np.array(create_torch_embeddings("all-MiniLM-L6-v2", "models/all-MiniLM-L6-v2").embed_documents(texts))
+        model_path = export_onnx_model("all-MiniLM-L6-v2", str(tmp_path), "models/all-MiniLM-L6-v2", quantize)
+    except OSError as e:
+        pytest.skip(f"Model not available: {e}")
+    onnx_vectors = np.array(OnnxEmbeddings(model_path, str(tmp_path / "tokenizer.json")).embed_documents(texts))
+
+    cosine = (torch_vectors * onnx_vectors).sum(axis=1)
+    assert np.all(cosine > 1 - tolerance)
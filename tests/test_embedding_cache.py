@@ -0,0 +1,100 @@
+from langchain_core.embeddings import Embeddings
+from email_llm_search.embedding_cache import (
+    CachedEmbeddings, EmbeddingCache, QueryEmbeddingCache, chunk_hash, create_embedding_cache
+)
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic embeddings that record which texts reached the model."""
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+        return [float(len(text)), 0.0]
+
+def test_chunk_hash_normalizes_whitespace():
+    """Copies differing only in whitespace share a hash."""
+    assert chunk_hash("Sent from my phone") == chunk_hash("  Sent\nfrom   my phone ")
+    assert chunk_hash("Sent from my phone") != chunk_hash("Sent from my laptop")
+
+def test_repeated_chunks_skip_the_model(tmp_path):
+    """Duplicates within a call and across calls are embedded once."""
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(model, EmbeddingCache(str(tmp_path / "cache.sqlite"), "model-a"))
+
+    first = embeddings.embed_documents(["footer", "hello", "footer"])
+    second = embeddings.embed_documents(["footer  ", "new"])
+
+    assert first == [[6.0, 1.0], [5.0, 1.0], [6.0, 1.0]]
+    assert second == [[6.0, 1.0], [3.0, 1.0]]
+    assert model.embedded == ["footer", "hello", "new"]
+    assert (embeddings.hits, embeddings.misses) == (2, 3)
+
+def test_cache_survives_reopening_per_model(tmp_path):
+    """Vectors persist on disk but are not shared between model versions."""
+    path = str(tmp_path / "cache.sqlite")
+    CachedEmbeddings(CountingEmbeddings(), EmbeddingCache(path, "model-a")).embed_documents(["footer"])
+
+    same_model = CountingEmbeddings()
+    CachedEmbeddings(same_model, EmbeddingCache(path, "model-a")).embed_documents(["footer"])
+    other_model = CountingEmbeddings()
+    CachedEmbeddings(other_model, EmbeddingCache(path, "model-b")).embed_documents(["footer"])
+
+    assert same_model.embedded == []
+    assert other_model.embedded == ["footer"]
+
+
+def test_default_cache_follows_the_index(tmp_path, monkeypatch):
+    """The cache is stored with a persisted index and kept in memory otherwise."""
+    monkeypatch.delenv("EMBEDDING_CACHE_PATH", raising=False)
+    monkeypatch.chdir(tmp_path)
+
+    assert create_embedding_cache("model-a", str(tmp_path / "index")).path == str(tmp_path / "index" / "embedding_cache.sqlite")
+    assert create_embedding_cache("model-a").path == ":memory:"
+    assert not (tmp_path / "data").exists()
+
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", "")
+    assert create_embedding_cache("model-a", str(tmp_path / "index")) is None
+
+def test_query_cache_hits_normalized_repeats():
+    """Repeated queries skip the model; the least recently used entry is evicted first."""
+    model = CountingEmbeddings()
+    embeddings = QueryEmbeddingCache(model, max_size=2, ttl=60)
+
+    embeddings.embed_query("invoice march")
+    embeddings.embed_query("  invoice   march ")
+    embeddings.embed_query("budget")
+    embeddings.embed_query("invoice march")
+    embeddings.embed_query("offsite")
+    embeddings.embed_query("budget")
+
+    assert model.embedded == ["invoice march", "budget", "offsite", "budget"]
+    assert embeddings.get_stats() == {"hits": 2, "misses": 4, "size": 2, "max_size": 2}
+
+def test_query_cache_entries_expire():
+    """Entries older than the TTL are recomputed."""
+    model = CountingEmbeddings()
+    embeddings = QueryEmbeddingCache(model, max_size=10, ttl=-1)
+
+    embeddings.embed_query("invoice")
+    embeddings.embed_query("invoice")
+
+    assert model.embedded == ["invoice", "invoice"]
+
+def test_query_batch_runs_the_model_once():
+    """Uncached queries of a batch are embedded in one call, duplicates and cached ones skipped."""
+    model = CountingEmbeddings()
+    calls = []
+    model.embed_documents = lambda texts: calls.append(list(texts)) or [[float(len(text)), 0.0] for text in texts]
+    embeddings = QueryEmbeddingCache(model, max_size=10, ttl=60)
+    embeddings.embed_query("budget")
+
+    vectors = embeddings.embed_queries(["invoice", "budget", " invoice ", "offsite"])
+
+    assert vectors == [[7.0, 0.0], [6.0, 0.0], [7.0, 0.0], [7.0, 0.0]]
+    assert calls == [["invoice", "offsite"]]
+    assert embeddings.get_stats()["hits"] == 2
@@ -0,0 +1,39 @@
+from langchain_core.embeddings import Embeddings
+from email_llm_search.embedding_scheduler import TokenBudgetEmbeddings, plan_token_batches
+
+class RecordingEmbeddings(Embeddings):
+    """Embeds a text as its length and records the batches it was given."""
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text))]
+
+def test_batches_are_length_sorted_within_budget():
+    """Similar lengths share a batch and no batch exceeds the padded budget."""
+    lengths = [100, 10, 12, 90, 11, 95]
+
+    batches = plan_token_batches(lengths, max_batch_tokens=200)
+
+    assert batches == [[1, 4, 2], [3, 5], [0]]
+    assert all(len(batch) * max(lengths[i] for i in batch) <= 200 for batch in batches)
+
+def test_batch_size_limit_and_oversized_text():
+    """The size limit applies too, and a text over the budget gets a batch of its own."""
+    assert plan_token_batches([5] * 5, max_batch_tokens=1000, max_batch_size=2) == [[0, 1], [2, 3], [4]]
+    assert plan_token_batches([500, 5], max_batch_tokens=100) == [[1], [0]]
+
+def test_vectors_are_returned_in_input_order():
+    """Sorting for batching does not change which vector belongs to which text."""
+    model = RecordingEmbeddings()
+    embeddings = TokenBudgetEmbeddings(model, count_tokens=len, max_batch_tokens=40, max_batch_size=10)
+    texts = ["x" * 30, "aa", "x" * 28, "b", "ccc"]
+
+    vectors = embeddings.embed_documents(texts)
+
+    assert vectors == [[30.0], [2.0], [28.0], [1.0], [3.0]]
+    assert model.batches == [["b", "aa", "ccc"], ["x" * 28], ["x" * 30]]
@@ -0,0 +1,149 @@
+import pytest
+from email_llm_search.db_manager import DBManager
+from email_llm_search.ingestion_pipeline import IngestionPipeline
+from email_llm_search.mails import MailingManager
+from email_llm_search.types import ImapAuth, Mail
+
+class FakeImapManager:
+    """Serves mails with UIDs above the checkpoint, batch by batch; fetches of UIDs in failures fail."""
+    def __init__(self, uids, uidvalidity=1, failures=None):
+        self.uids = uids
+        self.uidvalidity = uidvalidity
+        self.failures = dict(failures or {})  # Remaining failed fetches per UID
+
+    async def stream_emails(self, max_emails, checkpoint, requested=None):
+        checkpoint.uidvalidity = self.uidvalidity
+        for uid in [uid for uid in self.uids if uid > checkpoint.last_uid][:max_emails]:
+            if requested is not None:
+                requested.append(uid)
+            if self.failures.get(uid):
+                self.failures[uid] -= 1
+                continue
+            yield Mail(uid=str(uid), subject="", from_="a@b.com", to="c@d.com", date="",
+                       body="" if uid == 3 else f"Mail number {uid}.", folder=checkpoint.mailbox)
+
+    async def close(self):
+        pass
+
+class FakeLangChainManager:
+    """Records written chunks; can be told to fail writes."""
+    def __init__(self):
+        self.written = []
+        self.fail = False
+
+    def embed_processed_mails(self, processed_mails):
+        documents = [(mail.folder, mail.mail_uid, chunk) for mail in processed_mails for chunk in mail.chunks]
+        return documents, [[1.0]] * len(documents)
+
+    def write_documents(self, documents, vectors):
+        if self.fail:
+            raise RuntimeError("disk full")
+        self.written.extend(documents)
+
+@pytest.fixture
+def mailing_manager(monkeypatch):
+    """MailingManager with two folders behind a fake IMAP backend."""
+    monkeypatch.setenv("RAW_MAIL_CACHE_DIR", "")
+    manager = MailingManager(ImapAuth(email="me@example.com", password="secret"))
+    manager.imap_manager = FakeImapManager(list(range(1, 8)))
+    manager.folders = ["INBOX", "Work"]
+    return manager
+
+@pytest.mark.asyncio
+async def test_pipeline_writes_everything_and_advances_checkpoints(mailing_manager):
+    """All stages drain, mails without text count as synced, checkpoints reach the newest UID."""
+    langchain_manager = FakeLangChainManager()
+    pipeline = IngestionPipeline(mailing_manager, langchain_manager)
+    pipeline.fetch_batch_size = 2
+    pipeline.mail_queue_depth = pipeline.chunk_queue_depth = 2
+
+    assert await pipeline.run() == 14
+
+    assert sorted(uid for folder, uid, _ in langchain_manager.written if folder == "Work") == ["1", "2", "4", "5", "6", "7"]
+    assert mailing_manager._checkpoints["INBOX"].last_uid == 7
+    assert mailing_manager._checkpoints["Work"].last_uid == 7
+    assert mailing_manager.get_status().synced_emails == 14
+    stats = pipeline.get_stats()
+    assert stats["stages"]["fetch"]["items"] == 14
+    assert stats["stages"]["embed"]["items"] == 12
+    assert stats["queues"]["mails"] == {"size": 0, "max_size": 2}
+
+    assert await pipeline.run() == 0
+
+@pytest.mark.asyncio
+async def test_process_stage_hands_micro_batches_to_the_processor(mailing_manager):
+    """Queued emails reach process_batch together instead of one call per email."""
+    batch_sizes = []
+    process_batch = mailing_manager.mail_processor.process_batch
+
+    async def record(mails):
+        batch_sizes.append(len(mails))
+        return await process_batch(mails)
+
+    mailing_manager.mail_processor.process_batch = record
+    pipeline = IngestionPipeline(mailing_manager, FakeLangChainManager())
+    pipeline.process_workers = 1
+    pipeline.process_batch_size = 4
+
+    assert await pipeline.run() == 14
+    assert sum(batch_sizes) == 14
+    assert max(batch_sizes) == 4
+
+@pytest.mark.asyncio
+async def test_pipeline_checkpoint_stops_before_failed_fetch(mailing_manager):
+    """A UID that never arrived keeps the checkpoint below it; the next run fetches it again."""
+    mailing_manager.folders = ["INBOX"]
+    mailing_manager.imap_manager = FakeImapManager(list(range(1, 8)), failures={5: 1})
+    langchain_manager = FakeLangChainManager()
+    pipeline = IngestionPipeline(mailing_manager, langchain_manager)
+    pipeline.fetch_batch_size = 2
+
+    assert await pipeline.run() == 6
+    assert mailing_manager._checkpoints["INBOX"].last_uid == 4
+
+    assert await pipeline.run() == 3
+    assert mailing_manager._checkpoints["INBOX"].last_uid == 7
+    assert sorted(uid for _, uid, _ in langchain_manager.written).count("5") == 1
+
+@pytest.mark.asyncio
+async def test_failed_write_keeps_checkpoint(mailing_manager):
+    """Mails whose write failed are fetched again by the next run."""
+    langchain_manager = FakeLangChainManager()
+    langchain_manager.fail = True
+    pipeline = IngestionPipeline(mailing_manager, langchain_manager)
+
+    with pytest.raises(RuntimeError):
+        await pipeline.run()
+    assert mailing_manager._checkpoints["INBOX"].last_uid == 0
+
+    langchain_manager.fail = False
+    assert await pipeline.run() == 14
+
+@pytest.mark.asyncio
+async def test_max_emails_limits_a_run(mailing_manager):
+    """A limited run stops fetching and the next run continues after what was written."""
+    mailing_manager.folders = ["INBOX"]
+    langchain_manager = FakeLangChainManager()
+    pipeline = IngestionPipeline(mailing_manager, langchain_manager)
+
+    assert await pipeline.run(max_emails=3) == 3
+    assert mailing_manager._checkpoints["INBOX"].last_uid == 3
+    assert await pipeline.run() == 4
+
+@pytest.mark.asyncio
+async def test_restart_resumes_from_stored_checkpoints(monkeypatch, tmp_path):
+    """Checkpoints committed after each write are picked up by a new manager."""
+    monkeypatch.setenv("RAW_MAIL_CACHE_DIR", "")
+    db = DBManager(str(tmp_path / "state.sqlite"))
+
+    def new_manager():
+        manager = MailingManager(ImapAuth(email="me@example.com", password="secret"), checkpoint_store=db)
+        manager.imap_manager = FakeImapManager(list(range(1, 8)))
+        manager.folders = ["INBOX"]
+        return manager
+
+    assert await IngestionPipeline(new_manager(), FakeLangChainManager()).run(max_emails=4) == 4
+
+    langchain_manager = FakeLangChainManager()
+    assert await IngestionPipeline(new_manager(), langchain_manager).run() == 3
+    assert sorted(uid for _, uid, _ in langchain_manager.written) == ["5", "6", "7"]
@@ -0,0 +1,59 @@
+import pytest
+from email_llm_search.ingestion_service import IngestionService
+
+class FakeImapManager:
+    """IMAP backend stand-in with a configurable IDLE answer."""
+    def __init__(self, idle_result):
+        self.idle_result = idle_result
+        self.idle_calls = 0
+
+    async def wait_for_new_mail(self, folder, timeout):
+        self.idle_calls += 1
+        return self.idle_result
+
+class FakeMailingManager:
+    """Only provides the IMAP backend used for IDLE."""
+    def __init__(self, idle_result=True):
+        self.imap_manager = FakeImapManager(idle_result)
+
+class FakePipeline:
+    """Reports a pre-defined number of synced mails per run."""
+    def __init__(self, results):
+        self.results = list(results)
+
+    async def run(self):
+        return self.results.pop(0) if self.results else 0
+
+@pytest.mark.asyncio
+async def test_drain_runs_the_pipeline():
+    """A round runs the pipeline once and reports what it synced."""
+    service = IngestionService(FakeMailingManager(), FakePipeline([4]))
+    
+    assert await service.drain() == 4
+    assert await service.drain() == 0
+
+@pytest.mark.asyncio
+async def test_wait_for_changes_uses_idle():
+    """With IDLE support no polling sleep is needed."""
+    mailing_manager = FakeMailingManager(idle_result=True)
+    service = IngestionService(mailing_manager, FakePipeline([]))
+    service.poll_interval = service._current_poll_interval = 1000
+    
+    await service.wait_for_changes()
+    
+    assert mailing_manager.imap_manager.idle_calls == 1
+    assert service._current_poll_interval == 1000
+
+@pytest.mark.asyncio
+async def test_polling_backoff_without_idle():
+    """Without IDLE the service polls with exponential backoff."""
+    mailing_manager = FakeMailingManager(idle_result=None)
+    service = IngestionService(mailing_manager, FakePipeline([]))
+    service.poll_interval = service._current_poll_interval = 0.001
+    service.max_poll_interval = 0.004
+    
+    for _ in range(4):
+        await service.wait_for_changes()
+    
+    assert mailing_manager.imap_manager.idle_calls == 1
+    assert service._current_poll_interval == 0.004
@@ -0,0 +1,92 @@
+import sqlite3
+import time
+from langchain_core.documents import Document
+from email_llm_search.keyword_index import KeywordIndex, build_match_query, reciprocal_rank_fusion
+
+def _doc(text, folder="INBOX", uid="1", **headers):
+    return Document(page_content=text, metadata={"mail_uid": uid, "chunk_index": 0, "folder": folder, **headers})
+
+def test_match_query_quotes_terms():
+    """Terms become quoted phrases so FTS5 syntax in queries is inert."""
+    assert build_match_query('INV-2023-0042 "paid" OR') == '"INV-2023-0042" OR """paid""" OR "OR"'
+    assert build_match_query("   ") == ""
+
+def test_exact_identifiers_match():
+    """Codes and addresses are found as exact token sequences."""
+    index = KeywordIndex()
+    index.upsert(["a", "b", "c"], [
+        _doc("Invoice INV-2023-0042 is overdue", uid="1"),
+        _doc("Invoice INV-2023-0043 was paid", uid="2"),
+        _doc("Contact billing@example.com for questions", uid="3"),
+    ])
+
+    assert [doc.metadata["mail_uid"] for doc, _ in index.search("INV-2023-0042", 5)] == ["1"]
+    assert [doc.metadata["mail_uid"] for doc, _ in index.search("billing@example.com", 5)] == ["3"]
+
+def test_folder_filter_and_replace():
+    """Filters apply inside the query and upserting an id replaces its text."""
+    index = KeywordIndex()
+    index.upsert(["a", "b"], [_doc("quarterly budget", "INBOX", "1"), _doc("budget draft", "Sent", "2")])
+    index.upsert(["b"], [_doc("holiday plans", "Sent", "2")])
+
+    assert [doc.metadata["mail_uid"] for doc, _ in index.search("budget", 5)] == ["1"]
+    assert index.search("budget", 5, {"folder": "Sent"}) == []
+    assert index.count() == 2
+
+def test_sender_and_date_filters():
+    """Sender equality and date ranges are applied in the SQL query."""
+    index = KeywordIndex()
+    index.upsert(["a", "b", "c"], [
+        _doc("invoice", uid="1", sender="ann@example.com", date_ts=100),
+        _doc("invoice", uid="2", sender="bob@example.com", date_ts=200),
+        _doc("invoice", uid="3", sender="ann@example.com"),
+    ])
+
+    def uids(search_filter):
+        return sorted(doc.metadata["mail_uid"] for doc, _ in index.search("invoice", 5, search_filter))
+
+    assert uids({"date_ts": {"$gte": 150}}) == ["2"]
+    assert uids({"sender": "ann@example.com"}) == ["1", "3"]
+    assert uids({"sender": "ann@example.com", "date_ts": {"$gte": 50, "$lte": 150}}) == ["1"]
+
+def test_index_without_filter_columns_is_rebuilt(tmp_path):
+    """An index created before a filter field existed is migrated from its stored metadata."""
+    path = str(tmp_path / "keywords.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE VIRTUAL TABLE chunks USING fts5(id UNINDEXED, text, metadata UNINDEXED, folder UNINDEXED)")
+    conn.execute("INSERT INTO chunks VALUES ('a', 'invoice', ?, 'INBOX')",
+                 ('{"mail_uid": "1", "folder": "INBOX", "sender": "ann@example.com"}',))
+    conn.commit()
+    conn.close()
+
+    index = KeywordIndex(path)
+
+    assert index.count() == 1
+    assert [doc.metadata["mail_uid"] for doc, _ in index.search("invoice", 5, {"sender": "ann@example.com"})] == ["1"]
+
+def test_reciprocal_rank_fusion_weights():
+    """Ids ranked well by both lists win; weights shift the balance."""
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], [1.0, 1.0])
+    assert [id_ for id_, _ in fused] == ["b", "a", "d", "c"]
+
+    fused = reciprocal_rank_fusion([["a", "b"], ["b", "a"]], [2.0, 1.0])
+    assert [id_ for id_, _ in fused] == ["a", "b"]
+
+def test_upsert_cost_stays_flat_as_the_index_grows():
+    """Replacing chunks looks ids up by key, so later batches are not slower than the first."""
+    index = KeywordIndex()
+    batch = 500
+
+    def upsert_batch(start):
+        began = time.perf_counter()
+        ids = [str(i) for i in range(start, start + batch)]
+        index.upsert(ids, [_doc(f"chunk {i} about invoices", uid=str(i)) for i in range(start, start + batch)])
+        return time.perf_counter() - began
+
+    first = min(upsert_batch(0) for _ in range(3))
+    for start in range(batch, 20 * batch, batch):
+        upsert_batch(start)
+    last = min(upsert_batch(19 * batch) for _ in range(3))
+
+    assert index.count() == 20 * batch
+    assert last < first * 5 + 0.05
@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from email_llm_search.mail_searcher import MailSearcher
+
+@pytest.mark.asyncio
+async def test_staged_startup_reports_readiness(monkeypatch):
+    """The database is ready immediately; the slow components report progress until they finish."""
+    monkeypatch.setenv("IMAP_EMAIL", "me@example.com")
+    monkeypatch.setenv("IMAP_PASSWORD", "secret")
+    model_loaded = asyncio.Event()
+    searcher = MailSearcher()
+
+    async def initialize_imap(user):
+        searcher.components["imap"] = "failed: login failed"
+        return False
+
+    async def initialize_model():
+        searcher.components["model"] = "initializing"
+        await model_loaded.wait()
+        searcher.components["model"] = "ready"
+        return True
+
+    monkeypatch.setattr(searcher, "_initialize_imap", initialize_imap)
+    monkeypatch.setattr(searcher, "_initialize_model", initialize_model)
+    database_calls = []
+    initialize_database = searcher.initialize_database
+    monkeypatch.setattr(searcher, "initialize_database", lambda: database_calls.append(1) or initialize_database())
+
+    task = searcher.start_initialization()
+    while searcher.components["model"] == "pending":
+        await asyncio.sleep(0)
+
+    assert searcher.get_state().sync_status == "idle"
+    assert searcher.get_readiness() == {
+        "ready": False,
+        "components": {"database": "ready", "imap": "failed: login failed", "model": "initializing"},
+    }
+
+    model_loaded.set()
+    await task
+
+    assert searcher.components["model"] == "ready"
+    assert searcher.ingestion_service is None  # Syncing needs IMAP
+    assert len(database_calls) == 1
@@ -0,0 +1,47 @@
+from email_llm_search.result_cache import SearchResultCache, result_cache_key
+from email_llm_search.types import SearchFilter, SearchOptions, SearchResult
+
+RESULTS = [SearchResult(text="hello", mail_uid="1", chunk_index=0, score=0.1)]
+
+def test_key_covers_query_count_filters_and_options():
+    """Whitespace differences share a key; anything changing the results does not."""
+    key = result_cache_key("invoice  march", 5, None, None)
+
+    assert key == result_cache_key(" invoice march", 5, None, SearchOptions())
+    assert key != result_cache_key("invoice march", 10, None, None)
+    assert key != result_cache_key("invoice march", 5, SearchFilter(folder="Work"), None)
+    assert key != result_cache_key("invoice march", 5, None, SearchOptions(mode="hybrid"))
+
+def test_hits_within_a_generation():
+    """Repeated searches are served until the index changes."""
+    cache = SearchResultCache(max_size=10)
+    key = result_cache_key("invoice", 5, None, None)
+
+    assert cache.get(key, 0) is None
+    cache.put(key, 0, RESULTS)
+
+    assert cache.get(key, 0) == RESULTS
+    assert cache.get(key, 1) is None
+    assert cache.get_stats() == {"hits": 1, "misses": 2, "size": 0, "max_size": 10, "generation": 1}
+
+def test_results_of_an_older_generation_are_discarded():
+    """A search that started before a write does not populate the newer generation."""
+    cache = SearchResultCache(max_size=10)
+    key = result_cache_key("invoice", 5, None, None)
+    cache.get(key, 2)
+
+    cache.put(key, 1, RESULTS)
+
+    assert cache.get(key, 2) is None
+
+def test_least_recently_used_is_evicted():
+    """The cache stays within max_size."""
+    cache = SearchResultCache(max_size=2)
+    keys = [result_cache_key(query, 5, None, None) for query in ("a", "b", "c")]
+    cache.put(keys[0], 0, RESULTS)
+    cache.put(keys[1], 0, RESULTS)
+    cache.get(keys[0], 0)
+    cache.put(keys[2], 0, RESULTS)
+
+    assert cache.get(keys[1], 0) is None
+    assert cache.get(keys[0], 0) == RESULTS
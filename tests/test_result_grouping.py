@@ -0,0 +1,48 @@
+from email_llm_search.result_grouping import group_by_mail, grouped_search, relevance
+from email_llm_search.types import SearchResult
+
+def chunk(uid, index, score):
+    return SearchResult(text=f"{uid}/{index}", mail_uid=uid, chunk_index=index, score=score)
+
+def test_group_by_mail_max_and_sum():
+    """Mails are ranked by their best chunk, or by the total of their chunks."""
+    results = [chunk("1", 0, 0.9), chunk("1", 1, 0.85), chunk("1", 2, 0.8), chunk("2", 0, 0.875)]
+
+    by_max = group_by_mail(results, "max", snippets_per_mail=2)
+    assert [mail.mail_uid for mail in by_max] == ["1", "2"]
+    assert by_max[0].score == 0.9
+    assert [snippet.chunk_index for snippet in by_max[0].snippets] == [0, 1]
+
+    by_sum = group_by_mail([chunk("1", 0, 2.0), chunk("1", 1, 3.0), chunk("2", 0, 4.0)], "sum")
+    assert [(mail.mail_uid, mail.score) for mail in by_sum] == [("1", 5.0), ("2", 4.0)]
+
+def test_grouped_search_over_fetches_until_enough_mails():
+    """A thread filling the first results pushes the search deeper."""
+    index = [chunk("1", i, 1 - 0.01 * i) for i in range(30)] + [chunk(str(uid), 0, 0.5) for uid in range(2, 6)]
+    depths = []
+
+    def search_chunks(depth):
+        depths.append(depth)
+        return index[:depth]
+
+    mails = grouped_search(search_chunks, 3, over_fetch=2, max_chunks=1000)
+
+    assert [mail.mail_uid for mail in mails] == ["1", "2", "3"]
+    assert depths[0] == 6 and len(depths) > 1
+
+def test_grouped_search_stops_when_exhausted():
+    """Fewer matching mails than requested are returned without looping."""
+    depths = []
+
+    def search_chunks(depth):
+        depths.append(depth)
+        return [chunk("1", 0, 0.1)]
+
+    assert [mail.mail_uid for mail in grouped_search(search_chunks, 5)] == ["1"]
+    assert len(depths) == 1
+
+def test_relevance_is_higher_for_better_matches():
+    """Distances and bm25 values turn into relevances that sort the same way in every mode."""
+    assert relevance(0.0, "vector") == 1.0 and relevance(0.5, "vector") > relevance(1.5, "vector")
+    assert relevance(-3.0, "keyword") > relevance(-1.0, "keyword")
+    assert relevance(0.02, "hybrid") == 0.02
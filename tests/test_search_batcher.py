@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import pytest
+from email_llm_search.search_batcher import SearchBatcher, SearchOverloadedError
+from email_llm_search.types import SearchRequest, SearchResult
+
+def result(query):
+    return SearchResult(text=query, mail_uid=query, chunk_index=0, score=0.0)
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_share_a_batch():
+    """Searches arriving together run as one batch off the event loop, answered in order."""
+    batches = []
+    loop_thread = threading.get_ident()
+
+    def search_many(requests):
+        assert threading.get_ident() != loop_thread
+        batches.append([request.query for request in requests])
+        return [[result(request.query)] for request in requests]
+
+    batcher = SearchBatcher(search_many, max_wait_ms=50, max_batch_size=3, max_pending=10)
+    results = await asyncio.gather(*(batcher.search(SearchRequest(str(i))) for i in range(4)))
+    await batcher.close()
+
+    assert [r[0].text for r in results] == ["0", "1", "2", "3"]
+    assert batches == [["0", "1", "2"], ["3"]]
+    assert batcher.get_stats()["average_batch_size"] == 2.0
+
+@pytest.mark.asyncio
+async def test_overload_is_rejected():
+    """Searches beyond max_pending fail fast instead of queueing."""
+    release = threading.Event()
+
+    def search_many(requests):
+        release.wait(5)
+        return [[] for _ in requests]
+
+    batcher = SearchBatcher(search_many, max_wait_ms=0, max_batch_size=1, max_pending=2)
+    pending = [asyncio.ensure_future(batcher.search(SearchRequest(str(i)))) for i in range(2)]
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(SearchOverloadedError):
+        await batcher.search(SearchRequest("late"))
+    release.set()
+    assert await asyncio.gather(*pending) == [[], []]
+    assert batcher.get_stats()["rejected"] == 1
+    await batcher.close()
+
+@pytest.mark.asyncio
+async def test_batch_errors_reach_every_caller():
+    """A failing batch raises in each of its searches."""
+    def search_many(requests):
+        raise RuntimeError("index closed")
+
+    batcher = SearchBatcher(search_many, max_wait_ms=10)
+    results = await asyncio.gather(*(batcher.search(SearchRequest(str(i))) for i in range(2)), return_exceptions=True)
+    await batcher.close()
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+@pytest.mark.asyncio
+async def test_search_all_is_admitted_as_a_whole():
+    """A group of searches shares batches with single ones and is rejected as a whole when too large."""
+    release = threading.Event()
+
+    def search_many(requests):
+        release.wait(5)
+        return [[result(request.query)] for request in requests]
+
+    batcher = SearchBatcher(search_many, max_wait_ms=0, max_batch_size=8, max_pending=3)
+    single = asyncio.ensure_future(batcher.search(SearchRequest("a")))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(SearchOverloadedError):
+        await batcher.search_all([SearchRequest("b"), SearchRequest("c"), SearchRequest("d")])
+    group = asyncio.ensure_future(batcher.search_all([SearchRequest("b"), SearchRequest("c")]))
+    release.set()
+
+    assert [[r.text for r in results] for results in await group] == [["b"], ["c"]]
+    assert (await single)[0].text == "a"
+    assert batcher.get_stats()["rejected"] == 3
+    await batcher.close()
+
+@pytest.mark.asyncio
+async def test_run_counts_against_pending_limit():
+    """Other searches run through run() share max_pending with batched ones."""
+    release = threading.Event()
+
+    def slow_search(query):
+        release.wait(5)
+        return query
+
+    batcher = SearchBatcher(lambda requests: [[] for _ in requests], max_wait_ms=0, max_pending=1)
+    running = asyncio.ensure_future(batcher.run(slow_search, "mails"))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(SearchOverloadedError):
+        await batcher.search(SearchRequest("late"))
+    release.set()
+    assert await running == "mails"
+    assert await batcher.search(SearchRequest("now")) == []
+    await batcher.close()
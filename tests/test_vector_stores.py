@@ -0,0 +1,110 @@
+import os
+import numpy as np
+from langchain_core.documents import Document
+from email_llm_search.vector_stores import ChromaVectorStore, FlatVectorStore
+
+def doc(uid, folder="INBOX", **headers):
+    """A chunk document as LangChainManager writes it."""
+    return Document(page_content=f"text {uid}", metadata={"mail_uid": uid, "chunk_index": 0, "folder": folder, **headers})
+
+def test_exact_top_k_with_chroma_scores(tmp_path):
+    """Results are nearest first, scored as squared L2 distance of normalized vectors."""
+    store = FlatVectorStore(str(tmp_path))
+    store.upsert(["a", "b", "c"], [[1, 0], [0, 1], [1, 1]], [doc("1"), doc("2"), doc("3")])
+
+    results = store.search([1, 0], k=2)
+
+    assert [d.metadata["mail_uid"] for d, _ in results] == ["1", "3"]
+    assert np.allclose([score for _, score in results], [0.0, 2 - np.sqrt(2)])
+    assert store.count() == 3
+
+def test_filter_and_replace(tmp_path):
+    """Filters restrict candidates and an upsert replaces the document with the same id."""
+    store = FlatVectorStore(str(tmp_path))
+    store.upsert(["a", "b"], [[1, 0], [0.9, 0.1]], [doc("1"), doc("2", folder="Work")])
+    store.upsert(["a"], [[0, 1]], [doc("1")])
+
+    assert [d.metadata["mail_uid"] for d, _ in store.search([1, 0], k=5, filter={"folder": "Work"})] == ["2"]
+    assert [d.metadata["mail_uid"] for d, _ in store.search([1, 0], k=5)] == ["2", "1"]
+    assert store.count() == 2
+
+def test_sender_and_date_range_filters(tmp_path):
+    """Range conditions skip rows without a date; all conditions must hold."""
+    store = FlatVectorStore(str(tmp_path))
+    store.upsert(["a", "b", "c"], [[1, 0], [1, 0.1], [1, 0.2]], [
+        doc("1", sender="ann@example.com", date_ts=100),
+        doc("2", sender="bob@example.com", date_ts=200),
+        doc("3", sender="ann@example.com"),
+    ])
+
+    def uids(search_filter):
+        return [d.metadata["mail_uid"] for d, _ in store.search([1, 0], k=5, filter=search_filter)]
+
+    assert uids({"date_ts": {"$gte": 150}}) == ["2"]
+    assert uids({"date_ts": {"$gte": 50, "$lte": 250}}) == ["1", "2"]
+    assert uids({"sender": "ann@example.com"}) == ["1", "3"]
+    assert uids({"sender": "ann@example.com", "date_ts": {"$lte": 150}}) == ["1"]
+
+    reopened = FlatVectorStore(str(tmp_path))
+    assert [d.metadata["mail_uid"] for d, _ in reopened.search([1, 0], k=5, filter={"date_ts": {"$gt": 100}})] == ["2"]
+
+def test_reopen_float16(tmp_path):
+    """The store is durable and keeps its storage type across restarts."""
+    store = FlatVectorStore(str(tmp_path), dtype="float16", block_rows=2)
+    store.upsert([str(i) for i in range(5)], [[1, i] for i in range(5)], [doc(str(i)) for i in range(5)])
+    store.close()
+
+    reopened = FlatVectorStore(str(tmp_path))
+
+    assert reopened.dtype == np.float16
+    assert reopened.count() == 5
+    assert reopened.search([1, 4], k=1)[0][0].metadata["mail_uid"] == "4"
+    assert (tmp_path / "vectors.bin").stat().st_size == 5 * 2 * 2
+
+def test_chroma_where_clause():
+    """Filters become one Chroma condition per field and operator."""
+    assert ChromaVectorStore._where(None) is None
+    assert ChromaVectorStore._where({"folder": "INBOX"}) == {"folder": "INBOX"}
+    assert ChromaVectorStore._where({"sender": "ann@example.com", "date_ts": {"$gte": 1, "$lte": 2}}) == {
+        "$and": [{"sender": "ann@example.com"}, {"date_ts": {"$gte": 1}}, {"date_ts": {"$lte": 2}}]
+    }
+
+def test_search_many_matches_single_searches(tmp_path):
+    """Batched queries with their own filters return what separate searches would."""
+    store = FlatVectorStore(str(tmp_path), block_rows=3)
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(10, 4)).tolist()
+    store.upsert([str(i) for i in range(10)], vectors,
+                 [doc(str(i), folder="Work" if i % 2 else "INBOX") for i in range(10)])
+    queries = rng.normal(size=(3, 4)).tolist()
+    filters = [None, {"folder": "Work"}, {"folder": "Nowhere"}]
+
+    batched = store.search_many(queries, 4, filters)
+
+    for query, search_filter, results in zip(queries, filters, batched):
+        single = store.search(query, 4, search_filter)
+        assert [d.metadata["mail_uid"] for d, _ in results] == [d.metadata["mail_uid"] for d, _ in single]
+    assert len(batched[0]) == 4 and batched[2] == []
+
+def test_blocks_are_sized_in_bytes(tmp_path):
+    """A small block_bytes splits the scan into many blocks without changing the results."""
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(50, 8)).tolist()
+    queries = rng.normal(size=(2, 8)).tolist()
+    whole = FlatVectorStore(str(tmp_path / "whole"), dtype="float16")
+    blocked = FlatVectorStore(str(tmp_path / "blocked"), dtype="float16", block_bytes=4 * (8 + 2) * 7)
+    for store in (whole, blocked):
+        store.upsert([str(i) for i in range(50)], vectors, [doc(str(i)) for i in range(50)])
+
+    assert whole.block_bytes == 32 << 20
+    for single, split in zip(whole.search_many(queries, 5), blocked.search_many(queries, 5)):
+        assert [d.metadata["mail_uid"] for d, _ in single] == [d.metadata["mail_uid"] for d, _ in split]
+
+def test_temporary_store_is_removed_on_close():
+    """Without a directory the store lives in a temporary one that close() removes."""
+    store = FlatVectorStore()
+    store.upsert(["1"], [[1, 0]], [doc("1")])
+    assert [d.metadata["mail_uid"] for d, _ in store.search([1, 0], k=1)] == ["1"]
+
+    store.close()
+    assert not os.path.exists(store.directory)